@@ -2,7 +2,9 @@
 
 __version__ = '0.3.0'
 __all__ = [
+    'AsyncFilesystem',
     'Filesystem',
 ]
 
 from ExtFs.fs import Filesystem
+from ExtFs.aio import AsyncFilesystem
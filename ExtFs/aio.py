@@ -0,0 +1,243 @@
+"""asyncio API.
+
+:class:`AsyncFilesystem` wraps a :class:`ExtFs.fs.Filesystem` and runs
+everything that reads the image in a bounded thread pool, so an event loop
+is never blocked on I/O. Image reads are positional (see :mod:`ExtFs.image`)
+so many files can be read at the same time from one parsed filesystem.
+
+    >>> async with AsyncFilesystem(filename="ext4.img") as fs:
+    ...     async with await fs.open("/etc/passwd") as fh:
+    ...         async for chunk in fh.iter_chunks():
+    ...             ...
+"""
+
+import asyncio
+import functools
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable
+
+from ExtFs.filehandle import ExtFsFileHandle
+from ExtFs.fs import Filesystem
+
+# Default number of threads reading the image
+DEFAULT_MAX_WORKERS = 16
+
+# Default size of the chunks yielded by AsyncFileHandle.iter_chunks()
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class AsyncFileHandle:
+    """AsyncFileHandle.
+
+    Awaitable wrapper of an :class:`ExtFsFileHandle`. Calls on one handle are
+    serialized, calls on different handles run concurrently.
+    """
+
+    __slots__ = ['fh', 'executor', 'lock']
+
+    def __init__(self, fh: ExtFsFileHandle, executor: ThreadPoolExecutor):
+        """Wrap a file handle.
+
+        Args:
+
+            fh (ExtFsFileHandle): File handle to read from.
+            executor (ThreadPoolExecutor): Pool reads are run in.
+        """
+        self.fh = fh
+        self.executor = executor
+        self.lock = asyncio.Lock()
+
+    async def __aenter__(self) -> 'AsyncFileHandle':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def __run(self, func: Callable, *args):
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    @property
+    def name(self) -> str:
+        """Name of the file."""
+        return self.fh.filename
+
+    @property
+    def size(self) -> int:
+        """Size of the file in bytes."""
+        return self.fh.size
+
+    @property
+    def closed(self) -> bool:
+        """Whether the handle is closed."""
+        return self.fh.closed
+
+    async def read(self, size: int = -1) -> bytes:
+        """Read up to ``size`` bytes, everything that is left if negative.
+
+        Args:
+
+            size (int, optional): Number of bytes to read. Defaults to -1.
+
+        Returns:
+
+            bytes: Data read, empty at the end of the file.
+        """
+        return await self.__run(self.fh.read, size)
+
+    async def readinto(self, buf: memoryview) -> int:
+        """Read into ``buf``.
+
+        Args:
+
+            buf (memoryview): Writable buffer.
+
+        Returns:
+
+            int: Number of bytes read.
+        """
+        return await self.__run(self.fh.readinto, buf)
+
+    async def read_all(self) -> bytes:
+        """Read the whole file from the start.
+
+        Returns:
+
+            bytes: Contents of the file.
+        """
+        return await self.__run(self.fh.read_all)
+
+    async def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Read the rest of the file in chunks.
+
+        Async generator.
+
+        Args:
+
+            chunk_size (int, optional): Bytes per chunk. Defaults to DEFAULT_CHUNK_SIZE.
+
+        Returns:
+
+            bytes: Chunk of at most ``chunk_size`` bytes.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be > 0!")
+        while True:
+            chunk = await self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Change the position, no I/O is done. See :func:`ExtFsFileHandle.seek`.
+
+        Returns:
+
+            int: New position.
+        """
+        return self.fh.seek(offset, whence)
+
+    def tell(self) -> int:
+        """Current position.
+
+        Returns:
+
+            int: Position in bytes.
+        """
+        return self.fh.tell()
+
+    async def close(self) -> None:
+        """Close the handle."""
+        async with self.lock:
+            self.fh.close()
+
+
+class AsyncFilesystem:
+    """AsyncFilesystem.
+
+    asyncio facade of :class:`ExtFs.fs.Filesystem`. Parsing, path
+    resolution and reads run in a thread pool of ``max_workers`` threads.
+    The wrapped filesystem is available as ``fs`` for lookups of entries
+    that have been read already.
+    """
+
+    __slots__ = ['fs', 'executor']
+
+    def __init__(self, fs: Filesystem = None, max_workers: int = DEFAULT_MAX_WORKERS, **kwargs):
+        """Create an asyncio filesystem.
+
+        Args:
+
+            fs (Filesystem, optional): Filesystem to wrap. Created from ``kwargs`` if not given.
+            max_workers (int, optional): Threads reading the image. Defaults to DEFAULT_MAX_WORKERS.
+            **kwargs: Arguments of :class:`ExtFs.fs.Filesystem`.
+        """
+        if fs is None:
+            fs = Filesystem(**kwargs)
+        elif kwargs:
+            raise ValueError("Filesystem arguments can't be given with fs!")
+        self.fs = fs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ExtFs")
+
+    async def __aenter__(self) -> 'AsyncFilesystem':
+        if self.fs.fs is None or self.fs.fs.sb is None:
+            await self.run()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def __run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def run(self) -> None:
+        """Parse the filesystem. See :func:`Filesystem.run`."""
+        await self.__run(self.fs.run)
+
+    async def open(self, full_path: str) -> AsyncFileHandle:
+        """Open a file.
+
+        Args:
+
+            full_path (str): Full path of file to open.
+
+        Returns:
+
+            AsyncFileHandle: Handle of the file.
+        """
+        fh = await self.__run(self.fs.open, full_path)
+        return AsyncFileHandle(fh, self.executor)
+
+    async def read_all(self, full_path: str) -> bytes:
+        """Read the whole contents of a file.
+
+        Args:
+
+            full_path (str): Full path of file to read.
+
+        Returns:
+
+            bytes: Contents of the file.
+        """
+        return await self.__run(self.fs.read_all, full_path)
+
+    async def resolve(self, full_path: str) -> bool:
+        """Check that a path exists. See :func:`Filesystem.resolve`.
+
+        Args:
+
+            full_path (str): Full path to look up.
+
+        Returns:
+
+            bool: Whether the path exists.
+        """
+        return await self.__run(self.fs.resolve, full_path)
+
+    async def close(self) -> None:
+        """Wait for pending reads and release the image."""
+        await self.__run(self.fs.close)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,174 @@
+"""Packed bitmap helpers.
+
+Block and inode bitmaps are kept as the raw on-disk bytes rather than being
+expanded into one dictionary entry per bit. Bit ``n`` of a bitmap lives in
+byte ``n // 8`` at bit position ``n % 8`` (least significant bit first).
+"""
+
+from collections.abc import Mapping
+from typing import Iterator, Union
+
+# Number of bits in a 64 bit word. Whole words that are all zeros or all ones
+# are skipped/emitted without looking at individual bits.
+WORD_BITS = 64
+WORD_BYTES = WORD_BITS // 8
+WORD_ALL_SET = (1 << WORD_BITS) - 1
+
+
+def bitmap_test(raw: Union[bytes, bytearray, memoryview], index: int) -> int:
+    """Test a single bit.
+
+    Args:
+
+        raw (bytes): Packed bitmap.
+        index (int): Bit index relative to the start of the bitmap.
+
+    Returns:
+
+        int: 1 if the bit is set, 0 otherwise.
+    """
+
+    return (raw[index >> 3] >> (index & 7)) & 1
+
+
+def bitmap_count(raw: Union[bytes, bytearray, memoryview], number_of_bits: int) -> int:
+    """Count the set bits (popcount) of the first ``number_of_bits`` bits.
+
+    Args:
+
+        raw (bytes): Packed bitmap.
+        number_of_bits (int): Number of bits that are part of the bitmap.
+
+    Returns:
+
+        int: Number of set bits.
+    """
+
+    value = int.from_bytes(raw[:(number_of_bits + 7) // 8], 'little')
+    value &= (1 << number_of_bits) - 1
+    return bin(value).count("1")
+
+
+def bitmap_iter(raw: Union[bytes, bytearray, memoryview], number_of_bits: int,
+                first: int = 0, value: int = 1) -> Iterator[int]:
+    """Iterate over the positions of all bits equal to ``value``.
+
+    Generator. The bitmap is walked 64 bits at a time so runs of
+    completely free or completely used words cost a single comparison.
+
+    Args:
+
+        raw (bytes): Packed bitmap.
+        number_of_bits (int): Number of bits that are part of the bitmap.
+        first (int, optional): Number of the object described by bit 0. Defaults to 0.
+        value (int, optional): Bit value to look for, 1 or 0. Defaults to 1.
+
+    Returns:
+
+        int: ``first`` plus the index of a matching bit.
+    """
+
+    view = memoryview(raw)[:(number_of_bits + 7) // 8]
+    # A word/byte holding this value has no matching bits at all...
+    skip_word = 0 if value else WORD_ALL_SET
+    skip_byte = 0x00 if value else 0xFF
+
+    number_of_words = len(view) // WORD_BYTES
+    words = view[:number_of_words * WORD_BYTES].cast('Q') if number_of_words else ()
+    for word_number, word in enumerate(words):
+        if word == skip_word:
+            continue
+        base = word_number * WORD_BITS
+        if word == WORD_ALL_SET ^ skip_word:
+            # ...and one holding the opposite value matches on every bit.
+            yield from range(first + base, first + min(base + WORD_BITS, number_of_bits))
+            continue
+        yield from _byte_iter(view, base // 8, base // 8 + WORD_BYTES,
+                              number_of_bits, first, value, skip_byte)
+
+    yield from _byte_iter(view, number_of_words * WORD_BYTES, len(view),
+                          number_of_bits, first, value, skip_byte)
+
+
+def _byte_iter(view: memoryview, start: int, end: int, number_of_bits: int,
+               first: int, value: int, skip_byte: int) -> Iterator[int]:
+    """Bit by bit iteration over ``view[start:end]``. See :func:`bitmap_iter`."""
+
+    for byte_number in range(start, end):
+        byte = view[byte_number]
+        if byte == skip_byte:
+            continue
+        base = byte_number * 8
+        for bit in range(0, min(8, number_of_bits - base)):
+            if (byte >> bit) & 1 == value:
+                yield first + base + bit
+
+
+class BitmapView(Mapping):
+    """BitmapView.
+
+    Read-only ``dict``-like view of a packed bitmap keyed by block or inode
+    number with ``0``/``1`` values. Nothing is expanded up front, each lookup
+    tests a single bit.
+    """
+
+    __slots__ = ['raw', 'first', 'number_of_bits']
+
+    def __init__(self, raw: Union[bytes, bytearray, memoryview], first: int, number_of_bits: int):
+        """Create a view.
+
+        Args:
+
+            raw (bytes): Packed bitmap.
+            first (int): Number of the object described by bit 0.
+            number_of_bits (int): Number of bits that are part of the bitmap.
+        """
+        self.raw = raw
+        self.first = first
+        self.number_of_bits = number_of_bits
+
+    def __getitem__(self, key: int) -> int:
+        index = key - self.first
+        if index < 0 or index >= self.number_of_bits:
+            raise KeyError(key)
+        return bitmap_test(self.raw, index)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, int) and 0 <= key - self.first < self.number_of_bits
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.first, self.first + self.number_of_bits))
+
+    def __len__(self) -> int:
+        return self.number_of_bits
+
+    def set_keys(self) -> Iterator[int]:
+        """Keys whose bit is set.
+
+        Generator.
+
+        Returns:
+
+            int: A key (block/inode number) with a value of 1.
+        """
+        return bitmap_iter(self.raw, self.number_of_bits, self.first, 1)
+
+    def clear_keys(self) -> Iterator[int]:
+        """Keys whose bit is clear.
+
+        Generator.
+
+        Returns:
+
+            int: A key (block/inode number) with a value of 0.
+        """
+        return bitmap_iter(self.raw, self.number_of_bits, self.first, 0)
+
+    def count(self) -> int:
+        """Number of set bits.
+
+        Returns:
+
+            int: Number of keys with a value of 1.
+        """
+        return bitmap_count(self.raw, self.number_of_bits)
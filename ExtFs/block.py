@@ -3,10 +3,10 @@
 
 import io
 import pprint
-import struct
-from typing import AnyStr, Dict, Iterator
+from typing import Iterator
 
-from ExtFs.util import map_bitmap
+from ExtFs.bitmap import BitmapView, bitmap_count, bitmap_iter, bitmap_test
+from ExtFs.image import as_image
 
 
 class Ext3BlockBitmap:
@@ -18,12 +18,11 @@ class Ext3BlockBitmap:
     are allocated and unallocated. Will seek to the block bitmap table
     location according to the GDT passed in the constructor.
 
-    The block bitmap is read from a file-like object designated as :attr:`f`.
-    The table contents are read from :attr:`f` into a :class:`io.BytesIO`
-    object to avoid 1 - 4 byte read hits. If the bitmap size is a multiple of
-    4 then the bitmap is unpacked 4 bytes at a time. If the table is NOT a
-    multiple of 4 then it will be processed 1 byte at a time and a warning
-    message will be displayed to the console.
+    The block bitmap is read from a file-like object designated as :attr:`f`
+    in a single read and kept packed in :attr:`raw`, one bit per block.
+    Allocation lookups test a single bit and counts are done with a popcount
+    so no per-block objects are ever created. :attr:`bitmap` is still
+    available as a lazy ``dict``-like view for older callers.
 
     """
 
@@ -37,7 +36,8 @@ class Ext3BlockBitmap:
         'location_block',
         'location_bytes',
         'size_bytes',
-        'blocks'
+        'raw',
+        '__view',
     ]
 
     def __str__(self):
@@ -59,7 +59,7 @@ class Ext3BlockBitmap:
             raise ValueError("Must provide superblock object!")
         if gdt is None:
             raise ValueError("Must provide gdt object!")
-        self.f = f
+        self.f = as_image(f)
         self.__sb = sb
         self.__gdt = gdt
 
@@ -76,9 +76,9 @@ class Ext3BlockBitmap:
         # Double slash (//) is integer division and the modulo addition will
         # do the same as math.ceil()
         self.size_bytes = self.num_blocks // 8 + (self.num_blocks % 8 > 0)
-        self.blocks = {}
-        if self.bitmap_number == 0:
-            self.blocks[0] = 1
+        # Packed bitmap, filled in by run()
+        self.raw = bytearray(self.size_bytes)
+        self.__view = None
 
     @property
     def number_of_blocks(self) -> int:
@@ -111,14 +111,68 @@ class Ext3BlockBitmap:
         return self.size_bytes
 
     @property
-    def bitmap(self) -> Dict:
+    def bitmap(self) -> BitmapView:
         """Bitmap.
 
-        :returns: Bitmap contents as a dict.
-        :rtype: dict
+        Lazy ``dict``-like view keyed by block number with ``0``/``1``
+        values. Nothing is expanded until a key is looked up.
+
+        :returns: Bitmap contents as a read-only mapping.
+        :rtype: BitmapView
+
+        """
+        if self.__view is None:
+            self.__view = BitmapView(self.raw, self.start_block, self.num_blocks)
+        return self.__view
+
+    @property
+    def blocks(self) -> BitmapView:
+        """Wrapper to bitmap.
+
+        :returns: Bitmap contents as a read-only mapping.
+        :rtype: BitmapView
+
+        """
+        return self.bitmap
+
+    @property
+    def number_of_allocated_blocks(self) -> int:
+        """Number of allocated blocks according to the bitmap.
+
+        Returns:
 
+            int: Number of set bits in the bitmap.
         """
-        return self.blocks
+        return bitmap_count(self.raw, self.num_blocks)
+
+    @property
+    def number_of_unallocated_blocks(self) -> int:
+        """Number of unallocated blocks according to the bitmap.
+
+        Returns:
+
+            int: Number of clear bits in the bitmap.
+        """
+        return self.num_blocks - self.number_of_allocated_blocks
+
+    def is_allocated(self, block_number: int) -> bool:
+        """Is a block allocated?
+
+        Args:
+
+            block_number (int): Block number.
+
+        Raises:
+            ValueError: If block number does not belong to this bitmap.
+
+        Returns:
+
+            bool: Whether or not the block is allocated.
+        """
+        index = block_number - self.start_block
+        if index < 0 or index >= self.num_blocks:
+            raise ValueError(f"Block {block_number} is not in block bitmap {self.bitmap_number}!")
+        return bitmap_test(self.raw, index) == 1
 
     @property
     def allocated_blocks(self) -> Iterator[int]:
@@ -130,9 +184,7 @@ class Ext3BlockBitmap:
 
             int: An allocated block number from the block group bitmap.
         """
-        for block_number in self.blocks:
-            if self.blocks[block_number] == 1:
-                yield block_number
+        return bitmap_iter(self.raw, self.num_blocks, self.start_block, 1)
 
     @property
     def unallocated_blocks(self) -> Iterator[int]:
@@ -144,9 +196,7 @@ class Ext3BlockBitmap:
 
             int: An unallocated block number from the block group bitmap.
         """
-        for block_number in self.blocks:
-            if self.blocks[block_number] == 0:
-                yield block_number
+        return bitmap_iter(self.raw, self.num_blocks, self.start_block, 0)
 
     def run(self) -> None:
         """Read block bitmap.
@@ -167,95 +217,19 @@ class Ext3BlockBitmap:
             # actually allocated
             # if self.__gdt.EXT4_BG_INODE_UNINIT is True or self.__gdt.EXT4_BG_BLOCK_UNINIT is True:
             if self.__gdt.EXT4_BG_BLOCK_UNINIT:
-                # Block bitmap is uninitialized so we need create one full of zeros
-                for x in range(self.start_block, self.start_block + self.num_blocks):
-                    self.blocks[x] = 0
+                # Block bitmap is uninitialized so it stays full of zeros
                 self.__sb = None
                 self.__gdt = None
                 return
 
-        # Block bitmap is initialized so seek to its location according to the GDT.
-        self.f.seek(self.location_bytes)
-
-        # If the bitmap is a multiple of 4 then read it 4 bytes at a time
-        # as this is supposed to make it faster...
-        if self.size_bytes % 4 == 0:
-            x = 0
-            for _ in range(0, self.size_bytes // 4):
-                # Read in 4 byte increments
-                # conv_tuple = self.unpack.u8u8u8u8()
-                conv_tuple = struct.unpack("<BBBB", self.f.read(4))
-                for conv in conv_tuple:
-                    self.__do_conv(conv, x)
-                    x += 1
-        else:
-            # Read only 1 byte at a time.
-            # Can be slow depending on the backing of the file-like object.
-            for x in range(0, self.size_bytes):
-                conv = self.__u8()
-                self.__do_conv(conv, x)
+        # Block bitmap is initialized so read the whole thing in one go
+        # from its location according to the GDT.
+        buf = self.f.read_at(self.location_bytes, self.size_bytes)
+        self.raw[:len(buf)] = buf
 
         self.__sb = None
         self.__gdt = None
 
-    def __do_conv(self, conv: AnyStr, x: int) -> None:
-        """conv.
-
-        Calculates which values in the a singular byte of a bitmap
-        are allocated/unallocated. Results get stored in self.blocks.
-        Block number is calculated as:
-        ```start_block + ((x * 8) + y)```
-        Where ```y``` is the bit in the byte, ```x``` being the iteration
-        number, typically the byte number we are on.
-
-        If the starting block number were 0 then for the first byte:
-        ```0 + ((0 * 8) + y)```
-        Would yield values 0 - 7 and the second iteration:
-        ```0 + ((1 * 8) + y)```
-        Would yield values 8-15.
-
-
-        Args:
-
-            conv (AntStr): Byte value to look at.
-            x (int): Iteration number.
-        """
-        if conv == 0x00:
-            # Byte is 0x00 so all blocks are unallocated.
-            # Create block entries assigned as 0 so we can
-            # look up their allocated status later.
-            for y in range(0, 8):
-                # block_num = self.start_block + ((x * 8) + y) + 1
-                # 8191 unallocated.
-                # 8192 set unallocated but actually allocated.
-                # 8193 allocated.
-                # 8192 should be allocated but is reflected in 8193.
-                # 262144 IndexError
-                # Need to shift allocations down by 1.
-                block_num = self.start_block + ((x * 8) + y)
-                self.blocks[block_num] = 0
-            return
-
-        alloc = map_bitmap(conv, (
-            (0x1, 0),
-            (0x2, 1),
-            (0x4, 2),
-            (0x8, 3),
-            (0x10, 4),
-            (0x20, 5),
-            (0x40, 6),
-            (0x80, 7)
-        ))
-
-        for y in range(0, 8):
-            # block_num = self.start_block + ((x * 8) + y) + 1
-            block_num = self.start_block + ((x * 8) + y)
-            if y in alloc:
-                status = 1
-            else:
-                status = 0
-            self.blocks[block_num] = status
-
     def clean_for_pickle(self) -> None:
         """Clean for pickle.
 
@@ -265,43 +239,6 @@ class Ext3BlockBitmap:
         self.__sb = None
         self.__gdt = None
 
-    def __le_char(self) -> int:
-        """Get signed char(1 byte/8bits)
-        """
-        return struct.unpack("<b", self.f.read(1))[0]
-
-    def __le_uchar(self) -> int:
-        """Get unsigned char (1 byte/8bits)
-        """
-        return struct.unpack("<B", self.f.read(1))[0]
-
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
-        """
-        return struct.unpack("<I", self.f.read(4))[0]
-
-    def __le_ushort(self) -> int:
-        """Get little endian unsigned short.
-        """
-        return struct.unpack("<H", self.f.read(2))[0]
-
-    def __le_ulonglong(self) -> int:
-        """Get little endian unsigned long long (8 bytes/64 bits)
-        """
-        return struct.unpack("<Q", self.f.read(8))[0]
-
-    def __u8(self) -> int:
-        return self.__le_uchar()
-
-    def __le32(self) -> int:
-        return self.__le_uint()
-
-    def __le16(self) -> int:
-        return self.__le_ushort()
-
-    def __le64(self) -> int:
-        return self.__le_ulonglong()
-
 
 class Ext3Block:
     """Ext3Block.
@@ -390,7 +327,7 @@ class Ext3BlockGroup:
             # We calculate this by subtracting the sum of all the other groups number
             # of blocks from the total number of blocks reported by the superblock.
             used_blocks = self.group_number * sb.s_blocks_per_group
-            remaining_blocks = sb.s_blocks_count_lo - used_blocks
+            remaining_blocks = sb.blocks_count - used_blocks
             self.num_blocks = remaining_blocks
         else:
             self.num_blocks = sb.s_blocks_per_group
@@ -401,10 +338,10 @@ class Ext3BlockGroup:
         self.blocks = {}
         self.start_offset = None
         self.fs_parent_id = None
-        self.block_bitmap = {}
+        self.block_bitmap = BitmapView(bytearray(), self.start_block, 0)
 
-        self.number_of_allocated_blocks = self.num_blocks - gdt.bg_free_blocks_count_lo
-        self.number_of_unallocated_blocks = gdt.bg_free_blocks_count_lo
+        self.number_of_allocated_blocks = self.num_blocks - gdt.free_blocks_count
+        self.number_of_unallocated_blocks = gdt.free_blocks_count
 
 
     @property
@@ -428,9 +365,7 @@ class Ext3BlockGroup:
             int: Generator of all allocated block numbers.
         """
 
-        for block in self.block_bitmap:
-            if self.block_bitmap[block] == 1:
-                yield block
+        return self.block_bitmap.set_keys()
 
     @property
     def unallocated_blocks(self) -> Iterator[int]:
@@ -443,9 +378,7 @@ class Ext3BlockGroup:
             int: Generator of all unallocated block numbers.
         """
 
-        for block in self.block_bitmap:
-            if self.block_bitmap[block] == 0:
-                yield block
+        return self.block_bitmap.clear_keys()
 
     def get_block(self, block_number: int) -> Ext3Block:
         """Gets a block instance for a block number.
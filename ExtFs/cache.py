@@ -0,0 +1,252 @@
+"""Caches.
+
+Metadata (indirect blocks, extent nodes, directory blocks, bitmaps and inode
+table blocks) is read through a :class:`CachedImage` so blocks that are
+needed again, like the top level blocks of a double indirect map, are served
+from memory instead of the image.
+
+Parsed inodes, directories and inode tables are kept in bounded
+:class:`LRUCache` mappings owned by :class:`ExtFs.ext3.Ext3Filesystem`.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Union
+
+# Default byte budget of a filesystem's block cache
+DEFAULT_CACHE_SIZE = 16 * 1024 * 1024
+
+# Default number of parsed inodes and directories kept by a filesystem
+DEFAULT_INODE_CACHE_ITEMS = 65536
+DEFAULT_DIR_CACHE_ITEMS = 4096
+
+# Default number of inode tables kept by a filesystem, bulk read tables hold
+# a record of every used inode of their group
+DEFAULT_INODE_TABLE_CACHE_ITEMS = 64
+
+
+class LRUCache(MutableMapping):
+    """LRUCache.
+
+    Mapping that keeps at most ``max_items`` items, dropping the least
+    recently used one when full. Looking up an item marks it as used.
+    """
+
+    __slots__ = ['max_items', 'evictions', 'entries', 'lock']
+
+    def __init__(self, max_items: int = None):
+        """Create an LRU mapping.
+
+        Args:
+
+            max_items (int, optional): Maximum number of items, None for no limit and 0 to
+                keep nothing. Defaults to None.
+        """
+        if max_items is not None and max_items < 0:
+            raise ValueError("max_items must be >= 0!")
+        self.max_items = max_items
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key: Any) -> Any:
+        with self.lock:
+            value = self.entries[key]
+            self.entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if self.max_items == 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if self.max_items is not None:
+                while len(self.entries) > self.max_items:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+
+    def __delitem__(self, key: Any) -> None:
+        with self.lock:
+            del self.entries[key]
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.entries
+
+    def __iter__(self) -> Iterator:
+        # Copy so items can be looked up (and reordered) while iterating
+        return iter(list(self.entries))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class BlockCache:
+    """BlockCache.
+
+    LRU cache of blocks keyed by block number with a byte budget. Safe to
+    share between threads.
+    """
+
+    __slots__ = ['max_bytes', 'size', 'hits', 'misses', 'evictions', 'blocks', 'lock']
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_SIZE):
+        """Create a block cache.
+
+        Args:
+
+            max_bytes (int, optional): Byte budget. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0!")
+        self.max_bytes = max_bytes
+        # Bytes currently cached
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, block_number: int) -> bool:
+        return block_number in self.blocks
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def get(self, block_number: int) -> Union[bytes, None]:
+        """Get a block and mark it as recently used.
+
+        Args:
+
+            block_number (int): Block number.
+
+        Returns:
+
+            bytes or None: Block data or None if the block is not cached.
+        """
+        with self.lock:
+            data = self.blocks.get(block_number)
+            if data is None:
+                self.misses += 1
+                return None
+            self.blocks.move_to_end(block_number)
+            self.hits += 1
+            return data
+
+    def put(self, block_number: int, data: bytes) -> None:
+        """Add a block, evicting the least recently used blocks over budget.
+
+        Args:
+
+            block_number (int): Block number.
+            data (bytes): Block data.
+        """
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.blocks.pop(block_number, None)
+            if old is not None:
+                self.size -= len(old)
+            self.blocks[block_number] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.blocks.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every block. Counters are kept."""
+        with self.lock:
+            self.blocks.clear()
+            self.size = 0
+
+    @property
+    def stats(self) -> Dict:
+        """Cache statistics.
+
+        Returns:
+
+            dict: hits, misses, evictions, blocks and bytes cached.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'blocks': len(self.blocks),
+            'bytes': self.size,
+        }
+
+
+class CachedImage:
+    """CachedImage.
+
+    Image object (see :mod:`ExtFs.image`) that serves reads of up to
+    ``max_read_blocks`` blocks through a :class:`BlockCache`. Missing
+    consecutive blocks are read from the underlying image in one read.
+    Larger reads go straight to the image.
+    """
+
+    __slots__ = ['image', 'cache', 'block_size', 'max_read_blocks']
+
+    def __init__(self, image, cache: BlockCache, block_size: int, max_read_blocks: int = 16):
+        """Wrap an image.
+
+        Args:
+
+            image: Image object to read from.
+            cache (BlockCache): Cache to use, possibly shared.
+            block_size (int): Block size of the filesystem.
+            max_read_blocks (int, optional): Largest read served through the cache. Defaults to 16.
+        """
+        self.image = image
+        self.cache = cache
+        self.block_size = block_size
+        self.max_read_blocks = max_read_blocks
+
+    def view_at(self, offset: int, length: int) -> Union[bytes, memoryview]:
+        """Buffer of ``length`` bytes at ``offset``. See :func:`ExtFs.image.FileImage.view_at`."""
+        block_size = self.block_size
+        first = offset // block_size
+        last = (offset + length - 1) // block_size
+        if length <= 0 or last - first >= self.max_read_blocks:
+            return self.image.view_at(offset, length)
+
+        chunks = []
+        block_number = first
+        while block_number <= last:
+            data = self.cache.get(block_number)
+            if data is not None:
+                chunks.append(data)
+                block_number += 1
+                continue
+            # Read this block and the missing blocks following it in one go
+            end = block_number + 1
+            while end <= last and end not in self.cache:
+                end += 1
+            buf = self.image.read_at(block_number * block_size, (end - block_number) * block_size)
+            for n in range(block_number, end):
+                data = buf[(n - block_number) * block_size:(n - block_number + 1) * block_size]
+                if not data:
+                    break
+                self.cache.put(n, data)
+                chunks.append(data)
+            block_number = end
+
+        start = offset - first * block_size
+        if len(chunks) == 1:
+            return memoryview(chunks[0])[start:start + length]
+        return memoryview(b"".join(chunks))[start:start + length]
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes at ``offset``. See :func:`ExtFs.image.FileImage.read_at`."""
+        return bytes(self.view_at(offset, length))
+
+    def readinto_at(self, offset: int, buf: memoryview) -> int:
+        """Fill ``buf``, bypassing the cache. See :func:`ExtFs.image.FileImage.readinto_at`."""
+        return self.image.readinto_at(offset, buf)
+
+    def close(self) -> None:
+        """Drop the cached blocks, the image belongs to the filesystem."""
+        self.cache.clear()
@@ -1,12 +1,16 @@
 """Ext3 directory classes.
 """
 
+import bisect
 import io
 import struct
-from typing import Union
+from typing import Dict, List, Tuple, Union
 
 import more_itertools
 
+from ExtFs.dirhash import DX_HASH_TEA, DX_HASH_UNSIGNED_OFFSET, dirhash
+from ExtFs.image import as_image
+
 D_FILE_TYPE = {
     0: 'unknown',
     1: 'file',
@@ -19,10 +23,43 @@ D_FILE_TYPE = {
 }
 
 UNPACK_DIRECTORY_HASH_BLOCK = struct.Struct("<II")
+# struct ext4_dir_entry_2 / ext4_dir_entry header: inode, rec_len, name_len(, file_type)
+UNPACK_DIRECTORY_ENTRY = struct.Struct("<IHBB")
+UNPACK_DIRECTORY_ENTRY_NO_FILETYPE = struct.Struct("<IHH")
+# dx_root: "." and ".." entries followed by struct dx_root_info, limit, count and block
+UNPACK_DIRECTORY_HASH_ROOT = struct.Struct("<IHBB4sIHBB4sIBBBBHHI")
+# dx_node: empty fake directory entry followed by limit, count and block
+UNPACK_DIRECTORY_HASH_NODE = struct.Struct("<8xHHI")
 UNPACK_LE32 = struct.Struct("<I")
 UNPACK_U8 = struct.Struct("<B")
 UNPACK_LE16 = struct.Struct("<H")
 
+# rec_len of an entry filling a whole 64KiB block
+EXT4_MAX_REC_LEN = 0xFFFF
+
+
+def rec_len_from_disk(rec_len: int, block_size: int) -> int:
+    """Decode an on-disk ``rec_len``.
+
+    With 64KiB or larger blocks a length of 65536 doesn't fit in 16 bits, it
+    is stored as ``EXT4_MAX_REC_LEN`` or 0 and the low two bits (always zero
+    in a real length) hold bits 16-17.
+
+    Args:
+
+        rec_len (int): rec_len as stored.
+        block_size (int): Block size of filesystem.
+
+    Returns:
+
+        int: Length of the entry in bytes.
+    """
+    if block_size < 65536:
+        return rec_len
+    if rec_len in (EXT4_MAX_REC_LEN, 0):
+        return block_size
+    return (rec_len & 65532) | ((rec_len & 3) << 16)
+
 class Ext3DirectoryHashTreeRoot:
     """Ext3DirectoryHashTreeRoot.
 
@@ -70,17 +107,17 @@ class Ext3DirectoryHashTreeRoot:
         #     raise ValueError("Must provide a positive integer value for block_location!")
         if block_size is None:
             raise ValueError("Must provide a positive integer value for block_size!")
-        self.f = f
+        self.f = as_image(f)
 
         self.INCOMPAT_LARGEDIR = False
 
         self.block_location = block_location
         self.block_size = block_size
 
-        # If block_location is None then assume that the file handle
-        # pointer is currently where it needs to be
+        # If block_location is None then assume that f holds just
+        # the block to be read
         if self.block_location is None:
-            self.byte_start = self.f.tell()
+            self.byte_start = 0
         else:
             self.byte_start = block_location * block_size
         self.byte_end = self.byte_start + block_size
@@ -116,40 +153,27 @@ class Ext3DirectoryHashTreeRoot:
         """Run.
         """
 
-        # Go to the byte offset. This will won't seek if block_location
-        # was none when the constructor was called.
-        self.f.seek(self.byte_start)
-        # start_offset = self.f.tell()
-
-        self.dot_inode = UNPACK_LE32.unpack(self.f.read(4))[0]
-        self.dot_rec_len = UNPACK_LE16.unpack(self.f.read(2))[0]
-        self.dot_name_len = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dot_file_type = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dot_name = self.f.read(4).decode('utf-8')
-        self.dotdot_inode = UNPACK_LE32.unpack(self.f.read(4))[0]
-        self.dotdot_rec_len = UNPACK_LE16.unpack(self.f.read(2))[0]
-        self.dotdot_name_len = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dotdot_file_type = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dotdot_name = self.f.read(4).decode('utf-8')
-        self.dx_root_info_reserved_zero = UNPACK_LE32.unpack(self.f.read(4))[0]
-        self.dx_root_info_hash_version = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dx_root_info_info_length = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dx_root_info_indirect_levels = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.dx_root_info_unused_flags = UNPACK_U8.unpack(self.f.read(1))[0]
-        self.limit = UNPACK_LE16.unpack(self.f.read(2))[0]
-        self.count = UNPACK_LE16.unpack(self.f.read(2))[0]
-        self.block = UNPACK_LE32.unpack(self.f.read(4))[0]
+        buf = self.f.view_at(self.byte_start, self.block_size)
+
+        (self.dot_inode, self.dot_rec_len, self.dot_name_len, self.dot_file_type, dot_name,
+         self.dotdot_inode, self.dotdot_rec_len, self.dotdot_name_len, self.dotdot_file_type,
+         dotdot_name, self.dx_root_info_reserved_zero, self.dx_root_info_hash_version,
+         self.dx_root_info_info_length, self.dx_root_info_indirect_levels,
+         self.dx_root_info_unused_flags, self.limit, self.count,
+         self.block) = UNPACK_DIRECTORY_HASH_ROOT.unpack_from(buf, 0)
+        self.dot_name = dot_name.decode('utf-8')
+        self.dotdot_name = dotdot_name.decode('utf-8')
 
         # Perform some sanity checks to verify if this is
         # a hashed entry or not.
         if not self.__check_tree():
             return False
 
-        for _ in range(0, self.count - 1):
+        # dx_entry array follows the 0x28 byte header
+        for n in range(0, self.count - 1):
             entry = {}
-            # entry['hash'] = self.__le32()
-            # entry['block'] = self.__le32()
-            entry['hash'], entry['block'] = UNPACK_DIRECTORY_HASH_BLOCK.unpack(self.f.read(8))
+            offset = 0x28 + n * 8
+            entry['hash'], entry['block'] = UNPACK_DIRECTORY_HASH_BLOCK.unpack_from(buf, offset)
             self.entries.append(entry)
 
         return True
@@ -181,9 +205,10 @@ class Ext3DirectoryHashTreeRoot:
                 return False
 
         # Check limit size. Limit size should be block_size - the header (0x28 bytes)
-        # that we just processed divided by 8 (the size of dx_entry) plus 1
-        limit_size = ((self.block_size - 0x28) / 8) + 1
-        if limit_size != self.limit:
+        # that we just processed divided by 8 (the size of dx_entry) plus 1.
+        # With metadata_csum a dx_tail takes the space of one more entry.
+        limit_size = ((self.block_size - 0x28) // 8) + 1
+        if self.limit not in (limit_size, limit_size - 1):
             # Not an index!
             return False
 
@@ -273,16 +298,15 @@ class Ext3DirectoryClassic:
 
             block_location (int): Block number where directory resides.
             block_size (int): Size of blocks on filesystem according to the superblock.
-            blocks ([type], optional): [description]. Defaults to None.
+            blocks (List[int], optional): Blocks holding directory entries. Defaults to None.
             inode_info ([type], optional): [description]. Defaults to None.
-            f (io.BytesIO): File-like object containing directory.
+            f (io.BytesIO): File-like or image object containing directory.
         """
         if block_location is None:
             raise ValueError("Must provide a positive integer value for block_location!")
         if block_size is None:
             raise ValueError("Must provide a positive integer value for block_size!")
-        self.f = f
-
+        self.f = as_image(f)
 
         self.blocks = blocks
         self.block_location = block_location
@@ -327,93 +351,83 @@ class Ext3DirectoryClassic:
         return block_adjusted + relative_offset
 
     def run(self) -> None:
-        """Read directory contents."""
-
-        original_starting_offset = (self.blocks[0] * self.block_size) - self.block_size
-        # Only seek to zero since we are using a cache
-        self.f.seek(0)
-
-        # for i, block in enumerate(self.blocks):
-        for _ in self.blocks:
-            # Just seek forward i number of self.block_size
-            # self.f.seek((i * self.block_size))
-            # relative_start_offset = self.f.tell()
-
-            block_bytes_read = 0
-            block_bytes_remaining = self.block_size
-            entry_number = 0
-            while True:
-                # start_offset = self.f.tell()
-                start_offset = original_starting_offset + self.f.tell()
-                inode = UNPACK_LE32.unpack(self.f.read(4))[0]
-                rec_len = UNPACK_LE16.unpack(self.f.read(2))[0]
-                if not self.INCOMPAT_FILETYPE:
-                    # name_len is le16 and there is no file_type!
-                    name_len = UNPACK_LE16.unpack(self.f.read(2))[0]
-                    file_type = None
-                elif self.INCOMPAT_FILETYPE:
-                    # name_len is u8 and there is file_type!
-                    name_len = UNPACK_U8.unpack(self.f.read(1))[0]
-                    file_type = UNPACK_U8.unpack(self.f.read(1))[0]
-                    # Check to see if file_type is a legal value
-                    if file_type < 0 or file_type > 7:
-                        # 2019-11-19: Not entirely sure what this means when this branch
-                        # of code is reached but I've seen this occur when the directory
-                        # entries of INCOMPAT_FILETYPE have finished yet reading of the
-                        # directory entry continues to happen. I'm going to go ahead and
-                        # assume that getting this error is OK as it indicates we've reached
-                        # the end of the directory listings.
-                        # raise RuntimeError(msg)
-                        break
-                else:
-                    msg = "INCOMPAT_FILETYPE not True/False! Is: %s!\n" % self.INCOMPAT_FILETYPE
-                    raise RuntimeError(msg)
-                if rec_len == 0:
-                    self.f.seek(-7, 1)
-                    break
-                if name_len == 0:
-                    self.f.seek(-8, 1)
-                    break
-
-                e = Ext3DirectoryEntryVersion2()
-                e.byte_start = start_offset
-                e.inode = inode
-                e.rec_len = rec_len
-                e.byte_end = e.byte_start + e.rec_len
-                e.byte_len = e.rec_len
-                e.byte_start_hex = hex(e.byte_start)
-                e.name_len = name_len
-                e.file_type = file_type
-                if self.INCOMPAT_FILETYPE:
-                    # Only need to convert filetype to string if INCOMPAT_FILETYPE is True
-                    e.file_type_str = D_FILE_TYPE[e.file_type]
-                e.name = self.f.read(e.name_len).decode('utf-8')
-
-                current_offset = self.f.tell()
-                # bytes_read = current_offset - start_offset
-                bytes_read = current_offset - (start_offset - original_starting_offset)
-                bytes_remaining = e.rec_len - bytes_read
-                if bytes_read != e.rec_len:
-                    self.f.seek(bytes_remaining, 1)
-                block_bytes_read += bytes_read
-                block_bytes_read += bytes_remaining
-
-                if self.entries is None:
-                    self.entries = []
-                self.entries.append(e)
-                entry_number += 1
-
-                if block_bytes_remaining < e.rec_len:
-                    break
-                block_bytes_remaining -= bytes_read
-                block_bytes_remaining -= bytes_remaining
-
-                if block_bytes_remaining == 0:
-                    # No more bytes to read from this block so break
-                    break
+        """Read directory contents.
+
+        Each run of contiguous blocks is read with a single read and every
+        block is parsed on its own straight from that buffer.
+        """
+
+        for group in more_itertools.consecutive_groups(self.blocks):
+            group_blocks = list(group)
+            buf = self.f.view_at(group_blocks[0] * self.block_size,
+                                 len(group_blocks) * self.block_size)
+            for n, block in enumerate(group_blocks):
+                self.__read_block(buf, n * self.block_size, block)
 
         return
 
+    def __read_block(self, buf: Union[bytes, memoryview], base: int, block_number: int) -> None:
+        """Parse the directory entries of one block.
+
+        Entries are chained by ``rec_len`` and never cross a block boundary.
+        Entries with a ``name_len`` of zero (unused entries and the
+        metadata_csum tail at the end of a block) are skipped.
+
+        Args:
+
+            buf (bytes): Buffer holding the block.
+            base (int): Offset of the block in ``buf``.
+            block_number (int): Block number of the block.
+        """
+
+        pos = 0
+        while pos <= self.block_size - 8:
+            offset = base + pos
+            if self.INCOMPAT_FILETYPE:
+                # name_len is u8 and there is file_type!
+                inode, rec_len, name_len, file_type = \
+                    UNPACK_DIRECTORY_ENTRY.unpack_from(buf, offset)
+            else:
+                # name_len is le16 and there is no file_type!
+                inode, rec_len, name_len = \
+                    UNPACK_DIRECTORY_ENTRY_NO_FILETYPE.unpack_from(buf, offset)
+                file_type = None
+
+            rec_len = rec_len_from_disk(rec_len, self.block_size)
+            if rec_len < 8 or pos + rec_len > self.block_size:
+                # Corrupt or not a directory block
+                break
+            pos += rec_len
+            if name_len == 0:
+                continue
+            # Check to see if file_type is a legal value
+            if file_type is not None and file_type > 7:
+                # 2019-11-19: Not entirely sure what this means when this branch
+                # of code is reached but I've seen this occur when the directory
+                # entries of INCOMPAT_FILETYPE have finished yet reading of the
+                # directory entry continues to happen. I'm going to go ahead and
+                # assume that getting this error is OK as it indicates we've reached
+                # the end of the directory listings.
+                break
+
+            e = Ext3DirectoryEntryVersion2()
+            e.byte_start = block_number * self.block_size + offset - base
+            e.inode = inode
+            e.rec_len = rec_len
+            e.byte_end = e.byte_start + e.rec_len
+            e.byte_len = e.rec_len
+            e.byte_start_hex = hex(e.byte_start)
+            e.name_len = name_len
+            e.file_type = file_type
+            if self.INCOMPAT_FILETYPE:
+                # Only need to convert filetype to string if INCOMPAT_FILETYPE is True
+                e.file_type_str = D_FILE_TYPE[e.file_type]
+            e.name = bytes(buf[offset + 8:offset + 8 + name_len]).decode('utf-8')
+
+            if self.entries is None:
+                self.entries = []
+            self.entries.append(e)
+
 
 class Ext3Directory:
     """Ext3Directory.
@@ -434,11 +448,15 @@ class Ext3Directory:
         'util',
         'blocks',
         'entries',
+        '__names',
         '__hash_root',
+        '__dx_nodes',
         '__COMPAT_DIR_INDEX',
         '__INCOMPAT_FILETYPE',
+        'INCOMPAT_LARGEDIR',
+        'hash_seed',
+        'hash_unsigned',
         'block_location_f',
-        'blocks_f',
     ]
 
     # def __str__(self):
@@ -453,11 +471,11 @@ class Ext3Directory:
 
         Args:
 
-            f (io.BytesIO): File-like object containing directory.
+            f (io.BytesIO): File-like or image object containing directory.
             block_size (int): Block size of filesystem.
             inode_info (Ext3Inode): Ext3Inode instance containing directory.
         """
-        self.f = f
+        self.f = as_image(f)
         self.block_size = block_size
         self.inode_info = inode_info
 
@@ -465,15 +483,23 @@ class Ext3Directory:
 
         self.blocks = None
         self.entries = list()
+        # Entries by name for lookup(), built on its first use
+        self.__names = None
         self.__hash_root = None
+        # Parsed interior hash tree nodes by logical block, see lookup()
+        self.__dx_nodes = {}
         # Superblock feature indicating that directory indexing is enabled
         self.__COMPAT_DIR_INDEX = False
         # Superblock feature indicating that the file type is stored
         # with the directory information. This makes the directory struct
         # slightly different.
         self.__INCOMPAT_FILETYPE = False
+        # Superblock values needed to hash names for a hash tree lookup
+        self.INCOMPAT_LARGEDIR = False
+        self.hash_seed = None
+        self.hash_unsigned = False
+        # Buffer of the block being parsed, dropped once entries are parsed
         self.block_location_f = None
-        self.blocks_f = None
     # pylint: enable=line-too-long
 
     @property
@@ -524,34 +550,32 @@ class Ext3Directory:
             raise ValueError("INCOMPAT_FILETYPE must be True/False!")
         self.__INCOMPAT_FILETYPE = value
 
-    def run(self) -> None:
-        """Run"""
+    def __load_blocks(self) -> List[int]:
+        """Blocks of the directory in logical order.
+
+        Returns:
+
+            List[int]: Physical block numbers.
+        """
 
         if self.blocks is None:
             self.blocks = self.inode_info.dblocks
 
         # Expecting self.blocks to be a list from either i_block or extents via dblocks
-        if isinstance(self.blocks, list):
-            # Check first if we even have blocks
-            if not self.blocks:
-                return
-            # First block in inode should be the has tree root entry
-            block_location = self.blocks[0]
-        else:
+        if not isinstance(self.blocks, list):
             # Expecting list but try this anyway
-            block_location = self.blocks
+            self.blocks = [self.blocks]
+        return self.blocks
 
-        self.block_location_f = io.BytesIO(self.__seek_and_read_block(block_location))
-        self.__seek_to_block(block_location)
+    def run(self) -> None:
+        """Run"""
 
-        # Seek and read all the block data
-        self.blocks_f = io.BytesIO(b"")
-        for group in more_itertools.consecutive_groups(self.blocks):
-            group_blocks = list(group)
-            self.__seek_to_block(group_blocks[0])
-            self.blocks_f.write(self.f.read(self.block_size * len(group_blocks)))
+        # Check first if we even have blocks
+        if not self.__load_blocks():
+            return
 
-        self.blocks_f.seek(0)
+        # First block in inode should be the has tree root entry
+        self.block_location_f = self.__read_block(self.blocks[0])
 
         # If COMPAT_DIR_INDEX is in use then check for a hash table first
         if self.COMPAT_DIR_INDEX is True and self.inode_info.EXT4_INDEX_FL is True:
@@ -563,7 +587,7 @@ class Ext3Directory:
             else:
                 # We ARE NOT a hash tree
                 # Do a straight linear read
-                dir_ent = self.__read_linear(block_location)
+                dir_ent = self.__read_linear(self.blocks)
 
                 # Add entries if there are any to add
                 if dir_ent is not None:
@@ -573,7 +597,7 @@ class Ext3Directory:
 
         else:
             # Do a straight linear read if COMPAT_DIR_INDEX is False
-            dir_ent = self.__read_linear(block_location)
+            dir_ent = self.__read_linear(self.blocks)
 
             # Add entries if there are any to add
             if dir_ent is not None:
@@ -581,7 +605,140 @@ class Ext3Directory:
                     raise RuntimeError("Did not find any entries in directory!")
                 self.entries.extend(dir_ent.entries)
 
-        self.block_location_f.close()
+        # Drop the buffer so no view into the image outlives parsing
+        self.block_location_f = None
+
+    def lookup(self, name: str) -> Union[Ext3DirectoryEntryVersion2, None]:
+        """Find a single entry by name.
+
+        If :func:`run` has read the entries already they are searched.
+        Otherwise a hash tree is descended to the leaf block that holds the
+        hash of ``name`` and only that leaf is read. Directories without a
+        hash tree are read linearly once. Later lookups reuse the parsed
+        dx_root or the entries by name.
+
+        Args:
+
+            name (str): Name of the entry.
+
+        Returns:
+
+            Ext3DirectoryEntryVersion2 or None: Entry or None if there is no such name.
+        """
+
+        if self.__names is None and self.entries:
+            self.__names = self.__index_names(self.entries)
+        if self.__names is not None:
+            return self.__names.get(name)
+        if not self.__load_blocks():
+            return None
+
+        leaf_blocks = self.blocks
+        if self.COMPAT_DIR_INDEX is True and self.inode_info.EXT4_INDEX_FL is True:
+            # The dx_root is parsed once and reused by later lookups, False
+            # when the directory turned out not to be a hash tree
+            if self.__hash_root is None:
+                self.block_location_f = self.__read_block(self.blocks[0])
+                self.__hash_root = self.__check_for_hash_tree() or False
+                self.block_location_f = None
+            if self.__hash_root:
+                leaf_blocks = self.__find_leaf_blocks(self.__hash_root, name.encode('utf-8'))
+
+        if leaf_blocks is self.blocks:
+            # No hash tree, read every block once
+            self.__names = self.__index_names(self.__read_linear(self.blocks).entries or [])
+            return self.__names.get(name)
+        for block in leaf_blocks:
+            dir_ent = self.__read_linear([block])
+            for e in dir_ent.entries or []:
+                if e.name == name:
+                    return e
+        return None
+
+    @staticmethod
+    def __index_names(
+            entries: List[Ext3DirectoryEntryVersion2]) -> Dict[str, Ext3DirectoryEntryVersion2]:
+        """Entries by name, the first one wins if a name is repeated.
+
+        Args:
+
+            entries (List[Ext3DirectoryEntryVersion2]): Entries in directory order.
+
+        Returns:
+
+            Dict[str, Ext3DirectoryEntryVersion2]: Entries by name.
+        """
+
+        names = {}
+        for e in entries:
+            names.setdefault(e.name, e)
+        return names
+
+    def __find_leaf_blocks(self, hash_root: Ext3DirectoryHashTreeRoot, name: bytes) -> List[int]: # pylint: disable=line-too-long
+        """Descend a hash tree to the leaf blocks that may hold a name.
+
+        Args:
+
+            hash_root (Ext3DirectoryHashTreeRoot): Parsed dx_root.
+            name (bytes): Name of the entry.
+
+        Returns:
+
+            List[int]: Physical block numbers of the leaf and of the following
+            leaves that continue a hash collision.
+        """
+
+        hash_version = hash_root.dx_root_info_hash_version
+        if hash_version <= DX_HASH_TEA and self.hash_unsigned:
+            hash_version += DX_HASH_UNSIGNED_OFFSET
+        name_hash, _ = dirhash(name, hash_version, self.hash_seed)
+
+        # (hash, logical block) pairs, the first entry has an implicit hash of 0
+        dx_entries = [(0, hash_root.block)]
+        dx_entries.extend((e['hash'], e['block']) for e in hash_root.entries)
+        for _ in range(hash_root.dx_root_info_indirect_levels):
+            at = self.__dx_search(dx_entries, name_hash)
+            logical_block = dx_entries[at][1]
+            if logical_block not in self.__dx_nodes:
+                self.__dx_nodes[logical_block] = self.__read_dx_node(logical_block)
+            dx_entries = self.__dx_nodes[logical_block]
+
+        at = self.__dx_search(dx_entries, name_hash)
+        leaves = [dx_entries[at][1]]
+        # Names with the same hash continue in the next leaf, marked by the
+        # low bit of its hash
+        for entry_hash, block in dx_entries[at + 1:]:
+            if not entry_hash & 1 or entry_hash & ~1 != name_hash:
+                break
+            leaves.append(block)
+        return [self.blocks[leaf] for leaf in leaves if leaf < len(self.blocks)]
+
+    @staticmethod
+    def __dx_search(dx_entries: List[Tuple[int, int]], name_hash: int) -> int:
+        """Index of the last dx_entry with a hash <= ``name_hash``."""
+        hashes = [entry_hash for entry_hash, _ in dx_entries]
+        return max(bisect.bisect_right(hashes, name_hash, 1) - 1, 0)
+
+    def __read_dx_node(self, logical_block: int) -> List[Tuple[int, int]]:
+        """Read the dx_entry array of an interior hash tree node.
+
+        Args:
+
+            logical_block (int): Block of the node within the directory.
+
+        Returns:
+
+            List[Tuple[int, int]]: (hash, logical block) pairs.
+        """
+
+        if logical_block >= len(self.blocks):
+            raise RuntimeError(f"Hash tree node {logical_block} is past the end of inode {self.inode_info.inode_number}!") # pylint: disable=line-too-long
+        buf = self.__read_block(self.blocks[logical_block])
+        _, count, block = UNPACK_DIRECTORY_HASH_NODE.unpack_from(buf, 0)
+        dx_entries = [(0, block)]
+        for n in range(1, count):
+            dx_entries.append(UNPACK_DIRECTORY_HASH_BLOCK.unpack_from(buf, 8 + n * 8))
+        return dx_entries
 
     def __check_for_hash_tree(self) -> Union[Ext3DirectoryHashTreeRoot, None]:
         """Check for hash tree.
@@ -595,54 +752,48 @@ class Ext3Directory:
 
         dir_ent = Ext3DirectoryHashTreeRoot(f=self.block_location_f, block_location=None,
                                             block_size=self.block_size)
+        dir_ent.INCOMPAT_LARGEDIR = self.INCOMPAT_LARGEDIR
 
         hash_status = dir_ent.run()
+        # Only the parsed values are kept, not the block
+        dir_ent.f = None
         if hash_status is True:
             # Hash!
             return dir_ent
-        else:
-            # Not!
-            self.f.seek(-0x28, 1)
+        # Not!
+        return None
 
     def __read_hash_tree(self) -> None:
-        """Read the hash tree"""
+        """Read the hash tree.
 
-        levels = self.__hash_root.dx_root_info_indirect_levels
+        Every block after the root is read linearly. Interior nodes of an
+        indirect tree start with an empty entry spanning the whole block so
+        they add no entries.
+        """
 
-        # Some sanity checks
-        if levels > 0:
-            raise NotImplementedError("Indirect levels above 0 not supported!")
+        # Skip first block, we looked at that already
+        leaf_blocks = self.blocks[1:]
+        if not leaf_blocks:
+            return
+        dir_ent = self.__read_linear(leaf_blocks)
+        if dir_ent.entries is None:
+            raise RuntimeError(f"dir_ent.entries is None while reading blocks {leaf_blocks[0]}-{leaf_blocks[-1]} for inode {self.inode_info.inode_number}!") # pylint: disable=line-too-long
+        self.entries.extend(dir_ent.entries)
 
-        block_count = 0
-        last_block = None
-        for block in self.blocks:
-            if block_count == 0:
-                # Skip first block, we looked at that already
-                block_count += 1
-                last_block = block
-                continue
-            dir_ent = self.__read_linear(block)
-            if dir_ent.entries is None:
-                raise RuntimeError(f"dir_ent.entries is None while reading block {block} for inode {self.inode_info.inode_number}!\nLast block: {last_block}") # pylint: disable=line-too-long
-            self.entries.extend(dir_ent.entries)
-            last_block = block
-            block_count += 1
-
-    # pylint: disable=unused-variable
-    def __read_linear(self, block_location: int) -> Ext3DirectoryClassic:
+    def __read_linear(self, blocks: List[int]) -> Ext3DirectoryClassic:
         """Read linear directory structure.
 
         Args:
 
-            block_location (int): Not sure???
+            blocks (List[int]): Blocks holding directory entries.
 
         Returns:
 
             Ext3DirectoryClassic: Ext3DirectoryClassic object.
         """
 
-        dir_ent = Ext3DirectoryClassic(f=self.blocks_f, block_location=block_location,
-                                       blocks=self.blocks,
+        dir_ent = Ext3DirectoryClassic(f=self.f, block_location=blocks[0],
+                                       blocks=blocks,
                                        block_size=self.block_size,
                                        inode_info=self.inode_info)
 
@@ -650,40 +801,16 @@ class Ext3Directory:
         dir_ent.run()
 
         return dir_ent
-    # pylint: enable=unused-variable
-
-    def __seek_to_block(self, block_number: int) -> Union[int, None]:
-        """Seek to a block adjusted for master_offset.
-
-        Args:
 
-            block_number (int): Seek to block.
-
-        Returns:
-
-            Union[int, None]: New offset or None depending on the underlying handle.
-        """
-        return self.f.seek((block_number * self.block_size))
-
-    def __read_block_size(self) -> bytes:
+    def __read_block(self, block_number: int) -> Union[bytes, memoryview]:
         """Read exactly one block of data determined by self.block_size
 
-        Returns:
-
-            bytes: Byte data.
-        """
-        return self.f.read(self.block_size)
-
-    def __seek_and_read_block(self, block_number: int) -> bytes:
-        """Seek to the offset adjusted location of block_number and return its data.
-
         Args:
 
-            block_number (int): Seek to block.
+            block_number (int): Block number.
 
         Returns:
 
             bytes: Byte data.
         """
-        self.__seek_to_block(block_number)
-        return self.__read_block_size()
+        return self.f.view_at(block_number * self.block_size, self.block_size)
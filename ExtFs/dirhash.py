@@ -0,0 +1,201 @@
+"""Directory entry name hashing.
+
+Port of ``ext4fs_dirhash()`` (fs/ext4/hash.c) used to find the leaf block of
+a hashed (htree) directory holding a name without reading the whole
+directory.
+"""
+
+from typing import Sequence, Tuple
+
+# dx_root_info.hash_version / s_def_hash_version
+DX_HASH_LEGACY = 0
+DX_HASH_HALF_MD4 = 1
+DX_HASH_TEA = 2
+DX_HASH_LEGACY_UNSIGNED = 3
+DX_HASH_HALF_MD4_UNSIGNED = 4
+DX_HASH_TEA_UNSIGNED = 5
+
+# Added to a signed hash version when EXT2_FLAGS_UNSIGNED_HASH is set
+DX_HASH_UNSIGNED_OFFSET = 3
+
+EXT4_HTREE_EOF_32BIT = 0x7FFFFFFF
+
+MASK32 = 0xFFFFFFFF
+
+# Used when s_hash_seed is all zeros
+DEFAULT_SEED = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476)
+
+TEA_DELTA = 0x9E3779B9
+MD4_K2 = 0o13240474631
+MD4_K3 = 0o15666365641
+
+
+def _rol32(value: int, shift: int) -> int:
+    return ((value << shift) | (value >> (32 - shift))) & MASK32
+
+
+def _signed_char(value: int) -> int:
+    return value - 0x100 if value & 0x80 else value
+
+
+def dx_hack_hash(name: bytes, signed: bool = True) -> int:
+    """Legacy hash.
+
+    Args:
+
+        name (bytes): Entry name.
+        signed (bool, optional): Treat name bytes as signed chars. Defaults to True.
+
+    Returns:
+
+        int: Hash.
+    """
+    hash0, hash1 = 0x12A3FE2D, 0x37ABE8F9
+    for char in name:
+        if signed:
+            char = _signed_char(char)
+        value = (hash1 + (hash0 ^ ((char * 7152373) & MASK32))) & MASK32
+        if value & 0x80000000:
+            value = (value - 0x7FFFFFFF) & MASK32
+        hash1 = hash0
+        hash0 = value
+    return (hash0 << 1) & MASK32
+
+
+def str2hashbuf(name: bytes, num: int, signed: bool = True) -> Sequence[int]:
+    """Pack up to ``num * 4`` bytes of a name into ``num`` words.
+
+    Args:
+
+        name (bytes): Remaining part of the entry name.
+        num (int): Number of words.
+        signed (bool, optional): Treat name bytes as signed chars. Defaults to True.
+
+    Returns:
+
+        Sequence[int]: ``num`` words, padded with the length of ``name``.
+    """
+    length = len(name)
+    pad = (length | (length << 8)) & MASK32
+    pad |= (pad << 16) & MASK32
+
+    words = []
+    value = pad
+    for i, char in enumerate(name[:num * 4]):
+        if signed:
+            char = _signed_char(char)
+        value = (char + (value << 8)) & MASK32
+        if i % 4 == 3:
+            words.append(value)
+            value = pad
+    if len(words) < num:
+        words.append(value)
+    words.extend([pad] * (num - len(words)))
+    return words
+
+
+def half_md4_transform(buf: list, data: Sequence[int]) -> None:
+    """Half MD4 transform, updates ``buf`` in place.
+
+    Args:
+
+        buf (list): Four word hash state.
+        data (Sequence[int]): Eight words of input.
+    """
+    a, b, c, d = buf
+
+    def f(x, y, z):
+        return z ^ (x & (y ^ z))
+
+    def g(x, y, z):
+        return ((x & y) + ((x ^ y) & z)) & MASK32
+
+    def h(x, y, z):
+        return x ^ y ^ z
+
+    # (function, constant, input order, shifts) per round
+    rounds = (
+        (f, 0, (0, 1, 2, 3, 4, 5, 6, 7), (3, 7, 11, 19)),
+        (g, MD4_K2, (1, 3, 5, 7, 0, 2, 4, 6), (3, 5, 9, 13)),
+        (h, MD4_K3, (3, 7, 2, 6, 1, 5, 0, 4), (3, 9, 11, 15)),
+    )
+    for func, constant, order, shifts in rounds:
+        for n, index in enumerate(order):
+            shift = shifts[n % 4]
+            x = (data[index] + constant) & MASK32
+            step = n % 4
+            if step == 0:
+                a = _rol32((a + func(b, c, d) + x) & MASK32, shift)
+            elif step == 1:
+                d = _rol32((d + func(a, b, c) + x) & MASK32, shift)
+            elif step == 2:
+                c = _rol32((c + func(d, a, b) + x) & MASK32, shift)
+            else:
+                b = _rol32((b + func(c, d, a) + x) & MASK32, shift)
+
+    buf[0] = (buf[0] + a) & MASK32
+    buf[1] = (buf[1] + b) & MASK32
+    buf[2] = (buf[2] + c) & MASK32
+    buf[3] = (buf[3] + d) & MASK32
+
+
+def tea_transform(buf: list, data: Sequence[int]) -> None:
+    """TEA transform, updates ``buf`` in place.
+
+    Args:
+
+        buf (list): Four word hash state, only the first two words change.
+        data (Sequence[int]): Four words of input.
+    """
+    total = 0
+    b0, b1 = buf[0], buf[1]
+    a, b, c, d = data
+    for _ in range(16):
+        total = (total + TEA_DELTA) & MASK32
+        b0 = (b0 + ((((b1 << 4) + a) & MASK32) ^ ((b1 + total) & MASK32) ^ (((b1 >> 5) + b) & MASK32))) & MASK32 # pylint: disable=line-too-long
+        b1 = (b1 + ((((b0 << 4) + c) & MASK32) ^ ((b0 + total) & MASK32) ^ (((b0 >> 5) + d) & MASK32))) & MASK32 # pylint: disable=line-too-long
+    buf[0] = (buf[0] + b0) & MASK32
+    buf[1] = (buf[1] + b1) & MASK32
+
+
+def dirhash(name: bytes, hash_version: int, seed: Sequence[int] = None) -> Tuple[int, int]:
+    """Hash a directory entry name.
+
+    Args:
+
+        name (bytes): Entry name.
+        hash_version (int): One of the ``DX_HASH_*`` versions.
+        seed (Sequence[int], optional): ``s_hash_seed`` as four integers. Defaults to None.
+
+    Raises:
+
+        NotImplementedError: For hash versions other than legacy, half MD4 and TEA.
+
+    Returns:
+
+        Tuple[int, int]: Major and minor hash.
+    """
+    buf = list(DEFAULT_SEED)
+    if seed is not None and any(seed):
+        buf = list(seed)
+
+    minor_hash = 0
+    if hash_version in (DX_HASH_LEGACY, DX_HASH_LEGACY_UNSIGNED):
+        major_hash = dx_hack_hash(name, signed=hash_version == DX_HASH_LEGACY)
+    elif hash_version in (DX_HASH_HALF_MD4, DX_HASH_HALF_MD4_UNSIGNED):
+        signed = hash_version == DX_HASH_HALF_MD4
+        for start in range(0, len(name), 32):
+            half_md4_transform(buf, str2hashbuf(name[start:], 8, signed))
+        major_hash, minor_hash = buf[1], buf[2]
+    elif hash_version in (DX_HASH_TEA, DX_HASH_TEA_UNSIGNED):
+        signed = hash_version == DX_HASH_TEA
+        for start in range(0, len(name), 16):
+            tea_transform(buf, str2hashbuf(name[start:], 4, signed))
+        major_hash, minor_hash = buf[0], buf[1]
+    else:
+        raise NotImplementedError(f"Directory hash version {hash_version} not supported!")
+
+    major_hash &= ~1 & MASK32
+    if major_hash == EXT4_HTREE_EOF_32BIT << 1:
+        major_hash = (EXT4_HTREE_EOF_32BIT - 1) << 1
+    return major_hash, minor_hash
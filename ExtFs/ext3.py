@@ -4,16 +4,20 @@
 import io
 import math
 # import pprint
-import struct
-from typing import Dict, Iterator, List
+from typing import Dict, Iterable, Iterator, List
 
 import more_itertools
 
 from ExtFs.block import Ext3BlockBitmap, Ext3BlockGroup
+from ExtFs.cache import (DEFAULT_CACHE_SIZE, DEFAULT_DIR_CACHE_ITEMS, DEFAULT_INODE_CACHE_ITEMS,
+                          DEFAULT_INODE_TABLE_CACHE_ITEMS, BlockCache, CachedImage, LRUCache)
 from ExtFs.directory import Ext3Directory
-from ExtFs.gdt import Ext3Gdt
+from ExtFs.gdt import Ext3Gdt, Ext3GdtTable
+from ExtFs.image import BufferImage, RegionImage, open_image
 from ExtFs.inode import Ext3InodeBitmap, Ext3InodeTable
+from ExtFs.inodearray import decode_inode_table, np, require_numpy
 from ExtFs.superblock import Ext3Superblock
+from ExtFs.sweep import sweep_groups
 from ExtFs.utility import Ext3Utility
 
 
@@ -32,9 +36,14 @@ class Ext3Filesystem:
         'image_offset',
         'magic_ignore',
         'f',
+        'image',
+        'meta_image',
+        'block_cache',
+        'use_mmap',
         'sb',
         'gdts',
         'inode_tables',
+        '__counted_inode_tables',
         'inode_bitmaps',
         'inode_bitmap',
         'block_groups',
@@ -44,6 +53,7 @@ class Ext3Filesystem:
         '__number_of_allocated_blocks',
         '__number_of_zeroed_inodes',
         'dirs',
+        'lookup_dirs',
         'inodes',
         '__zeroed_inodes',
         'blocks',
@@ -56,7 +66,31 @@ class Ext3Filesystem:
     # def __repr__(self):
     #     return pprint.pformat(vars(self), indent=4)
 
-    def __init__(self, f: io.BytesIO = None, master_offset: int = 0):
+    # pylint: disable=too-many-arguments
+    def __init__(self, f: io.BytesIO = None, master_offset: int = 0, use_mmap: bool = False, *,
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 inode_cache_items: int = DEFAULT_INODE_CACHE_ITEMS,
+                 dir_cache_items: int = DEFAULT_DIR_CACHE_ITEMS,
+                 inode_table_cache_items: int = DEFAULT_INODE_TABLE_CACHE_ITEMS):
+        """Create an Ext filesystem.
+
+        Args:
+
+            f (io.BytesIO, optional): File-like object of filesystem.
+            master_offset (int, optional): Offset in bytes from start of file to begin.
+                Defaults to 0.
+            use_mmap (bool, optional): Memory map the image instead of reading it through ``f``
+                when ``f`` has a file descriptor or only ``filename`` is set. Defaults to False.
+            cache_size (int, optional): Byte budget of the metadata block cache, 0 disables it.
+                Defaults to DEFAULT_CACHE_SIZE.
+            inode_cache_items (int, optional): Parsed inodes kept in ```inodes```, None for no
+                limit. Defaults to DEFAULT_INODE_CACHE_ITEMS.
+            dir_cache_items (int, optional): Parsed directories kept in ```dirs```, and
+                directories looked up in kept in ```lookup_dirs```, None for no limit.
+                Defaults to DEFAULT_DIR_CACHE_ITEMS.
+            inode_table_cache_items (int, optional): Inode tables kept in ```inode_tables```,
+                None for no limit. Defaults to DEFAULT_INODE_TABLE_CACHE_ITEMS.
+        """
         self.sector_size = 512
 
 
@@ -70,9 +104,18 @@ class Ext3Filesystem:
         self.magic_ignore = False
 
         self.f = f
+        # Image object all structures are read through, see ExtFs.image
+        self.image = None
+        # Image metadata is read through, cached unless the image is in memory
+        self.meta_image = None
+        self.block_cache = BlockCache(cache_size)
+        self.use_mmap = use_mmap
         self.sb: Ext3Superblock = None
         self.gdts = dict()
-        self.inode_tables = dict()
+        # Recently used inode tables keyed by group number
+        self.inode_tables = LRUCache(inode_table_cache_items)
+        # Groups whose inode table is part of the allocated/zeroed counts
+        self.__counted_inode_tables = set()
         self.inode_bitmaps = dict()
         self.inode_bitmap = dict()
         self.block_groups = dict()
@@ -82,13 +125,16 @@ class Ext3Filesystem:
         self.__number_of_allocated_inodes = 0
         self.__number_of_allocated_blocks = 0
         self.__number_of_zeroed_inodes = 0
-        # Apparently a dict of directories? key is inode number, value is Ext3Directory object
-        self.dirs = None
-        self.inodes = {}
+        # Recently used directories and inodes, keyed by inode number. The only place
+        # parsed Ext3Directory/Ext3Inode objects are cached.
+        self.dirs = LRUCache(dir_cache_items)
+        # Directories only looked up in, not read, see lookup()
+        self.lookup_dirs = LRUCache(dir_cache_items)
+        self.inodes = LRUCache(inode_cache_items)
         self.__zeroed_inodes = {}
         self.blocks = {}
         self.master_offset = master_offset
-
+    # pylint: enable=too-many-arguments
 
     def get_inode(self, inode_number: int) -> 'Ext3Inode':
         """Returns a :class:`Ext3Inode` object for inode number :var:`inode_number`.
@@ -105,8 +151,9 @@ class Ext3Filesystem:
         # inode_number = int(inode_number)
         if inode_number == 0:
             raise ValueError("0 is not a valid inode number!")
-        if inode_number in self.inodes:
-            return self.inodes[inode_number]
+        inode = self.inodes.get(inode_number)
+        if inode is not None:
+            return inode
 
         inode_table = self.get_inode_table_for_inode(inode_number)
         inode = inode_table.get_inode(inode_number)
@@ -132,14 +179,12 @@ class Ext3Filesystem:
             raise ValueError("inode_table_number must be >= 0!")
         if inode_table_number > self.sb.block_group_count:
             raise ValueError(f"inode_table_number must be <= block_group_count ({self.sb.block_group_count})!") # pylint: disable=line-too-long
-        if inode_table_number in self.inode_tables:
-            return self.inode_tables[inode_table_number]
-        else:
-            # We should only get here if the table wasn't found but
-            # is still a valid table number.
-            gdt = self.get_gdt(inode_table_number)
-            inode_tbl = self.read_inode_table(gdt)
+        inode_tbl = self.inode_tables.get(inode_table_number)
+        if inode_tbl is not None:
             return inode_tbl
+        # Not read yet or dropped from the cache
+        gdt = self.get_gdt(inode_table_number)
+        return self.read_inode_table(gdt)
         # raise RuntimeError("ondemand_run() must be called before doing this!")
 
     def get_gdt(self, gdt_number: int) -> Ext3Gdt:
@@ -207,12 +252,10 @@ class Ext3Filesystem:
         block_number = int(block_number)
         if block_number < 0:
             raise ValueError("block number must be greater than 0!")
-        if block_number > self.sb.s_blocks_count_lo:
+        if block_number >= self.sb.blocks_count:
             raise ValueError("block number must be less than total number of blocks!")
         block_offset = (self.sb.block_size * block_number) + self.master_offset
-        self.f.seek(block_offset)
-        buf = self.f.read(self.sb.block_size)
-        return buf
+        return self.meta_image.read_at(block_offset, self.sb.block_size)
 
     def get_block(self, block_number: int) -> 'Ext3Block':
         """Returns a :class:`Ext3Block` object for block number :var:`block_number`.
@@ -393,7 +436,7 @@ class Ext3Filesystem:
         """Read the filesystem superblock.
         """
 
-        self.sb = Ext3Superblock(self.f, self.master_offset)
+        self.sb = Ext3Superblock(self.image, self.master_offset)
 
         self.sb.run()
 
@@ -404,34 +447,40 @@ class Ext3Filesystem:
         if self.sb.INCOMPAT_META_BG is True:
             raise RuntimeError("Meta Block Groups (META_BG) not supported!")
 
-    def read_inode_table(self, gdt: Ext3Gdt) -> Ext3InodeTable:
+    def read_inode_table(self, gdt: Ext3Gdt, bulk: bool = False,
+                         f: RegionImage = None) -> Ext3InodeTable:
         """Read the inode table for a gdt.
 
         Args:
 
             gdt (Ext3Gdt): Gdt to read inode table of.
+            bulk (bool, optional): Read and decode the whole table up front instead
+                of reading inodes one at a time as they are requested. Defaults to False.
+            f (RegionImage, optional): Image holding the table already, only used
+                for the bulk read. Defaults to the metadata image.
 
         Returns:
 
             Ext3InodeTable: Ext3InodeTable instance for matching gdt.
         """
         table_number = gdt.group_number
-        inode_tbl = Ext3InodeTable(sb=self.sb, gdt=gdt, f=self.f)
+        inode_tbl = Ext3InodeTable(sb=self.sb, gdt=gdt, f=f or self.meta_image)
 
         # Provide a copy of the inode bitmap so an inode can check its allocation status
         inode_tbl.inode_bitmap = self.get_inode_bitmap(table_number).bitmap
-        inode_tbl.run()
+        if bulk:
+            inode_tbl.run()
+        # Inodes read later on go through the metadata image
+        inode_tbl.f = self.meta_image
 
-        if self.inodes is None:
-            self.inodes = dict()
-
-        if table_number not in self.inode_tables:
+        if table_number not in self.__counted_inode_tables:
+            self.__counted_inode_tables.add(table_number)
             self.__number_of_allocated_inodes += inode_tbl.number_of_allocated_inodes
             self.__number_of_zeroed_inodes += inode_tbl.number_of_zeroed_inodes
         self.inode_tables[table_number] = inode_tbl
         return inode_tbl
 
-    def read_inode_tables(self) -> None:
+    def read_inode_tables(self, bulk: bool = True) -> None:
         """Read inode table.
 
         Iterates through list of GDTs in ```gdts```. Calculates Inode table offset,
@@ -439,28 +488,109 @@ class Ext3Filesystem:
         object. ```inode_bitmap```, table offset, ```master_offset``` are passed
         to the :class:`Ext3InodeTable` object prior to calling ```run()```.
 
-        The :class:`Ext3InodeTable` object is stored in ```inode_tables```
-        and each of its inodes is iterated and stored in ```inodes``` which
-        is a ```dict``` with inode number as key and :class:`Ext3Inode` as
-        value.
+        The :class:`Ext3InodeTable` objects are stored in ```inode_tables```
+        which only keeps the most recently read ones, the allocated and zeroed
+        inode counts cover every table.
+
+        Args:
 
+            bulk (bool, optional): Read each table in bulk, see :func:`read_inode_table`.
+                Defaults to True.
         """
 
+        if bulk:
+            self.read_groups(range(self.sb.block_group_count), inode_bitmaps=True,
+                             inode_tables=True)
+            return
         for gdt in self.gdts.values():
-            self.read_inode_table(gdt)
+            self.read_inode_table(gdt, bulk=bulk)
+
+    @property
+    def groups_per_flex(self) -> int:
+        """Number of block groups whose metadata is packed together.
+
+        With flex_bg the bitmaps and inode tables of ``2 ** s_log_groups_per_flex``
+        groups are stored back to back at the start of the first group.
+
+        Returns:
+
+            int: Block groups per flex group, 1 without flex_bg.
+        """
+        if not self.sb.INCOMPAT_FLEX_BG:
+            return 1
+        return 1 << self.sb.s_log_groups_per_flex
 
-    def read_inode_bitmap(self, gdt: Ext3Gdt) -> Ext3InodeBitmap:
+    def read_groups(self, groups: Iterable[int], block_bitmaps: bool = False,
+                    inode_bitmaps: bool = False, inode_tables: bool = False) -> None:
+        """Read metadata of block groups with as few reads as possible.
+
+        Packed flex_bg metadata is read in one sequential sweep, see
+        :func:`ExtFs.sweep.sweep_groups`.
+
+        Args:
+
+            groups (Iterable[int]): Block group numbers, in ascending order.
+            block_bitmaps (bool, optional): Read block bitmaps. Defaults to False.
+            inode_bitmaps (bool, optional): Read inode bitmaps. Defaults to False.
+            inode_tables (bool, optional): Read inode tables. Defaults to False.
+        """
+        for _ in sweep_groups(self, groups, block_bitmaps, inode_bitmaps, inode_tables):
+            pass
+
+    def iter_inode_records(self) -> Iterator['Ext3InodeRecord']:
+        """Enumerate every non-zeroed inode on the filesystem.
+
+        Generator. Inode tables are read group by group, each with a single
+        sequential read, and records are not kept once yielded.
+
+        Returns:
+
+            Ext3InodeRecord: Record of a non-zeroed inode.
+        """
+
+        for group_number in range(0, self.sb.block_group_count):
+            inode_tbl = self.get_inode_table(group_number)
+            if inode_tbl.records is not None:
+                yield from inode_tbl.records.values()
+            else:
+                yield from inode_tbl.iter_records()
+
+    def inode_array(self) -> 'np.ndarray':
+        """Columnar view of every inode on the filesystem.
+
+        Each inode table is read with a single read and decoded with NumPy,
+        see :func:`ExtFs.inodearray.decode_inode_table` for the columns.
+        Requires NumPy.
+
+        Returns:
+
+            numpy.ndarray: Structured array with one row per inode, ordered by
+            inode number.
+        """
+
+        require_numpy()
+        tables = []
+        for group_number in range(0, self.sb.block_group_count):
+            inode_tbl = self.get_inode_table(group_number)
+            tables.append(decode_inode_table(inode_tbl.read_used(), inode_tbl.inode_size,
+                                             inode_tbl.start_inode, inode_tbl.num_inodes,
+                                             self.get_inode_bitmap(group_number).raw))
+        return np.concatenate(tables)
+
+    def read_inode_bitmap(self, gdt: Ext3Gdt, f: RegionImage = None) -> Ext3InodeBitmap:
         """Read inode bitmap for a gdt.
 
         Args:
 
             gdt (Ext3Gdt): Gdt to read bitmap of.
+            f (RegionImage, optional): Image holding the bitmap already. Defaults
+                to the metadata image.
 
         Returns:
 
             Ext3InodeBitmap: Ext3InodeBitmap instance for matching gdt.
         """
-        inode_bitmap = Ext3InodeBitmap(sb=self.sb, gdt=gdt, f=self.f)
+        inode_bitmap = Ext3InodeBitmap(sb=self.sb, gdt=gdt, f=f or self.meta_image)
         inode_bitmap.run()
         self.inode_bitmaps[gdt.group_number] = inode_bitmap
         return inode_bitmap
@@ -472,23 +602,22 @@ class Ext3Filesystem:
         Bitmaps are stored in ```self.inode_bitmaps```.
         """
 
-        # Iterate over each gdt and create/read a block bitmap.
-        # Store bitmap in self.block_bitmaps.
-        for gdt in self.gdts.values():
-            self.read_inode_bitmap(gdt)
+        self.read_groups(range(self.sb.block_group_count), inode_bitmaps=True)
 
-    def read_block_bitmap(self, gdt: Ext3Gdt) -> Ext3BlockBitmap:
+    def read_block_bitmap(self, gdt: Ext3Gdt, f: RegionImage = None) -> Ext3BlockBitmap:
         """Read block bitmap for a gdt.
 
         Args:
 
             gdt (Ext3Gdt): Gdt to read bitmap of.
+            f (RegionImage, optional): Image holding the bitmap already. Defaults
+                to the metadata image.
 
         Returns:
 
             Ext3BlockBitmap: Ext3BlockBitmap instance for matching gdt.
         """
-        block_bitmap = Ext3BlockBitmap(sb=self.sb, gdt=gdt, f=self.f)
+        block_bitmap = Ext3BlockBitmap(sb=self.sb, gdt=gdt, f=f or self.meta_image)
         block_bitmap.run()
         self.block_bitmaps[gdt.group_number] = block_bitmap
         return block_bitmap
@@ -499,10 +628,7 @@ class Ext3Filesystem:
         Iterates through all gdts and reads each gdt's block bitmap.
         Bitmaps are stored in ```self.block_bitmaps```.
         """
-        # Iterate over each gdt and create/read a block bitmap.
-        # Store bitmap in self.block_bitmaps.
-        for gdt in self.gdts.values():
-            self.read_block_bitmap(gdt)
+        self.read_groups(range(self.sb.block_group_count), block_bitmaps=True)
 
         # self.block_bitmaps = [Ext3BlockBitmap(sb=self.sb, gdt=gdt, f=self.f).run() for gdt in gdt]
 
@@ -541,28 +667,26 @@ class Ext3Filesystem:
 
     def read_group_descriptor_table(self) -> None:
         """Read Group Descriptor Table
+
+        The table is read with a single read into an :class:`Ext3GdtTable`
+        stored in ```gdts```.
         """
 
-        # Seek to correct offset for GDT
-        if self.sb.block_size == 1024:
-            # Seek for block size of 1024
-            gdt_seek = self.sb.block_size + 1024
-        elif self.sb.block_size == 2048:
-            # Not implemented so raise an exception for now
-            raise NotImplementedError("Block size of 2048 not supported!")
-        elif self.sb.block_size == 4096:
-            # Seek for block size of 4096
-            gdt_seek = self.sb.block_size
-        else:
-            raise RuntimeError(f"block_size {self.sb.block_size} not supported!")
+        # The GDT starts in the block after the superblock. With 1024 byte blocks
+        # the superblock is block 1 (s_first_data_block), otherwise it is in block 0.
+        gdt_seek = (self.sb.s_first_data_block + 1) * self.sb.block_size
 
-        self.f.seek(gdt_seek)
-        for x in range(0, self.sb.block_group_count):
-            my_gdt = Ext3Gdt(sb=self.sb, f=self.f, group_number=x)
-            my_gdt.run()
-            self.gdts[x] = my_gdt
+        # Descriptors are 32 bytes, or s_desc_size bytes in 64-bit mode
+        desc_size = 32
+        if self.sb.INCOMPAT_64BITS and self.sb.s_desc_size is not None and self.sb.s_desc_size > 32:
+            desc_size = self.sb.s_desc_size
 
-    def walk_root_directory(self, inode_num: int = 2) -> None:
+        # One read for the whole table, Ext3Gdt objects are created by get_gdt()
+        self.gdts = Ext3GdtTable(f=self.image, location=gdt_seek, desc_size=desc_size,
+                                 group_count=self.sb.block_group_count)
+        self.gdts.run()
+
+    def walk_root_directory(self, inode_num: int = 2) -> Ext3Directory:
         """Walk root directory at a given inode number.
 
         By default, ext implementations generally have their root
@@ -571,37 +695,82 @@ class Ext3Filesystem:
         Args:
 
             inode_num (int, optional): Starting inode number for walk. Defaults to 2.
-        """
 
-        directory_inode = self.get_inode(inode_num)
+        Returns:
+
+            Ext3Directory: The directory, also kept in ```dirs``` until evicted.
+        """
 
-        root = Ext3Directory(block_size=self.sb.block_size, inode_info=directory_inode,
-                             f=self.f)
-        root.COMPAT_DIR_INDEX = self.sb.COMPAT_DIR_INDEX
-        root.INCOMPAT_FILETYPE = self.sb.INCOMPAT_FILETYPE
+        root = self.new_directory(inode_num)
         root.run()
-        if self.dirs is None:
-            self.dirs = {}
         self.dirs[inode_num] = root
+        self.lookup_dirs.pop(inode_num, None)
+        return root
+
+    def new_directory(self, inode_num: int) -> Ext3Directory:
+        """Create a directory object with the superblock features it needs.
+
+        Args:
+
+            inode_num (int): Inode number of the directory.
+
+        Returns:
+
+            Ext3Directory: Ext3Directory instance, not yet run.
+        """
+
+        directory_inode = self.get_inode(inode_num)
+
+        directory = Ext3Directory(block_size=self.sb.block_size, inode_info=directory_inode,
+                                  f=self.meta_image)
+        directory.COMPAT_DIR_INDEX = self.sb.COMPAT_DIR_INDEX
+        directory.INCOMPAT_FILETYPE = self.sb.INCOMPAT_FILETYPE
+        directory.INCOMPAT_LARGEDIR = self.sb.INCOMPAT_LARGEDIR
+        directory.hash_seed = self.sb.hash_seed
+        directory.hash_unsigned = self.sb.FLAGS_UNSIGNED_HASH
+        return directory
+
+    def lookup(self, inode_num: int, name: str) -> 'Ext3DirectoryEntryVersion2':
+        """Find a name in a directory.
+
+        Uses the directory if it has been read already, otherwise only the
+        hash tree leaf holding ``name`` is read (see :func:`Ext3Directory.lookup`).
+        Directories looked up in are kept in ``lookup_dirs`` so the dx_root, or
+        the entries of a linear directory, are parsed once.
+
+        Args:
+
+            inode_num (int): Inode number of the directory.
+            name (str): Name to look up.
+
+        Returns:
+
+            Ext3DirectoryEntryVersion2 or None: Entry or None if there is no such name.
+        """
+
+        directory = self.dirs.get(inode_num)
+        if directory is not None:
+            return directory.lookup(name)
+        directory = self.lookup_dirs.get(inode_num)
+        if directory is None:
+            directory = self.new_directory(inode_num)
+            self.lookup_dirs[inode_num] = directory
+        return directory.lookup(name)
 
     def run(self) -> None:
         """Runs the Ext filesystem processing.
 
         Checks to see if a file-like object ```f``` is set. If ```f``` is not set
         then ```filename``` will be opened and stored in ```f``` prior to running
-        ```read_super_block()```.
+        ```read_super_block()```. With ```use_mmap``` the image is memory mapped
+        instead and ```filename``` is only opened to be mapped.
 
         After reading the superblock, the GDTs are read, then Inode Bitmaps,
         Inode Tables, Block Bitmaps, Block Groups, and finally the root directory
         at Inode 2 is read if ```read_root_directory``` is ```True``` (default).
 
         """
-        if self.f is None:
-            self.f = open(self.filename, "rb")
-
-        self.read_super_block()
-
-        self.util = Ext3Utility(self.f, block_size=self.sb.block_size)
+        self.setup()
 
         self.read_group_descriptor_table()
 
@@ -616,6 +785,36 @@ class Ext3Filesystem:
 
         self.walk_root_directory(2)
 
+    def setup(self) -> None:
+        """Open the image and read the superblock.
+
+        First part of :func:`run`, enough to identify the filesystem.
+        """
+        if self.f is None and not self.use_mmap:
+            self.f = open(self.filename, "rb") # pylint: disable=consider-using-with
+
+        self.image = open_image(f=self.f, filename=self.filename, use_mmap=self.use_mmap)
+
+        self.read_super_block()
+
+        self.meta_image = self.image
+        if self.block_cache.max_bytes > 0 and not isinstance(self.image, BufferImage):
+            self.meta_image = CachedImage(self.image, self.block_cache, self.sb.block_size)
+
+        self.util = Ext3Utility(self.meta_image, block_size=self.sb.block_size)
+
+    def close(self) -> None:
+        """Release the image.
+
+        Unmaps the image in ```use_mmap``` mode. ```f``` belongs to the caller
+        and is left open.
+        """
+        if self.image is not None:
+            self.block_cache.clear()
+            self.image.close()
+            self.image = None
+            self.meta_image = None
+
     @property
     def zeroed_inodes(self) -> Dict:
         """Inode zeroed inventory.
@@ -681,7 +880,7 @@ class Ext3Filesystem:
 
             int: Number of blocks on filesystem.
         """
-        return self.sb.s_blocks_count_lo
+        return self.sb.blocks_count
 
     @property
     def number_of_allocated_blocks(self) -> int:
@@ -701,7 +900,7 @@ class Ext3Filesystem:
 
             int: Number of unallocated blocks on filesystem.
         """
-        return self.sb.s_free_blocks_count_lo
+        return self.sb.free_blocks_count
 
     @property
     def number_of_block_groups(self) -> int:
@@ -767,11 +966,6 @@ class Ext3Filesystem:
         for group in more_itertools.consecutive_groups(self.unallocated_blocks):
             yield list(group)
 
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
-        """
-        return struct.unpack("<I", self.f.read(4))[0]
-
     def is_inode_zeroed(self, inode_number: str) -> bool:
         """Check if an inode is zeroed.
 
@@ -112,6 +112,11 @@ class Ext4ExtentIdx:
         self.ei_leaf_lo = leaf_lo
         self.ei_leaf_hi = leaf_hi
 
+    @property
+    def leaf(self) -> int:
+        """Block number of the next level (``ei_leaf_lo``/``ei_leaf_hi``)."""
+        return self.ei_leaf_lo | ((self.ei_leaf_hi or 0) << 32)
+
 class Ext4Extent:
     """Ext4Extent.
 
@@ -123,6 +128,7 @@ class Ext4Extent:
         'ee_len',
         'ee_start_hi',
         'ee_start_lo',
+        'uninitialized',
     ]
 
     # def __str__(self):
@@ -136,6 +142,13 @@ class Ext4Extent:
         self.ee_len = length
         self.ee_start_hi = start_hi
         self.ee_start_lo = start_lo
+        # Set when ee_len > 32768. Uninitialized extents read back as zeros.
+        self.uninitialized = False
+
+    @property
+    def start(self) -> int:
+        """First physical block (``ee_start_lo``/``ee_start_hi``)."""
+        return self.ee_start_lo | ((self.ee_start_hi or 0) << 32)
 
 class Ext4ExtentTail:
     """Ext4ExtentTail.
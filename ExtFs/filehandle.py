@@ -1,6 +1,10 @@
 """File handle"""
 
+import bisect
 import copy
+import io
+
+from ExtFs.image import as_image, zero_fill
 
 # WARNING: Old (possibly deprecated/unused) magic be here!
 
@@ -47,10 +51,10 @@ class BucketHandle:
         # Example: ExtFs: filehandle.py: BucketHandle().__init__(): f is: <bound method PartitionEntry.handle of <PartitionEntryMBR: ...
         try:
             # Try f as a function first
-            self.__f = value()
+            self.__f = as_image(value())
         except TypeError:
             # Ok f is not a function, just assign it
-            self.__f = value
+            self.__f = as_image(value)
     # pylint: enable=line-too-long
 
     def is_me(self, value):
@@ -132,25 +136,43 @@ class BucketHandle:
         """
 
         if count == 0:
-            print("Bucket returning empty")
             return b""
 
         exceeds = self.boolean_read_exceeds(start, count)
         if self.sparse:
             if exceeds:
                 amount = self.how_many_read_bytes(start, count)
-                print("Bucket returning sparse amount")
                 return b"\x00" * amount
-            print("Bucket returning sparse count")
             return b"\x00" * count
-        self.f.seek(self.handle_adjusted_offset(start))
+        offset = self.handle_adjusted_offset(start)
         if exceeds:
             # Goes beyond boundary
             amount = self.how_many_read_bytes(start, count)
             # print("reading %s amount bytes" % (amount))
-            return self.f.read(amount)
+            return self.f.read_at(offset, amount)
         # print("reading %s count bytes" % (count))
-        return self.f.read(count)
+        return self.f.read_at(offset, count)
+
+    def readinto(self, start, buf):
+        """Reads into buf at starting offset, up to the end of the bucket.
+
+        Sparse buckets are zero filled in place.
+
+        Args:
+            start (int): Starting read offset in bytes.
+            buf (memoryview): Writable buffer.
+
+        Returns:
+            int: Number of bytes read.
+        """
+
+        count = self.how_many_read_bytes(start, len(buf))
+        if count <= 0:
+            return 0
+        if self.sparse:
+            zero_fill(buf[:count])
+            return count
+        return self.f.readinto_at(self.handle_adjusted_offset(start), buf[:count])
 
     def my_relative_offset(self, offset):
         """Returns relative offset of offset within bucket's boundary.
@@ -213,12 +235,18 @@ class BucketHandle:
         # in addition to our own
         return self.adjusted_offset(offset)
 
-class ExtFsFileHandle:
-    """ExtFsFileHandle
+class ExtFsFileHandle(io.RawIOBase):
+    """ExtFsFileHandle.
+
+    Read-only streaming file-like object for a file on the filesystem.
+    Only the requested ranges are read from the image, so memory use is
+    bounded by the size of the reads. Wrap it in ``io.BufferedReader`` for
+    buffered small reads.
     """
     def __init__(self, f, name, size, parts, debug=False):
+        super().__init__()
 
-        self.f = f
+        self.f = as_image(f)
         self.filename = name
         self.size = size
         self.debug = debug
@@ -232,145 +260,140 @@ class ExtFsFileHandle:
         self.buckets = []
 
         our_byte_start = 0
-        seq_no = 0
-        for seq_no in sorted(self.parts):
+        for bucket_number, seq_no in enumerate(sorted(self.parts)):
             our_byte_len = self.parts[seq_no]['byte_len']
             our_byte_end = our_byte_start + our_byte_len
-            self.buckets.append(BucketHandle(self.f, seq_no,
+            self.buckets.append(BucketHandle(self.f, bucket_number,
                                              our_byte_start, self.parts[seq_no]))
             our_byte_start = our_byte_end
-        # print("has %s parts" % (seq_no))
+        # Sorted start offsets of the buckets for bisect
+        self.bucket_starts = [bucket.byte_start for bucket in self.buckets]
 
-    # pylint: disable=broad-except
-    def read(self, count=None):
-        """Read count bytes.
-        If count is None then the remaining amount of the file will be read.
+    def readable(self) -> bool:
+        """Always True."""
+        return True
 
-        Args:
-            count (int, optional): Defaults to None. Number of bytes to read.
-                Will read entire contents if None or -1.
+    def seekable(self) -> bool:
+        """Always True."""
+        return True
 
-        Raises:
-            ValueError: If count is less than -1.
+    def readinto(self, b) -> int:
+        """Read up to ``len(b)`` bytes into ``b``.
+
+        Every bucket the read spans is read straight into ``b`` and holes
+        are zero filled in place.
+
+        Args:
+            b (bytearray): Writable buffer.
 
         Returns:
-            bytes: Byte data.
+            int: Number of bytes read, 0 at the end of the file.
         """
 
-        if count is None or count == -1:
-            count = self.size - self.our_offset
+        self._checkClosed()
+        view = memoryview(b).cast('B')
+        count = min(len(view), max(self.size - self.our_offset, 0))
+        pos = 0
+        while pos < count:
+            bucket = self.__bucket_for(self.our_offset)
+            if bucket is None:
+                # Not covered by any part, read as a hole
+                zero_fill(view[pos:count])
+                self.our_offset += count - pos
+                pos = count
+                break
+            n = bucket.readinto(self.our_offset, view[pos:count])
+            if not n:
+                # Truncated image
+                break
+            pos += n
+            self.our_offset += n
+        return pos
+
+    def readall(self) -> bytes:
+        """Read until the end of the file.
 
-        if count < 0:
-            raise ValueError("count (%s) can not be less than -1!" % count)
+        Returns:
+            bytes: Byte data.
+        """
 
-        # If reading count bytes will put our offset over our size then the
-        # amount of bytes we return should be size - our offset
-        if self.our_offset + count > self.size:
-            count = self.size - self.our_offset
+        buf = bytearray(max(self.size - self.our_offset, 0))
+        n = self.readinto(buf)
+        del buf[n:]
+        return bytes(buf)
 
-        if count == 0 or self.size == 0:
-            return b""
+    def read_all(self) -> bytes:
+        """Read the whole file regardless of the current position.
 
-        buf = b""
-        violation = self.get_current_bucket().boolean_read_exceeds(self.our_offset, count)
-        if violation:
-            # We exceeded this bucket's size
-            while True:
-                # Find out how many bytes we will read from this bucket
-                num_bytes = self.get_current_bucket().how_many_read_bytes(self.our_offset, count)
-                if num_bytes == 0:
-                    if self.on_last_bucket():
-                        if self.our_offset != self.size:
-                            # Possibly sparse at the end here
-                            return b"\x00" * (self.size - self.our_offset)
-                try:
-                    buf += self.get_current_bucket().read(self.our_offset, count)
-                except Exception as e:
-                    print("FH Exception! %s" % (e))
-
-                # Adjust our offset to increase by the number of bytes we just read
-                self.our_offset += num_bytes
-                # Increase our bucket number. Probably more performant than self.set_bucket_number
-                if not self.get_current_bucket().is_me(self.our_offset):
-                    self.increment_bucket_number()
-                # Decrease count by the number of bytes we just read
-                count -= num_bytes
-                # print("Read %s bytes, %s bytes remaining" % (num_bytes, count))
-                if count == 0:
-                    break
-                elif count < 0:
-                    raise RuntimeError("count < 0! value: %s" % count)
-
-        else:
-            # We are still inside this bucket
-            buf += self.get_current_bucket().read(self.our_offset, count)
-            self.our_offset += count
+        Returns:
+            bytes: Contents of the file.
+        """
 
-        return buf
-    # pylint: enable=broad-except
+        self.seek(0)
+        return self.readall()
 
-    def tell(self):
+    def tell(self) -> int:
         """Returns our current offset.
 
         Returns:
             int: Current offset.
         """
 
+        self._checkClosed()
         return self.our_offset
 
-    # pylint: disable=broad-except
-    def seek(self, offset, whence=0):
+    def seek(self, offset, whence=io.SEEK_SET):
         """Seeks to a position in file with given offset and whence.
 
+        Seeking past the end of the file is allowed, reads there return
+        no data.
+
         Args:
             offset (int): Offset in bytes.
-            whence (int, optional): Defaults to 0. Where to seek relative to.
+            whence (int, optional): Defaults to io.SEEK_SET. Where to seek relative to.
+
+        Raises:
+            ValueError: If the new position would be negative or whence is invalid.
 
         Returns:
             int: New seek'ed position.
         """
 
-        if self.size == 0:
-            return 0
-
-        if whence == 0:
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            new_offset = offset
+        elif whence == io.SEEK_CUR:
             new_offset = self.our_offset + offset
-            if new_offset > self.size:
-                self.our_offset = self.size
-                return self.our_offset
-            self.our_offset = offset
-            return self.our_offset
-
-        new_offset = self.our_offset + offset
-        if whence == 1:
-            # Check to make sure we don't seek past boundry
-            if new_offset > self.size:
-                # If the calculated new offset is bigger than our length
-                # then seek to the end.
-                self.our_offset = self.size
-            elif new_offset < 0:
-                # If the calculated new offset is less than 0 then seek to 0
-                self.our_offset = 0
-            return self.our_offset
-        elif whence == 2:
-            if offset >= 0:
-                # Can't seek a positive number beyond the end of the file
-                self.our_offset = self.size
-                return self.our_offset
-            else:
-                # Calculate offset from end of file. Offset will be a negative
-                # number so we are adding it.
-                new_offset = self.size + offset
-                if new_offset > self.size:
-                    # One last sanity check
-                    raise ValueError("new_offset is greater than end_offset!")
-                    # self.our_offset = self.size
-                self.our_offset = self.size + offset
-                if self.our_offset > self.size:
-                    raise RuntimeError("our_offset > size!")
-                return self.our_offset
-            # return self.our_offset
-    # pylint: enable=broad-except
+        elif whence == io.SEEK_END:
+            new_offset = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})!")
+        if new_offset < 0:
+            raise ValueError(f"Negative seek position {new_offset}!")
+        self.our_offset = new_offset
+        if new_offset < self.size:
+            self.__bucket_for(new_offset)
+        return self.our_offset
+
+    def __bucket_for(self, offset):
+        """Bucket holding offset, trying the current bucket first.
+
+        Args:
+            offset (int): Offset in bytes.
+
+        Returns:
+            BucketHandle: BucketHandle object or None.
+        """
+
+        if not self.buckets:
+            return None
+        if self.get_current_bucket().is_me(offset):
+            return self.get_current_bucket()
+        try:
+            self.set_bucket(offset)
+        except RuntimeError:
+            return None
+        return self.get_current_bucket()
 
     def get_current_bucket(self):
         """Returns the current bucket for our current offset.
@@ -415,6 +438,9 @@ class ExtFsFileHandle:
     def find_bucket(self, offset):
         """Finds a bucket for a given offset.
 
+        Bisects the sorted bucket start offsets, O(log n) in the number of
+        buckets.
+
         Args:
             offset (int): Offset in bytes.
 
@@ -425,16 +451,20 @@ class ExtFsFileHandle:
             BucketHandle: BucketHandle object.
         """
 
-        for bucket in self.buckets:
-            if bucket.is_me(offset):
-                return bucket
+        # Last bucket starting at or before offset. Buckets are contiguous so
+        # an empty bucket is always followed by one with the same start.
+        n = bisect.bisect_right(self.bucket_starts, offset) - 1
+        if n >= 0 and self.buckets[n].is_me(offset):
+            return self.buckets[n]
         raise RuntimeError("Could not find bucket for offset: %s" % offset)
 
     def close(self) -> None:
-        """Closes the file's underlying handle.
-        """
+        """Closes the handle.
 
-        return self.f.close()
+        The image is shared with the filesystem and other handles so it is
+        left open.
+        """
+        super().close()
 
     @property
     def length(self) -> int:
@@ -3,12 +3,24 @@
 
 # pylint: disable=too-many-lines
 
-from typing import Dict, Iterator
+from array import array
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Tuple
 import io
-import more_itertools
 from ExtFs.ext3 import Ext3Filesystem
 from ExtFs.filehandle import ExtFsFileHandle
+from ExtFs.hashing import (DEFAULT_ALGORITHMS, DEFAULT_HASH_WORKERS, HashResult, HashStats,
+                           hash_files)
+from ExtFs.image import coalesce_ranges
+from ExtFs.index import image_key, read_index, write_index
+from ExtFs.parallel import scan
+from ExtFs.sweep import iter_inode_tables
 
+# Largest gap in bytes between two files' data read through by read_many()
+READ_MANY_MAX_GAP = 64 * 1024
+
+# Largest single read in bytes of read_many()
+READ_MANY_MAX_READ = 4 * 1024 * 1024
 
 D_FILE_TYPE = {
     'unknown': 0,
@@ -63,6 +75,79 @@ INODE_PROPS = [
     'sparse',
 ]
 
+
+def size_bucket(size: int) -> int:
+    """Size bucket of a file size.
+
+    Bucket 0 holds empty files and bucket ``n`` sizes from ``2 ** (n - 1)``
+    up to ``2 ** n - 1`` bytes.
+
+    Args:
+
+        size (int): Size in bytes.
+
+    Returns:
+
+        int: Bucket number.
+    """
+    return int(size).bit_length()
+
+
+def match_entry(entry: Dict, patterns: Sequence[str]) -> bool:
+    """Match an entry against shell style patterns.
+
+    Patterns with a "/" are matched against the full path of the entry,
+    others against its name only.
+
+    Args:
+
+        entry (dict): Attributes of the entry.
+        patterns (Sequence[str]): Patterns, see :mod:`fnmatch`.
+
+    Returns:
+
+        bool: Whether or not any of the patterns matches.
+    """
+    for pattern in patterns:
+        if fnmatchcase(entry['full_path'] if "/" in pattern else entry['name'], pattern):
+            return True
+    return False
+
+
+def entry_in_range(entry: Dict, file_type: str = None, min_size: int = 0,
+                   max_size: int = None) -> bool:
+    """Match an entry against a file type and a size range.
+
+    Args:
+
+        entry (dict): Attributes of the entry.
+        file_type (str, optional): File type string such as "file". Defaults to None, any type.
+        min_size (int, optional): Smallest size in bytes. Defaults to 0.
+        max_size (int, optional): Largest size in bytes. Defaults to None, no limit.
+
+    Returns:
+
+        bool: Whether or not the entry is of the type and in the size range.
+    """
+    if file_type is not None and entry['file_type_str'] != file_type:
+        return False
+    return entry['size'] >= min_size and (max_size is None or entry['size'] <= max_size)
+
+
+def has_magic(pattern: str) -> bool:
+    """Whether or not a glob pattern component has wildcards.
+
+    Args:
+
+        pattern (str): Pattern component.
+
+    Returns:
+
+        bool: True if the component is not a plain name.
+    """
+    return any(c in pattern for c in "*?[")
+
+
 class Filesystem:
     """Ext3 Filesystem abstraction class.
     """
@@ -74,16 +159,57 @@ class Filesystem:
     #     return pprint.pformat(vars(self), indent=4)
 
     # pylint: disable=line-too-long
-    def __init__(self, fileobj: io.BytesIO = None, f: io.BytesIO = None, master_offset: int = 0, filename: str = None):
+    def __init__(self, fileobj: io.BytesIO = None, f: io.BytesIO = None, master_offset: int = 0, filename: str = None, use_mmap: bool = False, lazy: bool = False, index_filename: str = None, workers: int = None):
+        """Ext filesystem.
+
+        Args:
+
+            fileobj (io.BytesIO, optional): File-like object of filesystem.
+            f (io.BytesIO, optional): Deprecated alias of fileobj.
+            master_offset (int, optional): Offset in bytes from start of file to begin. Defaults to 0.
+            filename (str, optional): Filename of image if no file-like object is given.
+            use_mmap (bool, optional): Memory map the image and parse structures straight
+                from the mapping. Defaults to False.
+            lazy (bool, optional): Only read the root directory in :func:`run` and resolve
+                paths one component at a time as they are looked up. Defaults to False.
+            index_filename (str, optional): Sidecar index (see :mod:`ExtFs.index`). :func:`run`
+                loads it if it matches the image, otherwise parses the filesystem and saves it.
+            workers (int, optional): Walk the filesystem with this many processes, each
+                scanning a share of the block groups (see :mod:`ExtFs.parallel`). Needs
+                ``filename``. Defaults to None, a walk in this process.
+
+        Raises:
+            ValueError: If ``workers`` is more than one without ``filename``.
+        """
+        if workers is not None and workers > 1 and filename is None:
+            raise ValueError("workers needs filename, worker processes open the image themselves!")
         # TODO: Make sure everything using this class stops using 'f' and switches to 'fileobj
         self.__f = fileobj or f
+        self.use_mmap = use_mmap
+        self.lazy = lazy
+        self.index_filename = index_filename
+        self.workers = workers
 
         self.filename = filename
         self.master_offset = master_offset
         self.obj_count = 1
         self.dir_entries = dict()
+        # Full paths of the entries of each directory by its path ("" is the root)
+        self.children = dict()
+        # Path of each directory by its inode number
+        self.directory_paths = {2: ""}
+        # Full paths of entries by file type string
+        self.type_paths = dict()
+        # Full paths of entries by inode number, more than one for hard links
+        self.inode_paths = dict()
+        # Full paths of regular files by size bucket, see size_bucket()
+        self.size_buckets = dict()
+        # Inode numbers by allocation status (True/False), see get_inode_numbers()
+        self.inode_allocation = None
         self.root_dir = None
         self.fs: Ext3Filesystem = None
+        # Paths of directories whose entries are in dir_entries ("" is the root)
+        self.__listed_directories = set()
     # pylint: enable=line-too-long
 
     def run(self) -> None:
@@ -94,21 +220,92 @@ class Filesystem:
         """Sets up and runs Ext3Filesystem and walks directory tree."""
 
         if self.fs is None:
-            self.fs = Ext3Filesystem()
+            self.fs = Ext3Filesystem(use_mmap=self.use_mmap)
         self.fs.filename = self.filename
         self.fs.master_offset = self.master_offset
         # Provide our file handle if it isn't None
         if self.f is not None:
             self.fs.f = self.f
-        self.fs.run()
-        self.fs.walk_root_directory(inode_num=2)
+        if self.index_filename is not None:
+            self.fs.setup()
+            if image_key(self.fs) is None:
+                raise ValueError("index_filename needs an image backed by a file!")
+            if self.load_index(self.index_filename):
+                return
+            self.fs.read_group_descriptor_table()
+            self.fs.walk_root_directory(inode_num=2)
+        else:
+            # Ext3Filesystem.run() reads the root directory
+            self.fs.run()
         # Check to see if root inode is zeroed
         if self.fs.is_inode_zeroed(2) is True:
             raise RuntimeError("inode 2 is zeroed!")
         # Process inode 2 as the root directory
-        self.root_dir = self.fs.dirs[2]
-        # Build directory walking with "" as the parent_path
-        self.directory_walking(self.root_dir, "")
+        self.root_dir = self.read_directory(2)
+        # In lazy mode directories are read as paths are resolved
+        if not self.lazy and self.workers is not None and self.workers > 1:
+            self.parallel_walking()
+        elif not self.lazy:
+            # Build directory walking with "" as the parent_path
+            self.directory_walking(self.root_dir, "")
+        if self.index_filename is not None:
+            self.save_index(self.index_filename)
+
+    def save_index(self, filename: str) -> None:
+        """Save the parsed filesystem to a sidecar index.
+
+        File parts of regular files are calculated first so they are part
+        of the index.
+
+        Args:
+
+            filename (str): Filename of the index.
+        """
+
+        for full_path, entry in self.dir_entries.items():
+            if entry['file_type_str'] == "file" and 'file_parts' not in entry:
+                file_parts = self.calculate_file_parts(full_path)
+                if file_parts is not None:
+                    entry.update(file_parts)
+
+        self.fs.gdts.clean_for_pickle()
+        try:
+            write_index(filename, image_key(self.fs), {
+                'gdts': self.fs.gdts,
+                'dir_entries': self.dir_entries,
+                'listed_directories': self.__listed_directories,
+                'obj_count': self.obj_count,
+            })
+        finally:
+            self.fs.gdts.f = self.fs.image
+
+    def load_index(self, filename: str) -> bool:
+        """Load the parsed filesystem from a sidecar index.
+
+        The superblock must have been read (see :func:`Ext3Filesystem.setup`)
+        to check that the index belongs to the image as it is now.
+
+        Args:
+
+            filename (str): Filename of the index.
+
+        Returns:
+
+            bool: Whether or not the index was loaded.
+        """
+
+        state = read_index(filename, image_key(self.fs))
+        if state is None:
+            return False
+
+        state['gdts'].f = self.fs.image
+        self.fs.gdts = state['gdts']
+        self.dir_entries = state['dir_entries']
+        self.__rebuild_indexes()
+        self.__listed_directories = state['listed_directories']
+        self.obj_count = state['obj_count']
+        self.root_dir = self.read_directory(2)
+        return True
 
     # pylint: disable=line-too-long
     def directory_walking(self, root: 'Ext3Directory', parent_path: str, recurse: bool = True) -> None:
@@ -118,7 +315,8 @@ class Filesystem:
 
             root (Ext3Directory): Root directory instance.
             parent_path (str): The path of directory in which this directory resides.
-            recurse (bool): Recurse into subdirectories. Defaults to True.
+            recurse (bool): Recurse into subdirectories. Subdirectories are only
+                read when recursing. Defaults to True.
         """
 
         if root is None:
@@ -143,39 +341,12 @@ class Filesystem:
             # If the directory name is not . and not ..
             if e.name != "." and e.name != ".." and e.file_type_str != "unknown":
 
-                full_path = f"{parent_path}/{e.name}"
-                inode = self.fs.get_inode(e.inode)
-
-                props = {
-                    'obj_id': self.obj_count,
-                    'name': e.name,
-                    'parent_path': parent_path,
-                    'full_path': full_path,
-                    'inode': e.inode,
-                    'size': inode.i_size_lo,
-                }
-
-                for attribute in INODE_PROPS:
-                    props[attribute] = getattr(inode, attribute)
-
-                # TODO: If self.fs.sb.INCOMPAT_FILETYPE is True we should grab the
-                # file type information from the directory.
-                if self.superblock.INCOMPAT_FILETYPE:
-                    props['file_type'] = e.file_type
-                    props['file_type_str'] = e.file_type_str
-                else:
-                    props['file_type'] = D_FILE_TYPE[inode.file_type]
-                    props['file_type_str'] = inode.file_type
-
-                self.dir_entries[full_path] = props
-                self.obj_count += 1
+                props = self.__add_entry(e, parent_path)
 
                 # Recurse if we are a directory
                 if props['file_type_str'] == "directory":
-                    self.fs.walk_root_directory(e.inode)
-                    subdir = self.fs.dirs[e.inode]
                     # Add directory to subdirectories list for recursion
-                    subdirectories.append((subdir, full_path))
+                    subdirectories.append((e.inode, props['full_path']))
 
         # Return if we aren't recursing
         if recurse is False:
@@ -183,10 +354,201 @@ class Filesystem:
 
         # Now recurse into subdirectories
         for entry in subdirectories:
-            subdir, my_path = entry
-            self.directory_walking(subdir, my_path)
+            inode_num, my_path = entry
+            self.directory_walking(self.read_directory(inode_num), my_path)
     # pylint: enable=line-too-long
 
+    def __add_entry(self, e: 'Ext3DirectoryEntryVersion2', parent_path: str, inode_props: Dict = None) -> Dict: # pylint: disable=line-too-long
+        """Add a directory entry to :attr:`directory_entries`.
+
+        Args:
+
+            e (Ext3DirectoryEntryVersion2): Directory entry.
+            parent_path (str): The path of directory in which the entry resides.
+            inode_props (dict, optional): ``INODE_PROPS`` and ``file_type`` of the entry's
+                inode. Read from the inode when not given. Defaults to None.
+
+        Returns:
+
+            dict: Attributes of the entry. Entries already present are returned as is.
+        """
+
+        full_path = f"{parent_path}/{e.name}"
+        if full_path in self.dir_entries:
+            return self.dir_entries[full_path]
+        if inode_props is None:
+            inode = self.fs.get_inode(e.inode)
+            inode_props = {attribute: getattr(inode, attribute) for attribute in INODE_PROPS}
+            inode_props['file_type'] = inode.file_type
+
+        props = {
+            'obj_id': self.obj_count,
+            'name': e.name,
+            'parent_path': parent_path,
+            'full_path': full_path,
+            'inode': e.inode,
+            'size': inode_props['i_size_lo'] or 0,
+        }
+        # i_size_high only holds the upper half of the size for regular files
+        if inode_props['file_type'] == "file":
+            props['size'] |= (inode_props['i_size_high'] or 0) << 32
+
+        for attribute in INODE_PROPS:
+            props[attribute] = inode_props[attribute]
+
+        # TODO: If self.fs.sb.INCOMPAT_FILETYPE is True we should grab the
+        # file type information from the directory.
+        if self.superblock.INCOMPAT_FILETYPE:
+            props['file_type'] = e.file_type
+            props['file_type_str'] = e.file_type_str
+        else:
+            props['file_type'] = D_FILE_TYPE[inode_props['file_type']]
+            props['file_type_str'] = inode_props['file_type']
+
+        self.dir_entries[full_path] = props
+        self.__index_entry(props)
+        self.obj_count += 1
+        return props
+
+    def __index_entry(self, props: Dict) -> None:
+        """Add an entry of :attr:`directory_entries` to the lookup indexes.
+
+        Args:
+
+            props (dict): Attributes of the entry.
+        """
+
+        full_path = props['full_path']
+        self.children.setdefault(props['parent_path'], []).append(full_path)
+        self.type_paths.setdefault(props['file_type_str'], []).append(full_path)
+        self.inode_paths.setdefault(props['inode'], []).append(full_path)
+        if props['file_type_str'] == "directory":
+            self.directory_paths[props['inode']] = full_path
+        elif props['file_type_str'] == "file":
+            self.size_buckets.setdefault(size_bucket(props['size']), []).append(full_path)
+
+    def __rebuild_indexes(self) -> None:
+        """Rebuild the lookup indexes from :attr:`directory_entries`."""
+
+        self.children = dict()
+        self.directory_paths = {2: ""}
+        self.type_paths = dict()
+        self.inode_paths = dict()
+        self.size_buckets = dict()
+        for props in self.dir_entries.values():
+            self.__index_entry(props)
+
+    def parallel_walking(self) -> None:
+        """Walk the whole filesystem with a process pool.
+
+        Inodes and directories are scanned per block group in ``workers``
+        processes (see :func:`ExtFs.parallel.scan`) and the results are
+        walked from the root in the same order as :func:`directory_walking`,
+        so :attr:`directory_entries` and object ids come out the same.
+        """
+
+        if self.filename is None:
+            raise ValueError("workers needs filename, worker processes open the image themselves!")
+        inodes, dirs = scan(self.filename, self.master_offset, self.use_mmap,
+                            self.fs.sb.block_group_count, INODE_PROPS, self.workers)
+
+        # (inode number, path) of directories still to walk, depth first
+        pending = [(2, "")]
+        while pending:
+            inode_num, parent_path = pending.pop()
+            entries = dirs.get(inode_num)
+            if entries is None:
+                # Not found by the scan (e.g. not marked in the inode bitmap)
+                entries = self.read_directory(inode_num).entries
+            subdirectories = list()
+            for e in entries:
+                if e.inode == 0 or e.name in (".", "..") or e.file_type_str == "unknown":
+                    continue
+                props = self.__add_entry(e, parent_path, inodes.get(e.inode))
+                if props['file_type_str'] == "directory":
+                    subdirectories.append((e.inode, props['full_path']))
+            pending.extend(reversed(subdirectories))
+
+    def read_directory(self, inode_num: int) -> 'Ext3Directory':
+        """Read a directory, reusing it if it has been read before.
+
+        Args:
+
+            inode_num (int): Inode number of the directory.
+
+        Returns:
+
+            Ext3Directory: Ext3Directory instance for the inode.
+        """
+
+        directory = self.fs.dirs.get(inode_num)
+        if directory is None:
+            directory = self.fs.walk_root_directory(inode_num)
+        return directory
+
+    def list_directory(self, full_path: str) -> None:
+        """Add the entries of a directory to :attr:`directory_entries`.
+
+        Used in ``lazy`` mode. Each directory is only listed once, paths
+        which are not directories are ignored.
+
+        Args:
+
+            full_path (str): Full path of the directory, "" or "/" for the root.
+        """
+
+        if full_path == "/":
+            full_path = ""
+        if full_path in self.__listed_directories:
+            return
+        if full_path == "":
+            directory = self.root_dir
+        else:
+            entry = self.dir_entries[full_path]
+            if entry['file_type_str'] != "directory":
+                return
+            directory = self.read_directory(entry['inode'])
+        self.__listed_directories.add(full_path)
+        self.directory_walking(directory, full_path, recurse=False)
+
+    def resolve(self, full_path: str) -> bool:
+        """Make sure a path is in :attr:`directory_entries`.
+
+        In ``lazy`` mode ``full_path`` is looked up one component at a time
+        with :func:`Ext3Filesystem.lookup`, which only reads the hash tree leaf
+        holding the name for indexed directories. Otherwise the whole tree
+        has been walked by :func:`run` already.
+
+        Args:
+
+            full_path (str): Full path of a file or directory.
+
+        Returns:
+
+            bool: Whether or not the path exists.
+        """
+
+        if full_path in self.dir_entries:
+            return True
+        if not self.lazy:
+            return False
+
+        path = ""
+        for name in [name for name in full_path.split("/") if name]:
+            if path and self.dir_entries[path]['file_type_str'] != "directory":
+                return False
+            child_path = f"{path}/{name}"
+            if child_path not in self.dir_entries:
+                if path in self.__listed_directories or name in (".", ".."):
+                    return False
+                inode_num = self.dir_entries[path]['inode'] if path else 2
+                e = self.fs.lookup(inode_num, name)
+                if e is None or e.inode == 0 or e.file_type_str == "unknown":
+                    return False
+                self.__add_entry(e, path)
+            path = child_path
+        return full_path in self.dir_entries
+
     def calculate_file_parts(self, full_path: str) -> Dict:
         """Calculates the file parts of a file.
 
@@ -194,6 +556,10 @@ class Filesystem:
         ranges of the file in various sequences so the file can be read and
         returned as a file-like object.
 
+        Parts are built straight from the inode's block runs, one part per
+        run. Holes become parts with ``sparse`` set to ``True`` and the last
+        part is trimmed to the size of the file.
+
         """
 
         e = self.get_file(full_path)
@@ -201,36 +567,43 @@ class Filesystem:
 
         # Only do the range calculation on regular files
         if e['file_type_str'] == "file" and e['size'] > 0:
-            dblocks = inode.dblocks
-
-            consec_blocks = list((i[0], i[-1]) for i in [list(group) for group in more_itertools.consecutive_groups(dblocks)]) # pylint: disable=line-too-long
+            block_size = self.fs.sb.block_size
+            file_size = e['size']
 
             parts = dict()
 
             i = 0
-            running_start = 0
-            for pair in consec_blocks:
-                start_block, end_block = pair
-                end_block += 1
-                start_byte = (start_block * self.fs.sb.block_size) + self.master_offset
-                end_byte = (end_block * self.fs.sb.block_size) + self.master_offset
-                length = end_byte - start_byte
-                parts[i] = {}
-                parts[i]['block_start'] = start_block
-                parts[i]['block_end'] = end_block
-                parts[i]['byte_start'] = start_byte
-                parts[i]['byte_end'] = end_byte
-                parts[i]['byte_len'] = length
-                parts[i]['running_start'] = running_start
-                parts[i]['running_end'] = running_start + length
-                parts[i]['sparse'] = False
-                running_start += length
+            for run in inode.runs:
+                running_start = run.logical * block_size
+                if running_start >= file_size:
+                    break
+                length = min(run.length * block_size, file_size - running_start)
+                start_byte = (run.physical * block_size) + self.master_offset
+                parts[i] = {
+                    'block_start': run.physical,
+                    'block_end': run.physical_end,
+                    'byte_start': start_byte,
+                    'byte_end': start_byte + length,
+                    'byte_len': length,
+                    'running_start': running_start,
+                    'running_end': running_start + length,
+                    'sparse': run.sparse,
+                }
                 i += 1
 
-            # Remove slack
-            last = parts[i-1]
-            slack = last['byte_end'] - e['size']
-            last['byte_end'] -= slack
+            # Trailing hole after the last run
+            running_end = parts[i-1]['running_end'] if parts else 0
+            if running_end < file_size:
+                parts[i] = {
+                    'block_start': 0,
+                    'block_end': 0,
+                    'byte_start': self.master_offset,
+                    'byte_end': self.master_offset + file_size - running_end,
+                    'byte_len': file_size - running_end,
+                    'running_start': running_end,
+                    'running_end': file_size,
+                    'sparse': True,
+                }
 
             return {'file_parts': parts}
 
@@ -249,7 +622,7 @@ class Filesystem:
             bytes: Bytes for full_path.
         """
 
-        file_entry = self.directory_entries[full_path]
+        file_entry = self.get_file(full_path)
         file_size = file_entry['size']
 
         if file_size == 0:
@@ -258,8 +631,9 @@ class Filesystem:
             buf = b""
             return buf
 
-        buf = b""
         bytes_read = 0
+        # Image offset just past the last byte read
+        position = 0
         if number_of_bytes is None:
             bytes_remaining = file_size
         else:
@@ -268,6 +642,11 @@ class Filesystem:
             else:
                 bytes_remaining = number_of_bytes
 
+        # Every part is read straight into one zero filled buffer so holes
+        # need no work at all
+        buf = bytearray(0 if slack_only else bytes_remaining)
+        view = memoryview(buf)
+
         if 'file_parts' not in file_entry:
             # Try and get file_parts
             file_parts = self.calculate_file_parts(full_path)
@@ -290,33 +669,28 @@ class Filesystem:
             if slack_only is True:
                 # We're only interested in the slack so we don't need to read the
                 # contents... just seek...
-                seek_to = byte_start + byte_len
-                self.f.seek(seek_to)
+                position = byte_start + byte_len
             else:
-                if file_entry['file_parts'][seq_no]['sparse'] is True:
-                    # If this sequence is a sparse sequence then zero fill
-                    # self.__log.debug("Sequence: %s added byte_len: %s"
-                    #            "bytes of zero fill for sparse", seq_no, byte_len)
-                    buf += b"\x00" * byte_len
-                else:
-                    # Seek to the byte start location and read byte_len bytes
-                    self.f.seek(byte_start)
-                    buf += self.f.read(byte_len)
+                if file_entry['file_parts'][seq_no]['sparse'] is not True and byte_len > 0:
+                    # Read byte_len bytes at the byte start location
+                    self.fs.image.readinto_at(byte_start, view[bytes_read:bytes_read + byte_len])
+                    position = byte_start + byte_len
             bytes_remaining -= byte_len
             bytes_read += byte_len
+        view.release()
 
         if bytes_remaining > 0:
             # We've read all the file parts and we still have bytes remaining
-            # so this is probably a sparse file no end blocks.
-            buf += b"\x00" * bytes_remaining
-            return buf
+            # so this is probably a sparse file no end blocks. The rest of buf
+            # is already zeros.
+            return bytes(buf)
 
         if number_of_bytes is None and include_slack is True:
             # If we want to include the slack along with the contents of the file
             # then we need to know the size of the slack and read that amount
             # into buf.
             slack_size = self.slack_space_size(full_path)
-            buf += self.f.read(slack_size)
+            buf += self.fs.image.read_at(position, slack_size)
         elif slack_only is True:
             # If we are only interested in the slack then let's do this ghetto
             # hack and overwrite buf after the file has been read. We could
@@ -329,28 +703,15 @@ class Filesystem:
             #     slack_size = self.dir_entries[full_path]['slack_size']
             # else:
             slack_size = self.slack_space_size(full_path)
-            buf = self.f.read(slack_size)
+            return self.fs.image.read_at(position, slack_size)
 
-        return buf
+        return bytes(buf)
 
-    def open(self, full_path: str) -> io.BytesIO:
+    def open(self, full_path: str) -> ExtFsFileHandle:
         """Open a file.
 
-        Opens a file for reading and returns a file-like object.
-
-        Args:
-
-            full_path (str): Full path of file to open.
-
-        Returns:
-
-            io.BytesIO: io.BytesIO instance containing contents of file.
-        """
-
-        return io.BytesIO(self.__read_to_str(full_path))
-
-    def open_test_handle(self, full_path: str) -> ExtFsFileHandle:
-        """Open a file using experimental file handle.
+        Opens a file for reading and returns a streaming file-like object.
+        Contents are read from the image as they are requested.
 
         Args:
 
@@ -361,9 +722,11 @@ class Filesystem:
             ExtFsFileHandle: ExtFsFileHandle object.
         """
 
-        file_entry = self.directory_entries[full_path]
+        file_entry = self.get_file(full_path)
         size = file_entry['size']
         name = file_entry['name']
+        if size == 0:
+            return ExtFsFileHandle(self.fs.image, name, size, {})
         if 'file_parts' not in file_entry:
             # Try and get file_parts
             file_parts = self.calculate_file_parts(full_path)
@@ -376,7 +739,132 @@ class Filesystem:
 
         file_parts = file_entry['file_parts']
 
-        return ExtFsFileHandle(self.f, name, size, file_parts)
+        return ExtFsFileHandle(self.fs.image, name, size, file_parts)
+
+    def read_many(self, full_paths: Iterable[str], max_gap: int = READ_MANY_MAX_GAP,
+                  max_read: int = READ_MANY_MAX_READ) -> Iterator[Tuple[str, int, bytes]]:
+        """Read many files in one forward sweep over the image.
+
+        Generator. The file parts of every file are sorted by their offset in
+        the image and merged into reads of at most ``max_read`` bytes, parts
+        less than ``max_gap`` bytes apart sharing a read. Data is yielded in
+        image order, so the chunks of a fragmented file can come out of order
+        and interleaved with other files.
+
+        Holes are not yielded, the rest of a file up to its ``size`` is zeros.
+        A file without any data, e.g. an empty file, yields one empty chunk at
+        offset 0 so every path is seen.
+
+            >>> for full_path, offset, chunk in fs.read_many(paths):
+            ...     sinks[full_path].seek(offset)
+            ...     sinks[full_path].write(chunk)
+
+        Args:
+
+            full_paths (Iterable[str]): Full paths of regular files.
+            max_gap (int, optional): Largest gap in bytes read through to merge two
+                parts. Defaults to READ_MANY_MAX_GAP.
+            max_read (int, optional): Largest read in bytes, and largest chunk.
+                Defaults to READ_MANY_MAX_READ.
+
+        Returns:
+
+            Tuple[str, int, bytes]: Full path, offset in the file and data.
+        """
+
+        if max_read <= 0:
+            raise ValueError("max_read must be > 0!")
+        # (image offset, length, full path, offset in file) of every piece of data
+        pieces = list()
+        for full_path in full_paths:
+            if self.get_file(full_path)['file_type_str'] != "file":
+                raise ValueError(f"'{full_path}' is not a regular file")
+            parts = [part for part in self.get_file_parts(full_path).values()
+                     if not part['sparse'] and part['byte_len'] > 0]
+            if not parts:
+                yield full_path, 0, b""
+            for part in parts:
+                for start in range(0, part['byte_len'], max_read):
+                    length = min(max_read, part['byte_len'] - start)
+                    pieces.append((part['byte_start'] + start, length, full_path,
+                                   part['running_start'] + start))
+        pieces.sort(key=lambda piece: piece[0])
+
+        i = 0
+        for offset, length in coalesce_ranges([piece[:2] for piece in pieces], max_gap, max_read):
+            buf = self.fs.image.view_at(offset, length)
+            view = memoryview(buf)
+            # Pieces are sorted by offset and each one is inside a merged range
+            while i < len(pieces) and pieces[i][0] + pieces[i][1] <= offset + length:
+                start, piece_length, full_path, file_offset = pieces[i]
+                piece_start = start - offset
+                yield full_path, file_offset, bytes(view[piece_start:piece_start + piece_length])
+                i += 1
+            view.release()
+
+    def hash_all(self, full_paths: Iterable[str] = None, *,
+                 algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+                 workers: int = DEFAULT_HASH_WORKERS, stats: HashStats = None,
+                 **kwargs) -> Iterator[HashResult]:
+        """Hash the contents of every regular file.
+
+        Generator. Contents are read in image order with :func:`read_many`
+        and hashed with every algorithm in one pass by a pool of threads, see
+        :func:`ExtFs.hashing.hash_files`. Results come out as files are done.
+
+            >>> stats = HashStats()
+            >>> for result in fs.hash_all(stats=stats):
+            ...     print(result.full_path, result.digests['sha256'])
+            >>> stats.throughput
+
+        Args:
+
+            full_paths (Iterable[str], optional): Full paths of files to hash. Defaults
+                to None, every file in :attr:`directory_entries`.
+            algorithms (Sequence[str], optional): hashlib algorithms. Defaults to md5,
+                sha1 and sha256.
+            workers (int, optional): Hashing threads. Defaults to DEFAULT_HASH_WORKERS.
+            stats (HashStats, optional): Statistics updated while hashing. Defaults to None.
+            **kwargs: ``max_pending``, ``max_buffered`` and ``max_read`` of
+                :func:`ExtFs.hashing.hash_files`.
+
+        Returns:
+
+            HashResult: Full path, size and hex digests keyed by algorithm of a file.
+        """
+
+        if full_paths is None:
+            full_paths = list(self.filenames)
+        return hash_files(self, full_paths, algorithms=algorithms, workers=workers, stats=stats,
+                          **kwargs)
+
+    def open_test_handle(self, full_path: str) -> ExtFsFileHandle:
+        """Deprecated alias of :func:`open`.
+
+        Args:
+
+            full_path (str): Full path of file to open.
+
+        Returns:
+
+            ExtFsFileHandle: ExtFsFileHandle object.
+        """
+
+        return self.open(full_path)
+
+    def read_all(self, full_path: str) -> bytes:
+        """Read the whole contents of a file.
+
+        Args:
+
+            full_path (str): Full path of file to read.
+
+        Returns:
+
+            bytes: Contents of the file.
+        """
+
+        return self.__read_to_str(full_path)
 
     def slack_open(self, full_path: str) -> io.BytesIO:
         """Opens a file's slack.
@@ -402,7 +890,7 @@ class Filesystem:
             int: Slack space of file in bytes.
         """
 
-        if 'd_blocks_count' in self.dir_entries[full_path]:
+        if 'd_blocks_count' in self.get_file(full_path):
             size_on_fs = self.superblock.block_size * self.dir_entries[full_path]['d_blocks_count']
             size = self.dir_entries[full_path]['size']
             slack = size_on_fs - size
@@ -431,7 +919,7 @@ class Filesystem:
 
             bool: Whether or not full_path is a file.
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise RuntimeError("Could not find file with path: " + full_path)
 
         file_attributes = self.get_file(full_path)
@@ -447,7 +935,7 @@ class Filesystem:
         Returns:
             bool: Whether or not full_path is a file.
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise RuntimeError("Could not find file with path: " + full_path)
 
         file_attributes = self.get_file(full_path)
@@ -476,7 +964,7 @@ class Filesystem:
         :raises: RuntimeError
 
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise KeyError(f"Could not find directory with path '{full_path}'")
 
         return self.directory_entries[full_path]
@@ -498,12 +986,230 @@ class Filesystem:
             dict: Dictionary of file/directory attributes.
         """
 
-        if full_path not in self.directory_entries and full_path != "/":
+        if full_path != "/" and not self.resolve(full_path):
             raise KeyError(f"Could not find directory with path '{full_path}'")
+        if self.lazy:
+            self.list_directory(full_path)
+
+        for child_path in self.children.get("" if full_path == "/" else full_path, ()):
+            yield self.directory_entries[child_path]
+
+    def get_directory_contents_by_inode(self, inode_number: int) -> Iterator[Dict]:
+        """Gets the contents of a directory by its inode number.
+
+        Generator.
+
+        Args:
+
+            inode_number (int): Inode number of the directory, 2 for the root.
+
+        Raises:
+            KeyError: If no directory with 'inode_number' has been read.
+
+        Returns:
+
+            dict: Dictionary of file/directory attributes.
+        """
+
+        if inode_number not in self.directory_paths:
+            raise KeyError(f"Could not find directory with inode {inode_number}")
+        yield from self.get_directory_contents(self.directory_paths[inode_number] or "/")
+
+    def get_paths_for_inode(self, inode_number: int) -> List[str]:
+        """Gets every path of an inode.
+
+        Args:
+
+            inode_number (int): Inode number.
+
+        Returns:
+
+            List[str]: Full paths linking to the inode in the order they were
+            found, empty if there are none.
+        """
+
+        return list(self.inode_paths.get(inode_number, ()))
+
+    def get_entries_by_type(self, file_type_str: str) -> Iterator[Dict]:
+        """Gets the entries of one file type.
+
+        Generator.
+
+        Args:
+
+            file_type_str (str): File type, a key of ``D_FILE_TYPE`` such as "file" or "symlink".
+
+        Returns:
+
+            dict: Dictionary of file/directory attributes.
+        """
+
+        for full_path in self.type_paths.get(file_type_str, ()):
+            yield self.directory_entries[full_path]
+
+    def get_files_by_size(self, min_size: int = 0, max_size: int = None) -> Iterator[Dict]:
+        """Gets the regular files with a size in a range.
+
+        Generator. Only the size buckets overlapping the range are visited.
+
+        Args:
+
+            min_size (int, optional): Smallest size in bytes. Defaults to 0.
+            max_size (int, optional): Largest size in bytes. Defaults to None, no limit.
+
+        Returns:
+
+            dict: Dictionary of file attributes.
+        """
+
+        low = size_bucket(min_size)
+        high = None if max_size is None else size_bucket(max_size)
+        for bucket in sorted(self.size_buckets):
+            if bucket < low or (high is not None and bucket > high):
+                continue
+            for full_path in self.size_buckets[bucket]:
+                entry = self.directory_entries[full_path]
+                if entry['size'] >= min_size and (max_size is None or entry['size'] <= max_size):
+                    yield entry
+
+    def __list_children(self, full_path: str) -> List[Dict]:
+        """Entries of a directory, listing it first in ``lazy`` mode.
+
+        Args:
+
+            full_path (str): Full path of the directory, "" for the root.
+
+        Returns:
+
+            List[dict]: Attributes of the entries.
+        """
+
+        if self.lazy:
+            self.list_directory(full_path)
+        return [self.directory_entries[child_path]
+                for child_path in self.children.get(full_path, ())]
+
+    # pylint: disable=too-many-arguments
+    def find(self, top: str = "/", *, include: Sequence[str] = None,
+             exclude: Sequence[str] = None, max_depth: int = None, file_type: str = None,
+             min_size: int = 0,
+             max_size: int = None) -> Iterator[Dict]:
+        """Find entries under a directory.
+
+        Generator. Entries are visited depth first in directory order.
+        Directories matching ``exclude`` and directories at ``max_depth`` are
+        not descended into, so in ``lazy`` mode they are never read. Patterns
+        are matched with :func:`match_entry`.
+
+        Args:
+
+            top (str, optional): Full path of the directory to search. Defaults to "/".
+            include (Sequence[str], optional): Only yield entries matching one of these.
+                Defaults to None, every entry.
+            exclude (Sequence[str], optional): Skip entries, and everything below them,
+                matching one of these. Defaults to None.
+            max_depth (int, optional): Deepest level to yield, 1 is the entries of
+                ``top``. Defaults to None, no limit.
+            file_type (str, optional): Only yield entries of this file type such as
+                "file" or "directory". Defaults to None, every type.
+            min_size (int, optional): Only yield entries of at least this size.
+                Defaults to 0.
+            max_size (int, optional): Only yield entries of at most this size.
+                Defaults to None.
+
+        Raises:
+            KeyError: If directory with 'top' is not found.
+
+        Returns:
+
+            dict: Dictionary of file/directory attributes.
+        """
+
+        top = "" if top == "/" else top.rstrip("/")
+        if top and self.get_directory(top)['file_type_str'] != "directory":
+            raise KeyError(f"'{top}' is not a directory")
+        if max_depth is not None and max_depth < 1:
+            return
 
-        for values in self.directory_entries.values():
-            if values['parent_path'] == full_path or (values['parent_path'] == "" and full_path == "/"): # pylint: disable=line-too-long
-                yield values
+        # (path, depth) of directories still to list, depth first
+        pending = [(top, 1)]
+        while pending:
+            path, depth = pending.pop()
+            subdirectories = list()
+            for entry in self.__list_children(path):
+                if exclude and match_entry(entry, exclude):
+                    continue
+                if ((include is None or match_entry(entry, include))
+                        and entry_in_range(entry, file_type, min_size, max_size)):
+                    yield entry
+                if (entry['file_type_str'] == "directory"
+                        and (max_depth is None or depth < max_depth)):
+                    subdirectories.append((entry['full_path'], depth + 1))
+            pending.extend(reversed(subdirectories))
+    # pylint: enable=too-many-arguments
+
+    def glob(self, pattern: str) -> Iterator[Dict]:
+        """Find entries matching a glob pattern.
+
+        Generator. Each component of ``pattern`` is matched with :mod:`fnmatch`
+        against one level of the tree, ``**`` matches any number of levels.
+        Only directories that can still lead to a match are read and plain
+        components are looked up (see :func:`resolve`) instead of listing the
+        directory.
+
+            >>> fs.glob("/home/*/.ssh/*")
+            >>> fs.glob("/var/log/**/*.gz")
+
+        Args:
+
+            pattern (str): Absolute glob pattern.
+
+        Returns:
+
+            dict: Dictionary of file/directory attributes, in directory order.
+        """
+
+        parts = [part for part in pattern.split("/") if part]
+        if not parts:
+            return
+
+        def closure(states: Set[int]) -> Set[int]:
+            # "**" can match zero levels so its position also stands for the next one
+            states = set(states)
+            for i in sorted(states):
+                while i < len(parts) and parts[i] == "**":
+                    i += 1
+                    states.add(i)
+            return states
+
+        # (path, pattern positions) of directories still to read, depth first
+        pending = [("", closure({0}))]
+        while pending:
+            path, states = pending.pop()
+            wanted = [parts[i] for i in states if i < len(parts)]
+            if all(not has_magic(part) for part in wanted):
+                # Plain names only, look them up instead of listing everything
+                entries = [self.directory_entries[f"{path}/{name}"]
+                           for name in dict.fromkeys(wanted) if self.resolve(f"{path}/{name}")]
+            else:
+                entries = self.__list_children(path)
+            subdirectories = list()
+            for entry in entries:
+                next_states = set()
+                for i in states:
+                    if i == len(parts):
+                        continue
+                    if parts[i] == "**":
+                        next_states.add(i)
+                    elif fnmatchcase(entry['name'], parts[i]):
+                        next_states.add(i + 1)
+                next_states = closure(next_states)
+                if len(parts) in next_states:
+                    yield entry
+                if (entry['file_type_str'] == "directory"
+                        and any(i < len(parts) for i in next_states)):
+                    subdirectories.append((entry['full_path'], next_states))
+            pending.extend(reversed(subdirectories))
 
     def get_file(self, full_path: str):
         """Gets file attributes.
@@ -515,7 +1221,7 @@ class Filesystem:
         :raises: RuntimeError
 
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise KeyError(f"Could not find file with path '{full_path}'")
 
         return self.directory_entries[full_path]
@@ -530,7 +1236,7 @@ class Filesystem:
         :raises: RuntimeError
 
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise KeyError(f"Could not find file with path '{full_path}'")
 
         file_attributes = self.get_file(full_path)
@@ -546,7 +1252,7 @@ class Filesystem:
         :raises: RuntimeError
 
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise KeyError(f"Could not find file with path '{full_path}'")
         file_attributes = self.get_file(full_path)
         return file_attributes['inode']
@@ -561,9 +1267,16 @@ class Filesystem:
         :raises: RuntimeError
 
         """
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise KeyError(f"Could not find file with path '{full_path}'")
         file_attributes = self.get_file(full_path)
+        if 'file_parts' not in file_attributes:
+            if file_attributes['file_type_str'] == "file" and file_attributes['size'] == 0:
+                return {}
+            file_parts = self.calculate_file_parts(full_path)
+            if file_parts is None:
+                raise RuntimeError(f"No file_parts in {full_path}")
+            file_attributes.update(file_parts)
         return file_attributes['file_parts']
 
     def get_file_permissions(self, full_path: str) -> Dict:
@@ -578,7 +1291,7 @@ class Filesystem:
             dict: Dictionary containing file permissions.
         """
 
-        if full_path not in self.directory_entries:
+        if not self.resolve(full_path):
             raise KeyError(f"Could not find file with path '{full_path}'")
 
         file_attributes = self.get_file(full_path)
@@ -622,6 +1335,15 @@ class Filesystem:
         self.__f = value
         self.fs.f = value
 
+    def close(self) -> None:
+        """Release the image.
+
+        Unmaps the image when ``use_mmap`` is in use. The file handle passed
+        in belongs to the caller and is not closed.
+        """
+        if self.fs is not None:
+            self.fs.close()
+
     @property
     def superblock(self):
         """Returns filesystem superblock.
@@ -636,6 +1358,8 @@ class Filesystem:
     def directory_entries(self):
         """Returns dictionary of directory entries in filesystem.
 
+        In ``lazy`` mode only entries of directories listed so far are present.
+
         :returns: Dictionary of directory entries keyed as path.
         :setter: Sets directory entries.
         :rtype: dict
@@ -646,6 +1370,7 @@ class Filesystem:
     @directory_entries.setter
     def directory_entries(self, value):
         self.dir_entries = value
+        self.__rebuild_indexes()
 
     @property
     def number_of_blocks(self) -> int:
@@ -741,9 +1466,7 @@ class Filesystem:
         :rtype: dict
 
         """
-        for entry in self.directory_entries:
-            if self.directory_entries[entry]['file_type_str'] == "file":
-                yield self.directory_entries[entry]
+        yield from self.get_entries_by_type("file")
 
     @property
     def filenames(self):
@@ -755,9 +1478,7 @@ class Filesystem:
         :rtype: str
 
         """
-        for entry in self.directory_entries:
-            if self.directory_entries[entry]['file_type_str'] == "file":
-                yield entry
+        yield from self.type_paths.get("file", ())
 
     @property
     def directories(self):
@@ -769,37 +1490,61 @@ class Filesystem:
         :rtype: dict
 
         """
-        for entry in self.directory_entries:
-            if self.directory_entries[entry]['file_type_str'] == "directory":
-                yield self.directory_entries[entry]
+        yield from self.get_entries_by_type("directory")
+
+    def get_inode_numbers(self, allocated: bool = True) -> array:
+        """Numbers of the inodes of the whole filesystem by allocation status.
+
+        The index is built on first use with one sweep over the inode tables
+        and bitmaps (see :func:`ExtFs.sweep.iter_inode_tables`) and kept in
+        ``inode_allocation``, four bytes per inode.
+
+        Args:
+
+            allocated (bool, optional): Allocated inodes if True, otherwise
+                unallocated inodes that are not zeroed. Defaults to True.
+
+        Returns:
+
+            array: Inode numbers in ascending order.
+        """
+
+        if self.inode_allocation is None:
+            inode_allocation = {True: array('I'), False: array('I')}
+            for inode_tbl in iter_inode_tables(self.fs, range(self.fs.sb.block_group_count)):
+                for record in inode_tbl.records.values():
+                    inode_allocation[bool(record.allocated)].append(record.inode_number)
+            self.inode_allocation = inode_allocation
+        return self.inode_allocation[allocated]
 
     @property
     def allocated_inodes(self):
         """Allocated inodes.
 
-        Generator.
+        Generator. Every inode marked in the inode bitmaps, see
+        :func:`get_inode_numbers`.
 
         :returns: An allocated inode from the filesystem.
-        :rtype: dict
+        :rtype: Ext3Inode
 
         """
-        for inode in self.fs.inodes:
-            if self.fs.inodes[inode].allocated == 1:
-                yield self.fs.inodes[inode]
+        for inode_number in self.get_inode_numbers(True):
+            yield self.fs.get_inode(inode_number)
 
     @property
     def unallocated_inodes(self):
         """Unallocated inodes.
 
-        Generator.
+        Generator. Inodes not marked in the inode bitmaps that still hold
+        data, e.g. deleted files. Zeroed inodes are skipped, see
+        :func:`get_inode_numbers`.
 
         :returns: An unallocated inode from the filesystem.
-        :rtype: dict
+        :rtype: Ext3Inode
 
         """
-        for inode in self.fs.inodes:
-            if self.fs.inodes[inode].allocated == 0:
-                yield self.fs.inodes[inode]
+        for inode_number in self.get_inode_numbers(False):
+            yield self.fs.get_inode(inode_number)
 
     @property
     def allocated_blocks(self):
@@ -3,8 +3,83 @@
 
 import io
 import struct
+from collections.abc import Mapping
+from typing import Iterator
+
+from ExtFs.image import as_image
 from ExtFs.util import map_bitmap
 
+# struct ext4_group_desc, 32 bytes
+GDT_FIELDS_32 = (
+    'bg_block_bitmap_lo',
+    'bg_inode_bitmap_lo',
+    'bg_inode_table_lo',
+    'bg_free_blocks_count_lo',
+    'bg_free_inodes_count_lo',
+    'bg_used_dirs_count_lo',
+    'bg_flags',
+    'bg_exclude_bitmap_lo',
+    'bg_block_bitmap_csum_lo',
+    'bg_inode_bitmap_csum_lo',
+    'bg_itable_unused_lo',
+    'bg_checksum',
+)
+UNPACK_GDT_32 = struct.Struct("<3I4HI4H")
+
+# 64-bit mode (struct size 64 bytes)
+GDT_FIELDS_64 = GDT_FIELDS_32 + (
+    'bg_block_bitmap_hi',
+    'bg_inode_bitmap_hi',
+    'bg_inode_table_hi',
+    'bg_free_blocks_count_hi',
+    'bg_free_inodes_count_hi',
+    'bg_used_dirs_count_hi',
+    'bg_itable_unused_hi',
+    'bg_exclude_bitmap_hi',
+    'bg_block_bitmap_csum_hi',
+    'bg_inode_bitmap_csum_hi',
+    'bg_reserved',
+)
+UNPACK_GDT_64 = struct.Struct("<3I4HI4H3I4HI2H4s")
+
+# Older attribute names. Fields split in _lo/_hi halves are aliases of the
+# combined values (see the Ext3Gdt properties), the others of the raw field.
+GDT_ALIASES = (
+    ('location_bitmap_block', 'block_bitmap'),
+    ('location_bitmap_inode', 'inode_bitmap'),
+    ('location_table_inode', 'inode_table'),
+    ('count_block_free', 'free_blocks_count'),
+    ('count_inode_free', 'free_inodes_count'),
+    ('count_directories', 'used_dirs_count'),
+    ('flags_blockgroup', 'bg_flags'),
+    ('location_bitmap_snapshot_exclusion', 'exclude_bitmap'),
+    ('bitmap_block_checksum', 'bg_block_bitmap_csum_lo'),
+    ('bitmap_inode_checksum', 'bg_inode_bitmap_csum_lo'),
+    ('count_inode_unused', 'itable_unused'),
+    ('gdt_checksum', 'bg_checksum'),
+)
+
+
+def gdt_struct(desc_size: int) -> struct.Struct:
+    """Struct of one group descriptor.
+
+    Args:
+
+        desc_size (int): Size of a descriptor in bytes, 32 or ``s_desc_size``.
+
+    Returns:
+
+        struct.Struct: ``UNPACK_GDT_32``, ``UNPACK_GDT_64`` or ``UNPACK_GDT_64``
+        followed by padding for larger descriptors.
+    """
+    if desc_size <= 32:
+        return UNPACK_GDT_32
+    if desc_size == 64:
+        return UNPACK_GDT_64
+    if desc_size < 64:
+        raise ValueError(f"Unsupported group descriptor size {desc_size}!")
+    return struct.Struct(UNPACK_GDT_64.format + f"{desc_size - 64}x")
+
 class Ext3Gdt:
     """Ext3Gdt.
 
@@ -14,7 +89,9 @@ class Ext3Gdt:
     __slots__ = [
         'f',
         '__sb',
+        '__buf',
         'group_number',
+        'location',
         'fs_parent_id',
         'location_bitmap_block',
         'location_bitmap_inode',
@@ -63,19 +140,22 @@ class Ext3Gdt:
     # def __repr__(self):
     #     return pprint.pformat(vars(self), indent=4)
 
-    def __init__(self, sb: 'Ext3Superblock' = None, f: io.BytesIO = None, group_number: int = None):
+    def __init__(self, sb: 'Ext3Superblock' = None, f: io.BytesIO = None, group_number: int = None, location: int = None): # pylint: disable=line-too-long
         """Create and read Gdt for a group.
 
         Args:
 
             sb (Ext3Superblock): Ext3Superblock instance for filesystem.
-            f (io.BytesIO): File-like object for filesystem.
+            f (io.BytesIO): File-like or image object for filesystem.
             group_number (int): Group number of Gdt.
+            location (int): Offset in bytes of the group descriptor.
         """
-        self.f = f
+        self.f = as_image(f)
         self.__sb = sb
+        self.__buf = None
 
         self.group_number = group_number
+        self.location = location
         self.fs_parent_id = None
 
         # 32-bit mode (struct size 32 bytes)
@@ -137,7 +217,7 @@ class Ext3Gdt:
         self.bits = 32
         if sb is not None:
             # Set some options from superblock
-            if sb.s_desc_size is not None and sb.s_desc_size > 32:
+            if sb.INCOMPAT_64BITS and sb.s_desc_size is not None and sb.s_desc_size > 32:
                 # s_desc_size from superblock tells us the size of
                 # a GDT in bytes. Default being 32 bytes and
                 # should be 64 bytes in 64-bit mode. 64-bit mode
@@ -191,70 +271,81 @@ class Ext3Gdt:
         """
         return self.__EXT4_BG_INODE_ZEROED
 
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
-        """
-        return struct.unpack("<I", self.f.read(4))[0]
+    def __combine(self, lo: int, hi: int, shift: int = 32) -> int:
+        """Combine the halves of a field, ``hi`` is None in 32-bit mode."""
+        if hi is None:
+            return lo
+        return lo | (hi << shift)
 
-    def __le_ushort(self) -> int:
-        """Get little endian unsigned short.
-        """
-        return struct.unpack("<H", self.f.read(2))[0]
+    @property
+    def block_bitmap(self) -> int:
+        """Block number of the block bitmap (``bg_block_bitmap_lo``/``_hi``)."""
+        return self.__combine(self.bg_block_bitmap_lo, self.bg_block_bitmap_hi)
 
-    def run(self) -> None:
-        """Reads the GDT from file handle f.
-        """
+    @property
+    def inode_bitmap(self) -> int:
+        """Block number of the inode bitmap (``bg_inode_bitmap_lo``/``_hi``)."""
+        return self.__combine(self.bg_inode_bitmap_lo, self.bg_inode_bitmap_hi)
 
-        # Read 32 bytes regardless
-        self.location_bitmap_block = self.__le_uint()
-        self.bg_block_bitmap_lo = self.location_bitmap_block
+    @property
+    def inode_table(self) -> int:
+        """Block number of the inode table (``bg_inode_table_lo``/``_hi``)."""
+        return self.__combine(self.bg_inode_table_lo, self.bg_inode_table_hi)
 
-        self.location_bitmap_inode = self.__le_uint()
-        self.bg_inode_bitmap_lo = self.location_bitmap_inode
+    @property
+    def exclude_bitmap(self) -> int:
+        """Block number of the snapshot exclusion bitmap (``bg_exclude_bitmap_lo``/``_hi``)."""
+        return self.__combine(self.bg_exclude_bitmap_lo, self.bg_exclude_bitmap_hi)
 
-        self.location_table_inode = self.__le_uint()
-        self.bg_inode_table_lo = self.location_bitmap_inode
+    @property
+    def free_blocks_count(self) -> int:
+        """Free blocks (``bg_free_blocks_count_lo``/``_hi``)."""
+        return self.__combine(self.bg_free_blocks_count_lo, self.bg_free_blocks_count_hi, 16)
 
-        self.count_block_free = self.__le_ushort()
-        self.bg_free_blocks_count_lo = self.count_block_free
+    @property
+    def free_inodes_count(self) -> int:
+        """Free inodes (``bg_free_inodes_count_lo``/``_hi``)."""
+        return self.__combine(self.bg_free_inodes_count_lo, self.bg_free_inodes_count_hi, 16)
 
-        self.count_inode_free = self.__le_ushort()
-        self.bg_free_inodes_count_lo = self.count_inode_free
+    @property
+    def used_dirs_count(self) -> int:
+        """Directories (``bg_used_dirs_count_lo``/``_hi``)."""
+        return self.__combine(self.bg_used_dirs_count_lo, self.bg_used_dirs_count_hi, 16)
+
+    @property
+    def itable_unused(self) -> int:
+        """Never used inodes at the end of the inode table (``bg_itable_unused_lo``/``_hi``)."""
+        return self.__combine(self.bg_itable_unused_lo, self.bg_itable_unused_hi, 16)
 
-        self.count_directories = self.__le_ushort()
-        self.bg_used_dirs_count_lo = self.count_directories
+    def run(self) -> None:
+        """Reads the GDT from the image at ``location``.
 
-        self.flags_blockgroup = self.__le_ushort()
-        self.bg_flags = self.flags_blockgroup
+        Raises:
+            ValueError: If ``location`` was not given.
+        """
 
-        self.location_bitmap_snapshot_exclusion = self.__le_uint()
-        self.bg_exclude_bitmap_lo = self.location_bitmap_snapshot_exclusion
+        if self.location is None:
+            raise ValueError("location of group descriptor is required!")
 
-        self.bitmap_block_checksum = self.__le_ushort()
-        self.bg_block_bitmap_csum_lo = self.bitmap_block_checksum
+        # 32 byte descriptor, 64 bytes in 64-bit mode
+        unpacker = UNPACK_GDT_64 if self.bits == 64 else UNPACK_GDT_32
+        self.__buf = self.f.view_at(self.location, unpacker.size)
+        self.decode(unpacker.unpack_from(self.__buf))
+        self.__sb = None
+        self.__buf = None
 
-        self.bitmap_inode_checksum = self.__le_ushort()
-        self.bg_inode_bitmap_csum_lo = self.bitmap_inode_checksum
+    def decode(self, values: tuple) -> None:
+        """Set the fields from an unpacked descriptor.
 
-        self.count_inode_unused = self.__le_ushort()
-        self.bg_itable_unused_lo = self.count_inode_unused
+        Args:
 
-        self.gdt_checksum = self.__le_ushort()
-        self.bg_checksum = self.gdt_checksum
+            values (tuple): Values unpacked with ``UNPACK_GDT_32`` or ``UNPACK_GDT_64``.
+        """
 
-        if self.bits == 64:
-            # Read the extra 32 bytes
-            self.bg_block_bitmap_hi = self.__le_uint()
-            self.bg_inode_bitmap_hi = self.__le_uint()
-            self.bg_inode_table_hi = self.__le_uint()
-            self.bg_free_blocks_count_hi = self.__le_ushort()
-            self.bg_free_inodes_count_hi = self.__le_ushort()
-            self.bg_used_dirs_count_hi = self.__le_ushort()
-            self.bg_itable_unused_hi = self.__le_ushort()
-            self.bg_exclude_bitmap_hi = self.__le_uint()
-            self.bg_block_bitmap_csum_hi = self.__le_ushort()
-            self.bg_inode_bitmap_csum_hi = self.__le_ushort()
-            self.bg_reserved = self.f.read(4)
+        for name, value in zip(GDT_FIELDS_64, values):
+            setattr(self, name, value)
+        for alias, name in GDT_ALIASES:
+            setattr(self, alias, getattr(self, name))
 
         gdt_flags = (
             (0x1, 'EXT4_BG_INODE_UNINIT'),
@@ -277,5 +368,91 @@ class Ext3Gdt:
             if k in r:
                 setattr(self, v, True)
 
+    def clean_for_pickle(self) -> None:
+        """Clean for pickle.
 
+        Cleans out cruft so class can be pickled.
+        """
+        self.f = None
         self.__sb = None
+        self.__buf = None
+
+
+class Ext3GdtTable(Mapping):
+    """Ext3GdtTable.
+
+    The whole group descriptor table, read with one read and decoded with
+    ``iter_unpack`` into a list of tuples. Maps group numbers to
+    :class:`Ext3Gdt` objects which are only created when a group is looked up.
+    """
+
+    __slots__ = [
+        'f',
+        'location',
+        'desc_size',
+        'group_count',
+        'records',
+        'gdts',
+    ]
+
+    def __init__(self, f: io.BytesIO = None, location: int = None, desc_size: int = 32, group_count: int = 0): # pylint: disable=line-too-long
+        """Create the group descriptor table.
+
+        Args:
+
+            f (io.BytesIO): File-like or image object for filesystem.
+            location (int): Offset in bytes of the first group descriptor.
+            desc_size (int, optional): Size of a descriptor in bytes. Defaults to 32.
+            group_count (int, optional): Number of block groups. Defaults to 0.
+        """
+        self.f = as_image(f)
+        self.location = location
+        self.desc_size = desc_size
+        self.group_count = group_count
+        self.records = []
+        # Ext3Gdt objects created so far, keyed by group number
+        self.gdts = dict()
+
+    def run(self) -> None:
+        """Read and decode the table.
+
+        Raises:
+            ValueError: If ``location`` was not given.
+        """
+
+        if self.location is None:
+            raise ValueError("location of group descriptor table is required!")
+        unpacker = gdt_struct(self.desc_size)
+        buf = self.f.view_at(self.location, self.group_count * unpacker.size)
+        # A truncated image yields fewer records
+        buf = buf[:len(buf) - len(buf) % unpacker.size]
+        self.records = list(unpacker.iter_unpack(buf))
+        self.gdts = dict()
+
+    def __getitem__(self, group_number: int) -> Ext3Gdt:
+        gdt = self.gdts.get(group_number)
+        if gdt is not None:
+            return gdt
+        if not 0 <= group_number < len(self.records):
+            raise KeyError(group_number)
+
+        gdt = Ext3Gdt(f=self.f, group_number=group_number,
+                      location=self.location + group_number * self.desc_size)
+        gdt.bits = 64 if self.desc_size > 32 else 32
+        gdt.decode(self.records[group_number])
+        self.gdts[group_number] = gdt
+        return gdt
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.records)))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def clean_for_pickle(self) -> None:
+        """Clean for pickle.
+
+        Only the records are kept, Ext3Gdt objects are created again on lookup.
+        """
+        self.f = None
+        self.gdts = dict()
@@ -0,0 +1,342 @@
+"""Bulk content hashing.
+
+Every file is hashed with several algorithms in one pass over its contents.
+Data is read with :func:`ExtFs.fs.Filesystem.read_many`, i.e. in image
+order, put back in file order and fed to worker threads (hashlib releases
+the GIL while hashing). Each file is hashed by one worker so its updates stay
+in order, different files are hashed at the same time. At most
+``max_pending`` chunks are waiting to be hashed at any time.
+
+Files are read in windows of at most ``max_buffered`` bytes of data, so the
+chunks held back until the rest of their file arrives never add up to more
+than that. Larger files are read on their own in file order.
+"""
+
+import hashlib
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Sequence, Tuple
+
+# Algorithms hashed by default, names of hashlib.new()
+DEFAULT_ALGORITHMS = ('md5', 'sha1', 'sha256')
+
+# Default number of hashing threads
+DEFAULT_HASH_WORKERS = 4
+
+# Default number of chunks read but not hashed yet
+DEFAULT_MAX_PENDING = 16
+
+# Default number of bytes of file data read together, see hash_files()
+DEFAULT_MAX_BUFFERED = 64 * 1024 * 1024
+
+# Largest chunk of zeros hashed for a hole and of a file read in file order
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Hashes of a file, digests are hex strings keyed by algorithm
+HashResult = namedtuple('HashResult', ['full_path', 'size', 'digests'])
+
+
+class HashStats:
+    """HashStats.
+
+    Progress of :func:`hash_files`, updated as files are hashed.
+    """
+
+    __slots__ = ['files', 'bytes', 'bytes_read', 'started', 'finished']
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.bytes_read = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def seconds(self) -> float:
+        """Time spent hashing so far, in seconds."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Bytes of file contents hashed per second."""
+        seconds = self.seconds
+        return self.bytes / seconds if seconds > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        """Statistics.
+
+        Returns:
+
+            Dict: files, bytes (contents hashed including holes), bytes_read
+            (data read from the image), seconds and throughput.
+        """
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'bytes_read': self.bytes_read,
+            'seconds': self.seconds,
+            'throughput': self.throughput,
+        }
+
+
+class FileState: # pylint: disable=too-many-instance-attributes
+    """FileState.
+
+    Reassembles the chunks of one file in file order. Chunks that arrive
+    ahead of the current position wait in ``pending``, holes are zeros.
+    """
+
+    __slots__ = ['full_path', 'size', 'data', 'data_size', 'image_offset', 'data_index',
+                 'position', 'pending', 'hashes', 'worker']
+
+    def __init__(self, full_path: str, size: int, file_parts: Dict, algorithms: Sequence[str],
+                 worker: ThreadPoolExecutor):
+        """Create the state of a file.
+
+        Args:
+
+            full_path (str): Full path of the file.
+            size (int): Size of the file in bytes.
+            file_parts (Dict): File parts, see
+                :func:`ExtFs.fs.Filesystem.calculate_file_parts`.
+            algorithms (Sequence[str]): Hash algorithms.
+            worker (ThreadPoolExecutor): Single thread pool hashing this file.
+        """
+        self.full_path = full_path
+        self.size = size
+        parts = [part for part in file_parts.values()
+                 if not part['sparse'] and part['byte_len'] > 0]
+        # (start, end) in the file of ranges holding data, the rest is holes
+        self.data = sorted((part['running_start'], part['running_start'] + part['byte_len'])
+                           for part in parts)
+        self.data_size = sum(part['byte_len'] for part in parts)
+        # Where the data of the file starts in the image, files are read in this order
+        self.image_offset = min((part['byte_start'] for part in parts), default=0)
+        self.data_index = 0
+        self.position = 0
+        self.pending = {}
+        self.hashes = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+        self.worker = worker
+
+    @property
+    def done(self) -> bool:
+        """Whether or not the whole file has been passed on."""
+        return self.position >= self.size
+
+    def ready(self, zeros: bytes) -> Iterator[bytes]:
+        """Chunks that can be hashed next, in file order.
+
+        Generator.
+
+        Args:
+
+            zeros (bytes): Zeros to hash holes with, holes are hashed in pieces
+                of this size.
+
+        Returns:
+
+            bytes: Next chunk of the file.
+        """
+        data = self.data
+        while not self.done:
+            while self.data_index < len(data) and data[self.data_index][1] <= self.position:
+                self.data_index += 1
+            if self.position in self.pending:
+                chunk = self.pending.pop(self.position)
+                self.position += len(chunk)
+                yield chunk
+            elif self.data_index < len(data) and data[self.data_index][0] <= self.position:
+                # Waiting for data further on in the image
+                return
+            else:
+                end = data[self.data_index][0] if self.data_index < len(data) else self.size
+                length = min(end - self.position, len(zeros))
+                self.position += length
+                yield zeros[:length]
+
+
+def update(hashes: Dict, chunk: bytes, semaphore: threading.BoundedSemaphore) -> None:
+    """Hash a chunk. Runs in a worker thread.
+
+    Args:
+
+        hashes (Dict): hashlib objects keyed by algorithm.
+        chunk (bytes): Data.
+        semaphore (threading.BoundedSemaphore): Released once hashed.
+    """
+    try:
+        for h in hashes.values():
+            h.update(chunk)
+    finally:
+        semaphore.release()
+
+
+def finalize(state: FileState) -> HashResult:
+    """Digests of a file. Runs in the worker thread of the file.
+
+    Args:
+
+        state (FileState): File hashed.
+
+    Returns:
+
+        HashResult: Digests of the file.
+    """
+    digests = {algorithm: h.hexdigest() for algorithm, h in state.hashes.items()}
+    return HashResult(state.full_path, state.size, digests)
+
+
+def windows(states: Iterable[FileState], max_buffered: int) -> Iterator[Sequence[FileState]]:
+    """Group files into windows read together.
+
+    Generator. Files are taken in image order and a window holds at most
+    ``max_buffered`` bytes of data. A file with more data than that is a
+    window of its own.
+
+    Args:
+
+        states (Iterable[FileState]): Files to read.
+        max_buffered (int): Largest amount of data in a window, in bytes.
+
+    Returns:
+
+        Sequence[FileState]: Files of a window.
+    """
+    window = []
+    window_size = 0
+    for state in sorted(states, key=lambda state: state.image_offset):
+        if window and window_size + state.data_size > max_buffered:
+            yield window
+            window = []
+            window_size = 0
+        window.append(state)
+        window_size += state.data_size
+    if window:
+        yield window
+
+
+def read_window(fs: 'Filesystem', window: Sequence[FileState], max_buffered: int,
+                max_read: int = None) -> Iterator[Tuple[FileState, int, bytes]]:
+    """Read the data of a window of files, see :func:`windows`.
+
+    Generator. The files of a window are read together in image order with
+    :func:`Filesystem.read_many`. A file with more than ``max_buffered``
+    bytes of data is read in file order instead, holes are skipped.
+
+    Args:
+
+        fs (Filesystem): Filesystem to read from.
+        window (Sequence[FileState]): Files to read.
+        max_buffered (int): Largest amount of data read in image order, in bytes.
+        max_read (int, optional): Largest read and chunk. Defaults to None,
+            the default of :func:`Filesystem.read_many`.
+
+    Returns:
+
+        Tuple[FileState, int, bytes]: File, offset in the file and data.
+    """
+    if len(window) == 1 and window[0].data_size > max_buffered:
+        state = window[0]
+        chunk_size = max_read or DEFAULT_CHUNK_SIZE
+        with fs.open(state.full_path) as fh:
+            for start, end in state.data:
+                fh.seek(start)
+                for offset in range(start, end, chunk_size):
+                    yield state, offset, fh.read(min(chunk_size, end - offset))
+        return
+    states = {state.full_path: state for state in window}
+    read_kwargs = {} if max_read is None else {'max_read': max_read}
+    for full_path, offset, chunk in fs.read_many(list(states), **read_kwargs):
+        yield states[full_path], offset, chunk
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def hash_files(fs: 'Filesystem', full_paths: Iterable[str], *,
+               algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+               workers: int = DEFAULT_HASH_WORKERS, max_pending: int = DEFAULT_MAX_PENDING,
+               max_buffered: int = DEFAULT_MAX_BUFFERED, max_read: int = None,
+               stats: HashStats = None) -> Iterator[HashResult]:
+    """Hash the contents of files.
+
+    Generator. Results are yielded as files are finished, roughly in image
+    order rather than in the order of ``full_paths``.
+
+    Args:
+
+        fs (Filesystem): Filesystem to read from.
+        full_paths (Iterable[str]): Full paths of regular files.
+        algorithms (Sequence[str], optional): hashlib algorithms.
+            Defaults to DEFAULT_ALGORITHMS.
+        workers (int, optional): Hashing threads. Defaults to DEFAULT_HASH_WORKERS.
+        max_pending (int, optional): Chunks read but not hashed yet.
+            Defaults to DEFAULT_MAX_PENDING.
+        max_buffered (int, optional): Bytes of file data read in one sweep with
+            :func:`Filesystem.read_many`, which bounds the chunks held back until
+            the rest of their file arrives. Defaults to DEFAULT_MAX_BUFFERED.
+        max_read (int, optional): Largest read and chunk, see
+            :func:`Filesystem.read_many`.
+        stats (HashStats, optional): Statistics updated while hashing. Defaults to None.
+
+    Returns:
+
+        HashResult: Digests of a file.
+    """
+    for name, value in (('workers', workers), ('max_pending', max_pending),
+                        ('max_buffered', max_buffered)):
+        if value < 1:
+            raise ValueError(f"{name} must be >= 1!")
+    for algorithm in algorithms:
+        # Fail before reading anything
+        hashlib.new(algorithm)
+    stats = stats if stats is not None else HashStats()
+    stats.started = time.monotonic()
+    stats.finished = None
+
+    zeros = bytes(max_read or DEFAULT_CHUNK_SIZE)
+    semaphore = threading.BoundedSemaphore(max_pending)
+    pool = [ThreadPoolExecutor(max_workers=1, thread_name_prefix="ExtFsHash")
+            for _ in range(workers)]
+    states = {}
+    # Each file once, in the order given
+    for full_path in dict.fromkeys(full_paths):
+        if fs.get_file(full_path)['file_type_str'] != "file":
+            raise ValueError(f"'{full_path}' is not a regular file")
+        states[full_path] = FileState(full_path, fs.get_file_size(full_path),
+                                      fs.get_file_parts(full_path), algorithms,
+                                      pool[len(states) % workers])
+    finished = deque()
+
+    def result() -> HashResult:
+        stats.files += 1
+        return finished.popleft().result()
+
+    def feed(state: FileState) -> None:
+        for chunk in state.ready(zeros):
+            semaphore.acquire() # pylint: disable=consider-using-with
+            stats.bytes += len(chunk)
+            state.worker.submit(update, state.hashes, chunk, semaphore)
+        if state.done:
+            finished.append(state.worker.submit(finalize, state))
+            del states[state.full_path]
+
+    try:
+        for state in [state for state in states.values() if state.size == 0]:
+            feed(state)
+        for window in windows(list(states.values()), max_buffered):
+            for state, offset, chunk in read_window(fs, window, max_buffered, max_read):
+                stats.bytes_read += len(chunk)
+                state.pending[offset] = chunk
+                feed(state)
+                while finished and finished[0].done():
+                    yield result()
+        while finished:
+            yield result()
+    finally:
+        for worker in pool:
+            worker.shutdown(wait=True)
+        stats.finished = time.monotonic()
+# pylint: enable=too-many-arguments,too-many-locals
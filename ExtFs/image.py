@@ -0,0 +1,412 @@
+"""Image access.
+
+Every structure parser reads the image through one of these classes instead
+of calling ``seek()``/``read()`` on a shared file handle. All of them provide:
+
+* ``read_at(offset, length)``: ``bytes`` at an absolute offset.
+* ``view_at(offset, length)``: a buffer usable with ``struct.unpack_from``.
+  For memory mapped and in-memory images this is a zero-copy ``memoryview``.
+* ``readinto_at(offset, buf)``: fill a writable buffer at an absolute offset
+  without allocating intermediate ``bytes`` (``os.preadv`` when available).
+
+Reads are positional so a single parsed filesystem can be shared by several
+threads: real files use ``os.pread``, mapped and in-memory images slice their
+buffer and any other file-like object is read under a lock.
+"""
+
+import io
+import mmap
+import os
+import threading
+from bisect import bisect_right
+from typing import List, Sequence, Tuple, Union
+
+# Source of zeros for zero_fill()
+ZERO_CHUNK = memoryview(bytes(1 << 16))
+
+
+def zero_fill(buf: memoryview) -> None:
+    """Zero a writable buffer in place.
+
+    Args:
+
+        buf (memoryview): Writable byte buffer.
+    """
+    for start in range(0, len(buf), len(ZERO_CHUNK)):
+        chunk = buf[start:start + len(ZERO_CHUNK)]
+        chunk[:] = ZERO_CHUNK[:len(chunk)]
+
+
+class FileImage:
+    """FileImage.
+
+    Image backed by any file-like object with ``seek()`` and ``read()``.
+    Each ``seek()``/``read()`` pair is done under a lock since the file
+    position is shared.
+    """
+
+    __slots__ = ['f', 'lock']
+
+    def __init__(self, f: io.BufferedIOBase):
+        self.f = f
+        self.lock = threading.Lock()
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes at ``offset``.
+
+        Args:
+
+            offset (int): Absolute offset in bytes.
+            length (int): Number of bytes to read.
+
+        Returns:
+
+            bytes: Byte data. Shorter than ``length`` at the end of the image.
+        """
+        with self.lock:
+            self.f.seek(offset)
+            return self.f.read(length)
+
+    def readinto_at(self, offset: int, buf: memoryview) -> int:
+        """Fill ``buf`` with the bytes at ``offset``.
+
+        Args:
+
+            offset (int): Absolute offset in bytes.
+            buf (memoryview): Writable byte buffer.
+
+        Returns:
+
+            int: Number of bytes read. Less than ``len(buf)`` at the end of the image.
+        """
+        buf = memoryview(buf)
+        got = 0
+        with self.lock:
+            self.f.seek(offset)
+            while got < len(buf):
+                if hasattr(self.f, 'readinto'):
+                    n = self.f.readinto(buf[got:])
+                else:
+                    chunk = self.f.read(len(buf) - got)
+                    n = len(chunk)
+                    buf[got:got + n] = chunk
+                if not n:
+                    break
+                got += n
+        return got
+
+    def view_at(self, offset: int, length: int) -> Union[bytes, memoryview]:
+        """Buffer of ``length`` bytes at ``offset``.
+
+        Args:
+
+            offset (int): Absolute offset in bytes.
+            length (int): Number of bytes.
+
+        Returns:
+
+            bytes: Byte data.
+        """
+        return self.read_at(offset, length)
+
+    def close(self) -> None:
+        """Nothing to release, the file handle belongs to the caller."""
+
+
+class PreadImage:
+    """PreadImage.
+
+    Image backed by a real file read with ``os.pread`` which leaves the file
+    position alone.
+    """
+
+    __slots__ = ['f', 'fd']
+
+    def __init__(self, f: io.BufferedIOBase):
+        self.f = f
+        self.fd = f.fileno()
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes at ``offset``. See :func:`FileImage.read_at`."""
+        buf = os.pread(self.fd, length, offset)
+        if len(buf) == length:
+            return buf
+        # Short read, keep going until EOF
+        chunks = [buf]
+        got = len(buf)
+        while buf and got < length:
+            buf = os.pread(self.fd, length - got, offset + got)
+            chunks.append(buf)
+            got += len(buf)
+        return b"".join(chunks)
+
+    def view_at(self, offset: int, length: int) -> bytes:
+        """Buffer of ``length`` bytes at ``offset``. See :func:`FileImage.view_at`."""
+        return self.read_at(offset, length)
+
+    def readinto_at(self, offset: int, buf: memoryview) -> int:
+        """Fill ``buf`` with the bytes at ``offset``. See :func:`FileImage.readinto_at`."""
+        buf = memoryview(buf)
+        got = 0
+        while got < len(buf):
+            if hasattr(os, 'preadv'):
+                n = os.preadv(self.fd, [buf[got:]], offset + got)
+            else:
+                chunk = os.pread(self.fd, len(buf) - got, offset + got)
+                n = len(chunk)
+                buf[got:got + n] = chunk
+            if not n:
+                break
+            got += n
+        return got
+
+    def close(self) -> None:
+        """Nothing to release, the file handle belongs to the caller."""
+
+
+class BufferImage:
+    """BufferImage.
+
+    Image backed by an in-memory buffer (``bytes``, ``bytearray``,
+    ``memoryview``, or the buffer of an ``io.BytesIO``).
+    """
+
+    __slots__ = ['view']
+
+    def __init__(self, buf: Union[bytes, bytearray, memoryview]):
+        self.view = memoryview(buf)
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes at ``offset``. See :func:`FileImage.read_at`."""
+        return self.view[offset:offset + length].tobytes()
+
+    def view_at(self, offset: int, length: int) -> memoryview:
+        """Zero-copy view of ``length`` bytes at ``offset``. See :func:`FileImage.view_at`."""
+        return self.view[offset:offset + length]
+
+    def readinto_at(self, offset: int, buf: memoryview) -> int:
+        """Fill ``buf`` with the bytes at ``offset``. See :func:`FileImage.readinto_at`."""
+        src = self.view[offset:offset + len(buf)]
+        memoryview(buf)[:len(src)] = src
+        return len(src)
+
+    @property
+    def size(self) -> int:
+        """Size of the image in bytes."""
+        return len(self.view)
+
+    def close(self) -> None:
+        """Release the buffer."""
+        self.view.release()
+
+
+class MmapImage(BufferImage):
+    """MmapImage.
+
+    Image memory mapped read-only from a file descriptor or a filename.
+    Structure parsers ``unpack_from`` directly on the mapping.
+    """
+
+    __slots__ = ['mmap', '__f']
+
+    def __init__(self, f: io.BufferedIOBase = None, filename: str = None):
+        """Map an image.
+
+        Args:
+
+            f (io.BufferedIOBase, optional): File object with a real file descriptor.
+            filename (str, optional): Filename to open and map if ``f`` is not given.
+        """
+        self.__f = None
+        if f is None:
+            if filename is None:
+                raise ValueError("Must provide f or filename!")
+            f = self.__f = open(filename, "rb") # pylint: disable=consider-using-with
+        self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(self.mmap)
+
+    def close(self) -> None:
+        """Unmap the image and close the file if we opened it.
+
+        If views handed out by :func:`view_at` are still alive the mapping
+        is left for the garbage collector to unmap.
+        """
+        super().close()
+        try:
+            self.mmap.close()
+        except BufferError:
+            pass
+        if self.__f is not None:
+            self.__f.close()
+            self.__f = None
+
+
+def coalesce_ranges(ranges: Sequence[Tuple[int, int]], max_gap: int, max_length: int) -> List[Tuple[int, int]]: # pylint: disable=line-too-long
+    """Merge byte ranges that are close together into larger ranges.
+
+    Args:
+
+        ranges (Sequence[Tuple[int, int]]): (offset, length) pairs in any order.
+        max_gap (int): Largest gap in bytes between two ranges that are merged.
+        max_length (int): Largest merged range in bytes, longer single ranges are kept.
+
+    Returns:
+
+        List[Tuple[int, int]]: Sorted, non-overlapping (offset, length) pairs.
+    """
+    merged = []
+    for offset, length in sorted(r for r in ranges if r[1] > 0):
+        if merged:
+            start, end = merged[-1]
+            if offset <= end + max_gap and max(end, offset + length) - start <= max_length:
+                merged[-1] = (start, max(end, offset + length))
+                continue
+        merged.append((offset, offset + length))
+    return [(start, end - start) for start, end in merged]
+
+
+class RegionImage:
+    """RegionImage.
+
+    Image with some byte ranges read into memory up front, each with a single
+    read. Reads that fall inside a range are served from it, anything else
+    goes to the wrapped image.
+    """
+
+    __slots__ = ['image', 'starts', 'views']
+
+    def __init__(self, image, ranges: Sequence[Tuple[int, int]]):
+        """Read ranges of an image.
+
+        Args:
+
+            image: Image object to read from.
+            ranges (Sequence[Tuple[int, int]]): Sorted, non-overlapping (offset, length) pairs,
+                see :func:`coalesce_ranges`.
+        """
+        self.image = image
+        self.starts = [offset for offset, _ in ranges]
+        self.views = [memoryview(image.read_at(offset, length)) for offset, length in ranges]
+
+    def __find(self, offset: int, length: int) -> Union[memoryview, None]:
+        """View of ``length`` bytes at ``offset`` if one range holds all of them."""
+        index = bisect_right(self.starts, offset) - 1
+        if index < 0:
+            return None
+        start = offset - self.starts[index]
+        view = self.views[index]
+        if start + length > len(view):
+            return None
+        return view[start:start + length]
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Read ``length`` bytes at ``offset``. See :func:`FileImage.read_at`."""
+        view = self.__find(offset, length)
+        if view is None:
+            return self.image.read_at(offset, length)
+        return view.tobytes()
+
+    def view_at(self, offset: int, length: int) -> Union[bytes, memoryview]:
+        """Buffer of ``length`` bytes at ``offset``. See :func:`FileImage.view_at`."""
+        view = self.__find(offset, length)
+        if view is None:
+            return self.image.view_at(offset, length)
+        return view
+
+    def readinto_at(self, offset: int, buf: memoryview) -> int:
+        """Fill ``buf`` with the bytes at ``offset``. See :func:`FileImage.readinto_at`."""
+        view = self.__find(offset, len(buf))
+        if view is None:
+            return self.image.readinto_at(offset, buf)
+        memoryview(buf)[:len(view)] = view
+        return len(view)
+
+    def close(self) -> None:
+        """Drop the ranges, the wrapped image belongs to the caller."""
+        self.starts = []
+        self.views = []
+
+
+def has_fileno(f) -> bool:
+    """Whether or not a file-like object is backed by a real file descriptor.
+
+    Args:
+
+        f: File-like object.
+
+    Returns:
+
+        bool: True if ``f.fileno()`` works.
+    """
+    try:
+        f.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+    return True
+
+
+def is_real_file(f) -> bool:
+    """Whether or not ``f`` is a plain file object whose contents are exactly
+    what its file descriptor holds, so it can be read with ``os.pread``.
+
+    Args:
+
+        f: File-like object.
+
+    Returns:
+
+        bool: True for file objects returned by ``open()``.
+    """
+    return (hasattr(os, 'pread') and
+            isinstance(f, (io.FileIO, io.BufferedReader, io.BufferedRandom)) and
+            has_fileno(f))
+
+
+def as_image(f) -> Union[FileImage, PreadImage, BufferImage]:
+    """Wrap ``f`` in an image object unless it already is one.
+
+    Args:
+
+        f: Image object, bytes-like object or file-like object.
+
+    Returns:
+
+        FileImage, PreadImage or BufferImage: Image object for ``f``.
+    """
+    if f is None or hasattr(f, 'view_at'):
+        return f
+    if isinstance(f, (bytes, bytearray, memoryview)):
+        return BufferImage(f)
+    if is_real_file(f):
+        return PreadImage(f)
+    return FileImage(f)
+
+
+def open_image(f=None, filename: str = None,
+               use_mmap: bool = False) -> Union[FileImage, PreadImage, BufferImage]:
+    """Create the image object for a filesystem.
+
+    Only plain files (see :func:`is_real_file`) are memory mapped, other
+    file-like objects such as ``gzip.GzipFile`` are read through ``f``.
+
+    Args:
+
+        f (optional): File-like object of the image.
+        filename (str, optional): Filename of the image to map if ``f`` is not given.
+        use_mmap (bool, optional): Memory map the image when possible. Defaults to False.
+
+    Raises:
+        ValueError: If ``f`` is not given and the image is not mapped from ``filename``.
+
+    Returns:
+
+        FileImage, PreadImage or BufferImage: Image object.
+    """
+    if use_mmap:
+        if f is None or is_real_file(f):
+            return MmapImage(f=f, filename=filename)
+        if isinstance(f, io.BytesIO):
+            return BufferImage(f.getbuffer())
+    if f is None:
+        raise ValueError("Must provide f unless the image is mapped from filename!")
+    return as_image(f)
@@ -0,0 +1,117 @@
+"""Sidecar index of a parsed filesystem.
+
+The GDTs and directory entries (with the file parts of every regular file)
+are pickled to a file next to the image so the next :func:`Filesystem.run`
+only has to read the superblock and the root directory.
+
+An index is keyed by the size and mtime of the image and by the UUID and
+last write time of the superblock. If any of them changed, or the index
+can't be read, it is ignored and the filesystem is parsed again. Images that
+are not backed by a file (``BytesIO``, ``bytes``) have no reliable size and
+mtime so they can't be indexed. Indexes are pickles, only load ones you wrote.
+"""
+
+import os
+import pickle
+from typing import Dict, Union
+
+from ExtFs.image import has_fileno
+
+# Bumped whenever the pickled state changes
+INDEX_VERSION = 3
+
+INDEX_SUFFIX = ".extfs-index"
+
+
+def index_filename_for(filename: str) -> str:
+    """Default index filename for an image.
+
+    Args:
+
+        filename (str): Filename of the image.
+
+    Returns:
+
+        str: Filename of the index.
+    """
+    return filename + INDEX_SUFFIX
+
+
+def image_key(fs: 'Ext3Filesystem') -> Union[Dict, None]:
+    """Key identifying an image and its state.
+
+    Args:
+
+        fs (Ext3Filesystem): Filesystem, the superblock must have been read.
+
+    Returns:
+
+        dict or None: Size and mtime of the image, superblock UUID, ``s_wtime``
+        and ``master_offset``. None if the image is not backed by a file.
+    """
+    if fs.f is not None and has_fileno(fs.f):
+        stat = os.fstat(fs.f.fileno())
+    elif fs.f is None and fs.filename is not None:
+        stat = os.stat(fs.filename)
+    else:
+        return None
+
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'uuid': fs.sb.uuid_str,
+        's_wtime': fs.sb.s_wtime,
+        'master_offset': fs.master_offset,
+    }
+
+
+def write_index(filename: str, key: Dict, state: Dict) -> None:
+    """Write an index.
+
+    The file is written next to its final name and renamed into place so a
+    reader never sees a partial index.
+
+    Args:
+
+        filename (str): Filename of the index.
+        key (dict): Key from :func:`image_key`.
+        state (dict): Parsed state to store.
+
+    Raises:
+        ValueError: If the image has no key, see :func:`image_key`.
+    """
+    if key is None:
+        raise ValueError("Only images backed by a file can be indexed!")
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, "wb") as f:
+        # Header first so a stale index is rejected without loading the state
+        pickle.dump({'version': INDEX_VERSION, 'key': key}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_filename, filename)
+
+
+def read_index(filename: str, key: Dict) -> Union[Dict, None]:
+    """Read an index if it matches ``key``.
+
+    Args:
+
+        filename (str): Filename of the index.
+        key (dict): Key from :func:`image_key` for the image being opened.
+
+    Returns:
+
+        dict or None: Stored state or None if the index is missing, stale
+        or unreadable. Always None without a key.
+    """
+    if key is None:
+        return None
+    try:
+        with open(filename, "rb") as f:
+            header = pickle.load(f)
+            if not isinstance(header, dict) or header.get('version') != INDEX_VERSION:
+                return None
+            if header.get('key') != key:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+        return None
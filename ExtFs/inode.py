@@ -5,9 +5,12 @@
 
 import io
 import struct
-from typing import Any, Dict, Iterator, List, Tuple
+from typing import Dict, Iterator, List, Tuple, Union
 
+from ExtFs.bitmap import BitmapView, bitmap_count, bitmap_iter, bitmap_test
 from ExtFs.extent import Ext4Extent, Ext4ExtentHeader, Ext4ExtentIdx
+from ExtFs.image import as_image
+from ExtFs.runs import BlockRunList
 from ExtFs.utility import Ext3Utility
 
 
@@ -19,11 +22,30 @@ UNPACK_EXTENT = struct.Struct("<IHHI")
 UNPACK_EXTENT_IDX = struct.Struct("<IIHH")
 UNPACK_INODE_HEADER = struct.Struct("<HHIIIIIHHII")
 UNPACK_INODE_DBLOCKS = struct.Struct("<IIIIIIIIIIII")
+# struct ext4_inode up to the end of the original 128 byte inode:
+# i_mode .. i_flags, osd1, i_block[15], i_generation, i_file_acl_lo,
+# i_size_high, i_obso_faddr, osd2
+UNPACK_INODE = struct.Struct("<HHIIIIIHHII I 60s IIII 12s")
+
+# i_mode & S_IFMT to file type
+S_IFMT = 0xF000
+S_IFMT_FILE_TYPE = {
+    0x1000: 'fifo',
+    0x2000: 'character_device',
+    0x4000: 'directory',
+    0x6000: 'block_device',
+    0x8000: 'file',
+    0xA000: 'symlink',
+    0xC000: 'socket',
+}
 
 class Ext3InodeBitmap:
     """Ext3InodeBitmap.
 
     Class for processing an Ext Inode Bitmap.
+
+    The bitmap is read in a single read and kept packed in :attr:`raw`, one
+    bit per inode. :attr:`bitmap` is a lazy ``dict``-like view over it.
     """
 
     __slots__ = [
@@ -36,7 +58,8 @@ class Ext3InodeBitmap:
         '__location_block',
         '__location_bytes',
         'size_bytes',
-        'inodes',
+        'raw',
+        '__view',
     ]
 
     # def __str__(self):
@@ -59,7 +82,7 @@ class Ext3InodeBitmap:
             raise ValueError("Must provide superblock object!")
         if gdt is None:
             raise ValueError("Must provide gdt object!")
-        self.f = f
+        self.f = as_image(f)
         self.__sb = sb
         self.__gdt = gdt
 
@@ -72,7 +95,9 @@ class Ext3InodeBitmap:
         # Double slash (//) is integer division and the modulo addition will
         # do the same as math.ceil()
         self.size_bytes = self.num_inodes // 8 + (self.num_inodes % 8 > 0)
-        self.inodes = {}
+        # Packed bitmap, filled in by run()
+        self.raw = bytearray(self.size_bytes)
+        self.__view = None
 
     @property
     def number_of_inodes(self) -> int:
@@ -130,14 +155,68 @@ class Ext3InodeBitmap:
 
 
     @property
-    def bitmap(self) -> Dict:
+    def bitmap(self) -> BitmapView:
         """Bitmap.
 
+        Lazy ``dict``-like view keyed by inode number with ``0``/``1``
+        values. Nothing is expanded until a key is looked up.
+
+        Returns:
+
+            BitmapView: Bitmap contents as a read-only mapping.
+        """
+        if self.__view is None:
+            self.__view = BitmapView(self.raw, self.start_inode + 1, self.num_inodes)
+        return self.__view
+
+    @property
+    def inodes(self) -> BitmapView:
+        """Wrapper to bitmap.
+
+        Returns:
+
+            BitmapView: Bitmap contents as a read-only mapping.
+        """
+        return self.bitmap
+
+    @property
+    def number_of_allocated_inodes(self) -> int:
+        """Number of allocated inodes according to the bitmap.
+
         Returns:
 
-            Dict: Bitmap contents as a dict.
+            int: Number of set bits in the bitmap.
         """
-        return self.inodes
+        return bitmap_count(self.raw, self.num_inodes)
+
+    @property
+    def number_of_unallocated_inodes(self) -> int:
+        """Number of unallocated inodes according to the bitmap.
+
+        Returns:
+
+            int: Number of clear bits in the bitmap.
+        """
+        return self.num_inodes - self.number_of_allocated_inodes
+
+    def is_allocated(self, inode_number: int) -> bool:
+        """Is an inode allocated?
+
+        Args:
+
+            inode_number (int): Inode number.
+
+        Raises:
+            ValueError: If inode number does not belong to this bitmap.
+
+        Returns:
+
+            bool: Whether or not the inode is allocated.
+        """
+        index = inode_number - self.start_inode - 1
+        if index < 0 or index >= self.num_inodes:
+            raise ValueError(f"Inode {inode_number} is not in inode bitmap {self.bitmap_number}!")
+        return bitmap_test(self.raw, index) == 1
 
     @property
     def bitmap_number(self) -> int:
@@ -161,9 +240,7 @@ class Ext3InodeBitmap:
 
             int: An allocated inode number from the inode bitmap.
         """
-        for inode_number in self.inodes:
-            if self.inodes[inode_number] == 1:
-                yield inode_number
+        return bitmap_iter(self.raw, self.num_inodes, self.start_inode + 1, 1)
 
     @property
     def unallocated_inodes(self) -> Iterator[int]:
@@ -175,26 +252,8 @@ class Ext3InodeBitmap:
 
             int: An unallocated inode number from the inode bitmap.
         """
-        for inode_number in self.inodes:
-            if self.inodes[inode_number] == 0:
-                yield inode_number
+        return bitmap_iter(self.raw, self.num_inodes, self.start_inode + 1, 0)
 
-    def __le_char(self) -> int:
-        """Get little endian char.
-        """
-        return struct.unpack("<c", self.f.read(1))[0]
-
-    def __le_uchar(self) -> int:
-        """Get little endian unsigned char.
-        """
-        return struct.unpack("<B", self.f.read(1))[0]
-
-    def __map_bitmap(self, value: int, mapping: Tuple[int, str]) -> List:
-        """Make human readable.
-        """
-        return [t[1] for t in mapping if value & t[0]]
-
-    # pylint: disable=line-too-long,unused-variable
     def run(self) -> None:
         """Read inode bitmap.
         """
@@ -212,62 +271,18 @@ class Ext3InodeBitmap:
 
         if self.__gdt is not None:
             if self.__gdt.EXT4_BG_INODE_UNINIT is True:
-                # Inode and block bitmaps are uninitialized so we need to
-                # create one full of zeros
-                # self.__log.debug("GDT is EXT4_BG_INODE_UNINIT. Creating bitmap...")
-                for x in range(self.start_inode + 1, self.start_inode + 1 + self.num_inodes):
-                    self.inodes[x] = 0
-                # self.__log.debug("Creating bitmap... Done! Returning...")
+                # Inode and block bitmaps are uninitialized so the bitmap
+                # stays full of zeros
                 self.__sb = None
                 self.__gdt = None
                 return
 
-        # Block bitmap is initialized so seek to its location according to the GDT.
-        self.f.seek(self.location_bytes)
-
-        # We read the entire contents of the bitmap at once and create
-        # an io.BytesIO object instead of hitting the disk/file handle
-        # to read 1 byte at a time.
-        # Get the size in bytes that the table cache should be
-        table_cache_size = self.size_bytes
-        # Read the table into buffer
-        table_cache = self.f.read(table_cache_size)
-        # Make stream
-        table_cache_f = io.BytesIO(table_cache)
-
-        # Read table byte by byte
-        for x in range(0, self.size_bytes):
-            # value = self.f.read(1)
-            value = table_cache_f.read(1)
-            conv = struct.unpack("<B", value)[0]
-            if conv == 0x00:
-                # Create inode entries assigned as 0 so we can
-                # look up their allocated status later.
-                for y in range(0, 8):
-                    inode_num = self.start_inode + ((x * 8) + y) + 1
-                    self.inodes[inode_num] = 0
-                continue
-
-            alloc = self.__map_bitmap(conv, (
-                (0x1, 0),
-                (0x2, 1),
-                (0x4, 2),
-                (0x8, 3),
-                (0x10, 4),
-                (0x20, 5),
-                (0x40, 6),
-                (0x80, 7)
-            ))
-            for y in range(0, 8):
-                inode_num = self.start_inode + ((x * 8) + y) + 1
-                if y in alloc:
-                    status = 1
-                else:
-                    status = 0
-                self.inodes[inode_num] = status
+        # Inode bitmap is initialized so read the entire contents of the bitmap
+        # at once from its location according to the GDT.
+        buf = self.f.read_at(self.location_bytes, self.size_bytes)
+        self.raw[:len(buf)] = buf
 
         self.__gdt = None
-    # pylint: enable=line-too-long,unused-variable
 
 class Ext3Inode:
     """Ext3Inode.
@@ -283,6 +298,7 @@ class Ext3Inode:
         'block_size',
         '__dblocks',
         '__eblocks',
+        '__runs',
         '__sparse',
         'offset',
         'util',
@@ -377,14 +393,15 @@ class Ext3Inode:
     #     return pprint.pformat(vars(self), indent=4)
 
     def __init__(self, f: io.BytesIO = None):
-        self.f = f
+        self.f = as_image(f)
 
         self.byte_start = None
         self.byte_end = None
         self.byte_count = None
         self.block_size = None
         self.__dblocks = None
-        self.__eblocks = list()
+        self.__eblocks = None
+        self.__runs = None
         self.__sparse = None
         self.offset = 0
         self.util = None
@@ -507,6 +524,28 @@ class Ext3Inode:
             raise ValueError("EXT4_INDEX_FL must be True/False!")
         self.__EXT4_INDEX_FL = value
 
+    # pylint: disable=line-too-long
+    @property
+    def runs(self) -> BlockRunList:
+        """Inode's block map as runs of contiguous blocks.
+
+        :getter: If :py:attr:`~runs` is ``None`` then :func:`Ext3Inode.runs_resolve` will be called to resolve the block map and store the result in :py:attr:`~runs`.
+        :setter: Sets :py:attr:`~runs` to given value.
+        :type: BlockRunList
+
+        """
+        if self.__runs is None:
+            self.__runs = self.runs_resolve()
+            self.__sparse = self.__runs.sparse
+        return self.__runs
+    # pylint: enable=line-too-long
+
+    @runs.setter
+    def runs(self, value: BlockRunList):
+        self.__runs = value
+        self.__dblocks = None
+        self.__eblocks = None
+
     # pylint: disable=line-too-long
     @property
     def dblocks(self) -> List:
@@ -515,16 +554,16 @@ class Ext3Inode:
         A list of all the fully resolved blocks lives here. These are *DIRECT* blocks and
         require no further "resolution" regardless of use indirects, double indirects, extents, etc.
 
+        This is a materialized view of :py:attr:`~runs` and is only built when asked for.
+        Prefer :py:attr:`~runs` for anything that walks the whole file.
+
         :getter: If :py:attr:`~dblocks` is ``None`` then :func:`Ext3Inode.dblocks_resolve` will be called to resolve all the blocks and store the result in :py:attr:`~dblocks`.
         :setter: Sets :py:attr:`~dblocks` to given value.
         :type: list
 
         """
         if self.__dblocks is None:
-            try:
-                self.__dblocks = self.dblocks_resolve()
-            except Exception as e: # pylint: disable=broad-except,unused-variable,try-except-raise
-                raise
+            self.__dblocks = self.dblocks_resolve()
         return self.__dblocks
     # pylint: enable=line-too-long
 
@@ -536,13 +575,19 @@ class Ext3Inode:
     def eblocks(self):
         """Extent blocks.
 
+        Like :py:attr:`~dblocks` but sparse blocks are kept in place as
+        negative numbers (-1, -2, ...).
         """
-        if self.__dblocks is None:
-            try:
-                self.__dblocks = self.dblocks_resolve()
-            except Exception as e:  # pylint: disable=broad-except,unused-variable,try-except-raise
-                # self.__log.exception("Exception dump. Inode: %s\nException: %s", self, str(e), exc_info=True)
-                raise
+        if self.__eblocks is None:
+            eblocks = list()
+            sparse_block_number = -1
+            for run in self.runs:
+                if run.sparse:
+                    eblocks.extend(range(sparse_block_number, sparse_block_number - run.length, -1))
+                    sparse_block_number -= run.length
+                else:
+                    eblocks.extend(range(run.physical, run.physical_end))
+            self.__eblocks = eblocks
         return self.__eblocks
 
     @eblocks.setter
@@ -553,23 +598,52 @@ class Ext3Inode:
     def sparse(self) -> bool:
         """Is this a sparse file/inode?
 
+        ``None`` until the block map has been resolved.
+
         Returns:
 
             bool: Whether or not file/inode is sparse.
         """
         return self.__sparse
 
+    @property
+    def size(self) -> int:
+        """Size of file in bytes.
+
+        ``i_size_high`` only holds the upper 32 bits of the size for regular
+        files. For directories on ext2/3 it is ``i_dir_acl``.
+
+        Returns:
+
+            int: Size of the file in bytes.
+        """
+        if self.S_IFREG and self.i_size_high:
+            return self.i_size_lo | (self.i_size_high << 32)
+        return self.i_size_lo or 0
+
     def dblocks_resolve(self) -> List:
         """Resolves extents or i_block into a list of blocks.
 
+        Materializes :py:attr:`~runs` into one block number per backed block.
+
+        Returns:
+
+            List: List of direct blocks for inode.
+        """
+
+        return self.runs.physical_blocks()
+
+    def runs_resolve(self) -> BlockRunList:
+        """Resolves extents or i_block into block runs.
+
         If inode has ``EXT4_EXTENTS_FL`` set to ``True`` then
         :func:`Ext3Inode.dblocks_resolve_extents` will be used.
-        Otherwise, an instance of :class:`Ext3Utility` using :func:`Ext3Utility.resolve_indirects`
-        will resolve the contents of i_block to direct blocks.
+        Otherwise, an instance of :class:`Ext3Utility` using :func:`Ext3Utility.resolve_runs`
+        will resolve the contents of i_block.
 
         Returns:
 
-            List: List of direct blocks for inode.
+            BlockRunList: Runs of the inode.
         """
 
         if self.EXT4_EXTENTS_FL is True:
@@ -577,148 +651,90 @@ class Ext3Inode:
             return self.dblocks_resolve_extents()
         elif self.EXT4_EXTENTS_FL is False:
             # Uses i_block
-            # TODO: Add sanity checks here to make that the values of i_block are not None.
             if not isinstance(self.i_block, dict):
                 raise ValueError("i_block is not a dictionary! Is: %s" % type(self.i_block))
             self.util = Ext3Utility(self.f, block_size=self.block_size, offset=0)
-            dblocks = self.i_block['direct']
-            if self.i_block['indirect'] != 0:
-                dblocks += self.util.resolve_indirects(self.i_block['indirect'], "single")
-            if self.i_block['double_indirect'] != 0:
-                dblocks += self.util.resolve_indirects(self.i_block['double_indirect'], "double")
-            if self.i_block['triple_indirect'] != 0:
-                dblocks += self.util.resolve_indirects(self.i_block['triple_indirect'], "triple")
-            return dblocks
+            number_of_blocks = -(-self.size // self.block_size)
+            return self.util.resolve_runs(self.i_block, number_of_blocks)
         else:
             # Not set
             raise ValueError("EXT4_EXTENTS_FL is neither True or False!")
 
-    def dblocks_resolve_extents(self) -> Any:
-        """Resolves extents into blocks.
+    def dblocks_resolve_extents(self) -> BlockRunList:
+        """Resolves extents into block runs.
 
-        Seeks 0x28 (40) bytes into ``self.f`` and calls :func:`Ext3Inode.extent_process`.
+        Calls :func:`Ext3Inode.extent_process` on the extent tree root stored
+        in i_block, 0x28 (40) bytes into the inode.
 
         Returns:
 
-            Any: Return value from :func:`Ext3Inode.extent_process`.
+            BlockRunList: Return value from :func:`Ext3Inode.extent_process`.
         """
-        self.f.seek(self.byte_start + 0x28)
         return self.extent_process()
 
-    def extent_process(self, block: int = None, block_size: int = None) -> List[int]:
+    def extent_process(self, block: int = None, block_size: int = None, runs: BlockRunList = None) -> BlockRunList: # pylint: disable=line-too-long
         """Handles all the extent stuff.
 
-        If ``block`` and ``block_size`` are provided then ``self.f`` will
-        be seeked to ``(block * block_size) + self.master_offset``.
+        If ``block`` and ``block_size`` are provided then the node is read from
+        ``block * block_size``, otherwise the root node in i_block is used.
+
+        Every leaf extent becomes a :class:`BlockRun`. Gaps between extents
+        and uninitialized extents become sparse runs.
 
         Args:
 
             block (int, optional): Block number to process. Defaults to None.
             block_size (int, optional): Size of blocks in bytes. Defaults to None.
+            runs (BlockRunList, optional): Runs to add to. Defaults to a new list.
 
         Raises:
             RuntimeError: If extent header depth exceeeds 5 levels.
 
         Returns:
 
-            None or List[int]: List of all direct block numbers belonging to
-                inode or None if error reading extent.
+            BlockRunList: Runs of the extent tree below this node.
         """
 
+        if runs is None:
+            runs = BlockRunList()
+
         if block is not None and block_size is not None:
-            seek_pos = block * block_size
-            self.f.seek(seek_pos)
-        extent_header = self.extent_header_read()
+            buf = self.f.view_at(block * block_size, block_size)
+        else:
+            # i_block is 60 bytes: a header and up to four entries
+            buf = self.f.view_at(self.byte_start + 0x28, 60)
+        extent_header = self.extent_header_read(buf)
 
         if extent_header is None:
-            return
-
-        # First entry in our extent list should be the header
-        entries = list()
-        entries.append(extent_header)
-        dblocks = list()
-        last_ee_block = 0
-        sparse_block_number = -1
-
-        # Process each entry in the extent_header.eh_entries
-        for _ in range(0, extent_header.eh_entries):
-            entry = None
-            blocks = list()
-            if extent_header.eh_depth == 0:
-                # This extent node points to data blocks, not other extent nodes
-                # Let's read Ext4Extent now
-                entry = self.extent_read()
-
-                # Extent entries give a starting block number and length of the extent.
-                # So our direct blocks start at entry.ee_start_lo and continue
-                # for entry.ee_len blocks.
-                # Loop over this range and append each block to the blocks list.
-                for x in range(0, entry.ee_len):
-                    block = entry.ee_start_lo + x
-                    ee_block = entry.ee_block + x
-
-                    # Only look for previous sparse blocks if we are
-                    # processing the first block in the extent record
-                    if x == 0:
-                        # Check to see if our current ee_block is
-                        # last_ee_block + 1... if so then the last
-                        # block is contigous with us.
-                        if ee_block != last_ee_block + 1:
-                            # If we are the first block (0) then don't do anything
-                            if ee_block == 0:
-                                pass
-                            else:
-                                # We are sparse
-                                self.__sparse = True
-
-                                # Calculate the number of blocks we are missing.
-                                # This should be last_ee_block + 1 since we actually
-                                # did process last_ee_block.
-                                sparse_blocks = ee_block - (last_ee_block + 1)
-                                # self.__log.debug("ee_block: %s last_ee_block: %s", ee_block, last_ee_block)
-
-                                # Iterate through the number of blocks we are missing
-                                # and append a negative number in its place to indicate
-                                # it is a sparse block
-                                for _ in range(0, sparse_blocks):
-                                    self.__eblocks.append(sparse_block_number)
-                                    sparse_block_number -= 1
-                                    last_ee_block += 1
-                                # self.__log.debug("number of sparse blocks: %s", sparse_blocks)
-                    last_ee_block = ee_block
-                    self.__eblocks.append(block)
-
-                    blocks.append(block)
-            elif extent_header.eh_depth > 0 and extent_header.eh_depth <= 5:
-                # This extent node points to extent leaf nodes which me must process and
-                # recursively resolve all of the leaf's leaf nodes.
-                # Let's read Ext4ExtentIdx now
-                # First save our current offset so we can seek back to it once the leaf
-                # nodes have finished.
-                save_pos = self.f.tell()
-                entry = self.extent_idx_read()
-                dblocks = self.extent_process(entry.ei_leaf_lo, self.block_size)
-                # Resume position is save_pos + 12 bytes (size of extent record)
-                resume_pos = save_pos + 12
-                self.f.seek(resume_pos)
-
-            else:
-                # eh_depth can not be greater than 5
-                raise RuntimeError(f"eh_depth greater than 5! Value: {str(extent_header.eh_depth)}")
-            dblocks.extend(blocks)
+            return runs
+
+        if extent_header.eh_depth == 0:
+            # This extent node points to data blocks, not other extent nodes
+            for n in range(0, extent_header.eh_entries):
+                entry = self.extent_read(buf, 12 + n * 12)
+                runs.add(entry.ee_block, entry.start, entry.ee_len, entry.uninitialized)
+        elif extent_header.eh_depth > 0 and extent_header.eh_depth <= 5:
+            # This extent node points to extent nodes which we must process and
+            # recursively resolve.
+            for n in range(0, extent_header.eh_entries):
+                entry = self.extent_idx_read(buf, 12 + n * 12)
+                self.extent_process(entry.leaf, self.block_size, runs)
+        else:
+            # eh_depth can not be greater than 5
+            raise RuntimeError(f"eh_depth greater than 5! Value: {str(extent_header.eh_depth)}")
 
-        return dblocks
+        return runs
 
-    def extent_header_read(self) -> 'Ext4ExtentHeader':
+    def extent_header_read(self, buf: bytes, offset: int = 0) -> 'Ext4ExtentHeader':
         """Reads an extent header.
 
         First checks for extent magic number (0xf30a). If magic number is found then
         returns :class:`Ext4ExtentHeader`.
 
-        .. warning::
-           ``file`` object ``self.f`` must be "pre-seeked"
-           to the appropriately location for reading. No attempt to seek to the
-           correct location is made with this function!
+        Args:
+
+            buf (bytes): Buffer holding an extent tree node.
+            offset (int, optional): Offset of the header in ``buf``. Defaults to 0.
 
         Raises:
             RuntimeError: If extent magic (0xf30a) is not found.
@@ -730,7 +746,7 @@ class Ext3Inode:
 
         # Looking for header
         try:
-            magic = hex(UNPACK_LE16.unpack(self.f.read(2))[0])
+            magic = hex(UNPACK_LE16.unpack_from(buf, offset)[0])
         except struct.error as e:  # pylint: disable=broad-except,unused-variable,try-except-raise
             raise
 
@@ -740,7 +756,7 @@ class Ext3Inode:
 
         extent_header = Ext4ExtentHeader()
 
-        extent_header.eh_entries, extent_header.eh_max, extent_header.eh_depth, extent_header.eh_generation = UNPACK_EXTENT_HEADER.unpack(self.f.read(10)) # pylint: disable=line-too-long
+        extent_header.eh_entries, extent_header.eh_max, extent_header.eh_depth, extent_header.eh_generation = UNPACK_EXTENT_HEADER.unpack_from(buf, offset + 2) # pylint: disable=line-too-long
         return extent_header
 
     # TODO: Is this needed anymore?
@@ -748,15 +764,15 @@ class Ext3Inode:
         """Resolves iblocks into blocks.
         """
 
-    def extent_idx_read(self) -> 'Ext4ExtentIdx':
+    def extent_idx_read(self, buf: bytes, offset: int) -> 'Ext4ExtentIdx':
         """Reads an ext4 idx extent
 
         Extent is already tested for validity before calling this function.
 
-        .. warning::
-           ``file`` object ``self.f`` must be "pre-seeked"
-           to the appropriately location for reading. No attempt to seek to the
-           correct location is made with this function!
+        Args:
+
+            buf (bytes): Buffer holding an extent tree node.
+            offset (int): Offset of the index entry in ``buf``.
 
         Returns:
 
@@ -769,19 +785,19 @@ class Ext3Inode:
         # extent.ei_leaf_hi = self.__le16()
         # Padding
         # self.__le16()
-        extent.ei_block, extent.ei_leaf_lo, extent.ei_leaf_hi, _ = UNPACK_EXTENT_IDX.unpack(self.f.read(12)) # pylint: disable=line-too-long
+        extent.ei_block, extent.ei_leaf_lo, extent.ei_leaf_hi, _ = UNPACK_EXTENT_IDX.unpack_from(buf, offset) # pylint: disable=line-too-long
 
         return extent
 
-    def extent_read(self) -> 'Ext4Extent':
+    def extent_read(self, buf: bytes, offset: int) -> 'Ext4Extent':
         """Reads an ext4 extent.
 
         Extent is already tested for validity before calling this function.
 
-        .. warning::
-           ``file`` object ``self.f`` must be "pre-seeked"
-           to the appropriately location for reading. No attempt to seek to the
-           correct location is made with this function!
+        Args:
+
+            buf (bytes): Buffer holding an extent tree node.
+            offset (int): Offset of the extent in ``buf``.
 
         Returns:
 
@@ -789,7 +805,7 @@ class Ext3Inode:
         """
 
         extent = Ext4Extent()
-        extent.ee_block, extent.ee_len, extent.ee_start_hi, extent.ee_start_lo = UNPACK_EXTENT.unpack(self.f.read(12)) # pylint: disable=line-too-long
+        extent.ee_block, extent.ee_len, extent.ee_start_hi, extent.ee_start_lo = UNPACK_EXTENT.unpack_from(buf, offset) # pylint: disable=line-too-long
 
         # Number of blocks covered by extent.
         # If the value of this field is <= 32768, the extent is initialized.
@@ -800,6 +816,7 @@ class Ext3Inode:
         if extent.ee_len > 32768:
             # uninitialized
             extent.ee_len = extent.ee_len - 32768
+            extent.uninitialized = True
 
         return extent
 
@@ -812,21 +829,75 @@ class Ext3Inode:
         """
         return {n: getattr(self, n, None) for n in self.__slots__}
 
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
+
+class Ext3InodeRecord:
+    """Ext3InodeRecord.
+
+    Compact decoded inode as read by :func:`Ext3InodeTable.run`. Holds the
+    raw fields of the first 128 bytes of ``struct ext4_inode`` only, an
+    :class:`Ext3Inode` is built from it on demand.
+    """
+
+    __slots__ = [
+        'inode_number',
+        'allocated',
+        'i_mode',
+        'i_uid',
+        'i_size_lo',
+        'i_atime',
+        'i_ctime',
+        'i_mtime',
+        'i_dtime',
+        'i_gid',
+        'i_links_count',
+        'i_blocks_lo',
+        'i_flags',
+        'union_osd1',
+        'i_block',
+        'i_generation',
+        'i_file_acl_lo',
+        'i_size_high',
+        'i_obso_faddr',
+        'union_osd2',
+    ]
+
+    def __init__(self, inode_number: int, allocated: int, fields: Tuple):
+        """Create a record.
+
+        Args:
+
+            inode_number (int): Inode number.
+            allocated (int): Allocation status from the inode bitmap.
+            fields (Tuple): Fields as unpacked by ``UNPACK_INODE``.
         """
-        return struct.unpack("<I", self.f.read(4))[0]
+        self.inode_number = inode_number
+        self.allocated = allocated
+        (self.i_mode, self.i_uid, self.i_size_lo, self.i_atime, self.i_ctime, self.i_mtime,
+         self.i_dtime, self.i_gid, self.i_links_count, self.i_blocks_lo, self.i_flags,
+         self.union_osd1, self.i_block, self.i_generation, self.i_file_acl_lo,
+         self.i_size_high, self.i_obso_faddr, self.union_osd2) = fields
+
+    @property
+    def file_type(self) -> Union[str, None]:
+        """File type from i_mode.
+
+        Returns:
 
-    def __le_ushort(self) -> int:
-        """Get little endian unsigned short.
+            str: File type or None if unknown.
         """
-        return struct.unpack("<H", self.f.read(2))[0]
+        return S_IFMT_FILE_TYPE.get(self.i_mode & S_IFMT)
 
-    def __le32(self) -> int:
-        return self.__le_uint()
+    @property
+    def size(self) -> int:
+        """File size in bytes including i_size_high for regular files.
 
-    def __le16(self) -> int:
-        return self.__le_ushort()
+        Returns:
+
+            int: File size in bytes.
+        """
+        if self.i_mode & S_IFMT == 0x8000:
+            return self.i_size_lo | (self.i_size_high << 32)
+        return self.i_size_lo
 
 
 class Ext3InodeTable:
@@ -847,11 +918,11 @@ class Ext3InodeTable:
         'INCOMPAT_EXTENTS',
         'end_inode',
         'table_number',
-        'inodes',
         'start_offset',
         'fs_parent_id',
         'inode_bitmap',
         'adjust_offset',
+        'records',
         '__zeroed',
         '__number_of_allocated_inodes',
         '__number_of_unallocated_inodes',
@@ -893,7 +964,7 @@ class Ext3InodeTable:
         if gdt is None:
             raise ValueError("Must provide gdt object!")
         self.block_size = sb.block_size
-        self.f = f
+        self.f = as_image(f)
 
         self.__sb = sb
         self.__gdt = gdt
@@ -904,15 +975,16 @@ class Ext3InodeTable:
         self.INCOMPAT_EXTENTS = sb.INCOMPAT_EXTENTS
         self.end_inode = self.start_inode + self.num_inodes
         self.table_number = gdt.group_number
-        self.inodes = dict()
         self.start_offset = None
         self.fs_parent_id = None
-        self.inode_bitmap = dict()
+        self.inode_bitmap = BitmapView(bytearray(), self.start_inode, 0)
         self.adjust_offset = adjust_offset
+        # Records decoded by run(), None until the table is read in bulk
+        self.records = None
         self.__zeroed = dict()
 
-        self.__number_of_allocated_inodes = sb.s_inodes_per_group - gdt.bg_free_inodes_count_lo
-        self.__number_of_unallocated_inodes = gdt.bg_free_inodes_count_lo
+        self.__number_of_allocated_inodes = sb.s_inodes_per_group - gdt.free_inodes_count
+        self.__number_of_unallocated_inodes = gdt.free_inodes_count
 
         self.__location_block = gdt.location_table_inode
         self.__location_bytes = (self.__location_block * sb.block_size)
@@ -983,9 +1055,7 @@ class Ext3InodeTable:
             int: Generator of all allocated inode numbers.
         """
 
-        for inode in self.inode_bitmap:
-            if self.inode_bitmap[inode] == 1:
-                yield inode
+        return self.inode_bitmap.set_keys()
 
     @property
     def unallocated_inodes(self) -> Iterator[int]:
@@ -998,9 +1068,7 @@ class Ext3InodeTable:
             int: Generator of all unallocated inode numbers.
         """
 
-        for inode in self.inode_bitmap:
-            if self.inode_bitmap[inode] == 0:
-                yield inode
+        return self.inode_bitmap.clear_keys()
 
     @property
     def number_of_allocated_inodes(self) -> int:
@@ -1062,40 +1130,24 @@ class Ext3InodeTable:
         """Returns an inode.
 
         Return an inode and inode is zeroed will return a zeroed
-        object for it.
+        object for it. Inodes are built on every call, caching them is
+        left to :class:`Ext3Filesystem`.
 
         Returns:
 
             Ext3Inode: Ext3Inode instance for inode number.
         """
 
-        if inode_number in self.inodes:
-            inode = self.inodes[inode_number]
-            inode.f = self.f
-            return inode
-        elif inode_number not in self.inodes:
-            # pr = cProfile.Profile()
-            # pr.enable()
+        if not self.is_zeroed(inode_number):
             inode = self.read_inode(inode_number)
-            # pr.disable()
-            # s = io.StringIO()
-            # ps = pstats.Stats(pr, stream=s).sort_stats('cumtime', 'name')
-            # ps.print_stats()
-            # print(s.getvalue())
-            # pr.dump_stats("qcow2_profile.prof")
-
-            self.inodes[inode_number] = inode
-            inode.f = self.f
-            return inode
-        elif self.is_zeroed(inode_number):
-            inode = self.get_zeroed_inode(inode_number)
-            inode.f = self.f
-            self.inodes[inode_number] = inode
-        else:
-            msg = "Could not find inode %s in table %s! " % (inode_number, self.table_number)
-            msg += "Valid table inode range: %s - %s\n" % (self.start_inode, self.end_inode)
-            msg += "Table dump:\n%s" % (self)
-            raise RuntimeError(msg)
+            if inode is not None:
+                inode.f = self.f
+                return inode
+
+        # Zeroed, possibly found out by read_inode()
+        inode = self.get_zeroed_inode(inode_number)
+        inode.f = self.f
+        return inode
 
     def __map_bitmap(self, value: int, mapping: Tuple[int, str]):
         """
@@ -1103,29 +1155,85 @@ class Ext3InodeTable:
         """
         return ' '.join([t[1] for t in mapping if value & t[0]]) or 'none'
 
-    def __map_bitmap_exclusive(self, value: int, mapping: Tuple[int, str]):
+    @property
+    def number_of_used_inodes(self) -> int:
+        """Number of inodes at the start of the table that may be in use.
+
+        With uninit_bg/metadata_csum the GDT records how many inodes at the
+        end of the table have never been used (bg_itable_unused) and an
+        EXT4_BG_INODE_UNINIT group has no initialized inodes at all.
+
+        Returns:
+
+            int: Number of inodes to read from the table.
         """
-            Make human readable
+        if self.__gdt.EXT4_BG_INODE_UNINIT:
+            return 0
+        if self.__sb.RO_COMPAT_GDT_CSUM or self.__sb.RO_COMPAT_METADATA_CSUM:
+            return max(self.num_inodes - self.__gdt.itable_unused, 0)
+        return self.num_inodes
+
+    def decode_record(self, inode_number: int, fields: Tuple) -> Union[Ext3InodeRecord, None]:
+        """Create a record from unpacked inode fields.
+
+        Args:
+
+            inode_number (int): Inode number.
+            fields (Tuple): Fields as unpacked by ``UNPACK_INODE``.
+
+        Returns:
+
+            Ext3InodeRecord or None: Record or None if the inode is zeroed.
         """
-        for t in mapping:
-            if value & t[0]:
-                return t[1]
+        allocated = self.inode_bitmap[inode_number]
+        # Unallocated with an empty header (i_mode .. i_blocks_lo) and no
+        # index/extent flags
+        if not allocated and not any(fields[:10]) and not fields[10] & 0x81000:
+            return None
+        return Ext3InodeRecord(inode_number, allocated, fields)
+
+    def read_used(self) -> Union[bytes, memoryview]:
+        """Read the used part of the table (see :py:attr:`number_of_used_inodes`).
+
+        Returns:
 
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
+            bytes: Raw inodes, a whole number of ``inode_size`` records. Shorter
+            than expected if the image is truncated.
         """
-        return struct.unpack("<I", self.f.read(4))[0]
+        used = self.number_of_used_inodes
+        if used == 0:
+            return b""
+        buf = self.f.view_at(self.location_bytes, used * self.inode_size)
+        # A truncated image may end in the middle of a record
+        return buf[:len(buf) - len(buf) % self.inode_size]
+
+    def iter_records(self) -> Iterator[Ext3InodeRecord]:
+        """Decode the whole table.
+
+        Generator. The used part of the table (see :py:attr:`number_of_used_inodes`)
+        is read with a single read and decoded with ``iter_unpack``. Zeroed
+        inodes are added to :py:attr:`zeroed` instead of being yielded.
+
+        Returns:
 
-    def __le_ushort(self) -> int:
-        """Get little endian unsigned short.
+            Ext3InodeRecord: Record of a non-zeroed inode.
         """
-        return struct.unpack("<H", self.f.read(2))[0]
 
-    def __le32(self) -> int:
-        return self.__le_uint()
+        used = self.number_of_used_inodes
+        # Never used inodes at the end of the table are zeroed
+        self.__zeroed.update(dict.fromkeys(range(self.start_inode + used, self.end_inode), True))
+        if used == 0:
+            return
 
-    def __le16(self) -> int:
-        return self.__le_ushort()
+        padding = self.inode_size - UNPACK_INODE.size
+        record_struct = struct.Struct(UNPACK_INODE.format + f"{padding}x")
+        buf = self.read_used()
+        for inode_number, fields in enumerate(record_struct.iter_unpack(buf), self.start_inode):
+            record = self.decode_record(inode_number, fields)
+            if record is None:
+                self.__zeroed[inode_number] = True
+            else:
+                yield record
 
     # pylint: disable=line-too-long
     def read_inode(self, inode_number: int) -> Ext3Inode:
@@ -1140,74 +1248,41 @@ class Ext3InodeTable:
             Ext3Inode. Ext3Inode instance for inode number.
         """
         inode_offset = self.location_bytes + ((inode_number - self.start_inode) * self.__sb.s_inode_size)
-        self.f.seek(inode_offset)
-        start_offset = self.f.tell()
-
-        handle = io.BytesIO(self.f.read(self.__sb.s_inode_size))
-        handle.seek(0)
-
-        # buf = handle.read(self.__sb.s_inode_size)
-        allocated = self.inode_bitmap[inode_number]
+        start_offset = inode_offset
 
+        if self.records is not None:
+            # Table was read in bulk by run()
+            record = self.records.get(inode_number)
+        else:
+            # Fields are unpacked straight from the image buffer
+            fields = UNPACK_INODE.unpack_from(self.f.view_at(inode_offset, UNPACK_INODE.size))
+            record = self.decode_record(inode_number, fields)
 
-        i_mode, i_uid, i_size_lo, i_atime, i_ctime, i_mtime, i_dtime, i_gid, i_links_count, i_blocks_lo, i_flags = UNPACK_INODE_HEADER.unpack(handle.read(36))
-        hashed_indexes = i_flags & 0x1000
-        inode_uses_extents = i_flags & 0x80000
-
-        zeroed = True
-        if allocated:
-            zeroed = False
-        elif i_mode != 0:
-            zeroed = False
-        elif i_uid != 0:
-            zeroed = False
-        elif i_size_lo != 0:
-            zeroed = False
-        elif i_atime != 0:
-            zeroed = False
-        elif i_ctime != 0:
-            zeroed = False
-        elif i_mtime != 0:
-            zeroed = False
-        elif i_dtime != 0:
-            zeroed = False
-        elif i_gid != 0:
-            zeroed = False
-        elif i_links_count != 0:
-            zeroed = False
-        elif i_blocks_lo != 0:
-            zeroed = False
-        elif hashed_indexes:
-            zeroed = False
-        elif inode_uses_extents:
-            zeroed = False
-
-        if zeroed:
-            end_offset = handle.tell()
-            num_bytes_read = end_offset - start_offset
-            amount_left_to_seek = self.inode_size - num_bytes_read
+        if record is None:
             # if inode_number == 2:
             #     self.__log.critical("inode 2 is zeroed! Typically inode 2 is the root",
             #                "directory and should not be zeroed!")
 
-            handle.seek(amount_left_to_seek, 1)
             self.__zeroed[inode_number] = True
             return
 
+        hashed_indexes = record.i_flags & 0x1000
+        inode_uses_extents = record.i_flags & 0x80000
+
         i = Ext3Inode(f=self.f)
         i.block_size = self.block_size
         i.inode_number = inode_number
-        i.allocated = self.inode_bitmap[inode_number]
+        i.allocated = record.allocated
         i.inode_table = self.table_number
-        i.i_mode = i_mode
-        i.i_uid = i_uid
-        i.i_size_lo = i_size_lo
-        i.i_atime = i_atime
-        i.i_ctime = i_ctime
-        i.i_mtime = i_mtime
-        i.i_dtime = i_dtime
-        i.i_gid = i_gid
-        i.i_links_count = i_links_count
+        i.i_mode = record.i_mode
+        i.i_uid = record.i_uid
+        i.i_size_lo = record.i_size_lo
+        i.i_atime = record.i_atime
+        i.i_ctime = record.i_ctime
+        i.i_mtime = record.i_mtime
+        i.i_dtime = record.i_dtime
+        i.i_gid = record.i_gid
+        i.i_links_count = record.i_links_count
         # Lower 32-bits of "block" count.
         # If the huge_file feature flag is not set on the filesystem,
         # the file consumes i_blocks_lo 512-byte blocks on disk.
@@ -1215,8 +1290,8 @@ class Ext3InodeTable:
         # then the file consumes i_blocks_lo + (i_blocks_hi << 32) 512-byte blocks on disk.
         # If huge_file is set and EXT4_HUGE_FILE_FL IS set in inode.i_flags,
         # then this file consumes (i_blocks_lo + i_blocks_hi << 32) filesystem blocks on disk.
-        i.i_blocks_lo = i_blocks_lo
-        i.i_flags = i_flags
+        i.i_blocks_lo = record.i_blocks_lo
+        i.i_flags = record.i_flags
 
         if hashed_indexes != 0:
             i.EXT4_INDEX_FL = True
@@ -1224,7 +1299,7 @@ class Ext3InodeTable:
             i.EXT4_INDEX_FL = False
 
         # TODO: Process this union.
-        i.union_osd1 = UNPACK_LE32.unpack(handle.read(4))[0]
+        i.union_osd1 = record.union_osd1
 
         # Block map or extent tree
         i.i_block = {}
@@ -1233,30 +1308,28 @@ class Ext3InodeTable:
             # Don't read the extents right now
             i.EXT4_EXTENTS_FL = True
             # self.__log.debug("inode uses extents!")
-            # self.f.seek(start_offset + 0x64)
-            # When using a cache/buffer
-            handle.seek(0x64)
         else:
             # Use block pointers
             i.EXT4_EXTENTS_FL = False
-            i.i_block['direct'] = [n for n in UNPACK_INODE_DBLOCKS.unpack(handle.read(48)) if n != 0]
-            i.i_block['indirect'] = UNPACK_LE32.unpack(handle.read(4))[0]
-            i.i_block['double_indirect'] = UNPACK_LE32.unpack(handle.read(4))[0]
-            i.i_block['triple_indirect'] = UNPACK_LE32.unpack(handle.read(4))[0]
+            # Zero (hole) pointers are kept so each pointer keeps its logical position
+            i.i_block['direct'] = list(UNPACK_INODE_DBLOCKS.unpack_from(record.i_block, 0))
+            i.i_block['indirect'] = UNPACK_LE32.unpack_from(record.i_block, 0x30)[0]
+            i.i_block['double_indirect'] = UNPACK_LE32.unpack_from(record.i_block, 0x34)[0]
+            i.i_block['triple_indirect'] = UNPACK_LE32.unpack_from(record.i_block, 0x38)[0]
             # direct_blocks = struct.unpack("<IIIIIIIIIIII", handle.read(48))
             # indirect, double_indirect, triple_indirect = struct.unpack("<III", handle.read(12))
-        i.i_generation = UNPACK_LE32.unpack(handle.read(4))[0]
-        i.i_file_acl_lo = UNPACK_LE32.unpack(handle.read(4))[0]
+        i.i_generation = record.i_generation
+        i.i_file_acl_lo = record.i_file_acl_lo
         # ext4 - file/directory size
-        i.i_size_high = UNPACK_LE32.unpack(handle.read(4))[0]
+        i.i_size_high = record.i_size_high
         # ext2/3 - usually set to zero and never used
         i.i_dir_acl = i.i_size_high
         # (Obsolete) fragment address
-        i.i_obso_faddr = UNPACK_LE32.unpack(handle.read(4))[0]
+        i.i_obso_faddr = record.i_obso_faddr
         # Union osd2 - 12 bytes
         # TODO: Process this union.
         # i.union_osd2 = handle.read(12)
-        i.union_osd2 = handle.read(12)
+        i.union_osd2 = record.union_osd2
         # i.i_frag = self.__le_uchar()
         # i.i_fsize = self.__le_uchar()
         # handle.read(2)
@@ -1326,15 +1399,8 @@ class Ext3InodeTable:
         # if 0x800 in r:
         #     i.S_ISUID = True
 
-        i.file_type = self.__map_bitmap_exclusive(i.i_mode, (
-            (0x1000, "fifo"),
-            (0x2000, "character_device"),
-            (0x4000, "directory"),
-            (0x6000, "block_device"),
-            (0x8000, "file"),
-            (0xA000, "symlink"),
-            (0xC000, "socket")
-            ))
+        # File type is the S_IFMT nibble as a whole, not individual bits
+        i.file_type = record.file_type
 
         value_to_attr_name_mapping = {
             'fifo': 'S_IFIFO',
@@ -1352,18 +1418,17 @@ class Ext3InodeTable:
 
         i.byte_start = start_offset
 
-        self.inodes[inode_number] = i
         return i
     # pylint: enable=line-too-long
 
-    # TODO: Is this needed anymore?
     def run(self) -> None:
-        """Read inode table and create inodes.
+        """Read inode table in bulk.
 
-        Reads entire inode table and creates a :class:`Ext3Inode` object for each
-        inode belonging to the table. Inode objects are stored in ``self.inodes``
-        which is a ``list``.
+        Reads the used part of the table in one read and decodes every inode
+        into an :class:`Ext3InodeRecord` stored in ``self.records`` which is a
+        ``dict`` keyed by inode number. :class:`Ext3Inode` objects are then
+        built from the records by :func:`get_inode` without further reads.
 
         """
 
-        return
+        self.records = {record.inode_number: record for record in self.iter_records()}
@@ -0,0 +1,182 @@
+"""Columnar inode table.
+
+Decodes inode tables straight into a NumPy structured array, one row per
+inode, so whole-filesystem questions become array masks instead of Python
+loops over :class:`Ext3Inode` objects::
+
+    >>> inodes = ext3fs.inode_array()
+    >>> mask = (inodes['allocated'] & (inodes['file_type'] == S_IFREG) &
+    ...         ((inodes['i_mode'] & 0o4000) != 0) & (inodes['size'] > 1 << 20) &
+    ...         (inodes['i_mtime'] > since))
+    >>> inodes['inode_number'][mask]
+
+NumPy is optional, install ``ExtFs[numpy]`` to use this module.
+"""
+
+from typing import List, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# File types as stored in i_mode >> 12, the ``file_type`` column
+S_IFIFO = 0x1
+S_IFCHR = 0x2
+S_IFDIR = 0x4
+S_IFBLK = 0x6
+S_IFREG = 0x8
+S_IFLNK = 0xA
+S_IFSOCK = 0xC
+
+# struct ext4_inode: (name, format, offset). Everything from i_extra_isize on
+# is only present when the inode size is larger than 128 bytes.
+INODE_FIELDS: List[Tuple[str, Union[str, Tuple[str, int]], int]] = [
+    ('i_mode', '<u2', 0x00),
+    ('i_uid', '<u2', 0x02),
+    ('i_size_lo', '<u4', 0x04),
+    ('i_atime', '<u4', 0x08),
+    ('i_ctime', '<u4', 0x0C),
+    ('i_mtime', '<u4', 0x10),
+    ('i_dtime', '<u4', 0x14),
+    ('i_gid', '<u2', 0x18),
+    ('i_links_count', '<u2', 0x1A),
+    ('i_blocks_lo', '<u4', 0x1C),
+    ('i_flags', '<u4', 0x20),
+    ('l_i_version', '<u4', 0x24),
+    ('i_block', ('<u4', 15), 0x28),
+    ('i_generation', '<u4', 0x64),
+    ('i_file_acl_lo', '<u4', 0x68),
+    ('i_size_high', '<u4', 0x6C),
+    ('i_obso_faddr', '<u4', 0x70),
+    ('l_i_blocks_high', '<u2', 0x74),
+    ('l_i_file_acl_high', '<u2', 0x76),
+    ('l_i_uid_high', '<u2', 0x78),
+    ('l_i_gid_high', '<u2', 0x7A),
+    ('l_i_checksum_lo', '<u2', 0x7C),
+    ('l_i_reserved', '<u2', 0x7E),
+    ('i_extra_isize', '<u2', 0x80),
+    ('i_checksum_hi', '<u2', 0x82),
+    ('i_ctime_extra', '<u4', 0x84),
+    ('i_mtime_extra', '<u4', 0x88),
+    ('i_atime_extra', '<u4', 0x8C),
+    ('i_crtime', '<u4', 0x90),
+    ('i_crtime_extra', '<u4', 0x94),
+    ('i_version_hi', '<u4', 0x98),
+    ('i_projid', '<u4', 0x9C),
+]
+
+# Columns computed from the raw fields and the inode bitmap
+DERIVED_FIELDS = [
+    ('inode_number', '<u4'),
+    ('allocated', '?'),
+    ('file_type', 'u1'),
+    ('size', '<u8'),
+    ('uid', '<u4'),
+    ('gid', '<u4'),
+]
+
+
+def require_numpy() -> None:
+    """Raise if NumPy is not installed."""
+    if np is None:
+        raise RuntimeError("numpy is required for inode arrays, install ExtFs[numpy]!")
+
+
+def _field_size(fmt: Union[str, Tuple[str, int]]) -> int:
+    if isinstance(fmt, tuple):
+        return int(fmt[0][-1]) * fmt[1]
+    return int(fmt[-1])
+
+
+def inode_fields(inode_size: int) -> List[Tuple[str, Union[str, Tuple[str, int]], int]]:
+    """Fields of :data:`INODE_FIELDS` that fit in an inode.
+
+    Args:
+
+        inode_size (int): On-disk inode size (``s_inode_size``).
+
+    Returns:
+
+        List: ``(name, format, offset)`` of every field that fits.
+    """
+    return [field for field in INODE_FIELDS if field[2] + _field_size(field[1]) <= inode_size]
+
+
+def disk_dtype(inode_size: int) -> 'np.dtype':
+    """Little-endian dtype of an on-disk inode.
+
+    Args:
+
+        inode_size (int): On-disk inode size (``s_inode_size``).
+
+    Returns:
+
+        numpy.dtype: Structured dtype with ``itemsize`` equal to ``inode_size``.
+    """
+    require_numpy()
+    fields = inode_fields(inode_size)
+    return np.dtype({
+        'names': [field[0] for field in fields],
+        'formats': [field[1] for field in fields],
+        'offsets': [field[2] for field in fields],
+        'itemsize': inode_size,
+    })
+
+
+def array_dtype(inode_size: int) -> 'np.dtype':
+    """Dtype of the rows returned by :func:`decode_inode_table`.
+
+    Args:
+
+        inode_size (int): On-disk inode size (``s_inode_size``).
+
+    Returns:
+
+        numpy.dtype: Packed structured dtype, derived columns first.
+    """
+    require_numpy()
+    return np.dtype(DERIVED_FIELDS + [field[:2] for field in inode_fields(inode_size)])
+
+
+def decode_inode_table(buf: Union[bytes, memoryview], inode_size: int, start_inode: int,
+                       num_inodes: int, bitmap: Union[bytes, bytearray]) -> 'np.ndarray':
+    """Decode one inode table.
+
+    Args:
+
+        buf (bytes): Raw inodes at the start of the table. Inodes past the end
+            of ``buf`` (never used or truncated) are left zeroed.
+        inode_size (int): On-disk inode size (``s_inode_size``).
+        start_inode (int): Number of the first inode of the table.
+        num_inodes (int): Number of inodes in the table.
+        bitmap (bytes): Packed inode bitmap of the group.
+
+    Returns:
+
+        numpy.ndarray: ``num_inodes`` rows of :func:`array_dtype`.
+    """
+    require_numpy()
+    rows = np.zeros(num_inodes, dtype=array_dtype(inode_size))
+    rows['inode_number'] = np.arange(start_inode, start_inode + num_inodes, dtype='<u4')
+    bits = np.unpackbits(np.frombuffer(bitmap, dtype='u1'), bitorder='little')
+    rows['allocated'][:min(len(bits), num_inodes)] = bits[:num_inodes]
+
+    used = min(len(buf) // inode_size, num_inodes)
+    if used:
+        disk = np.frombuffer(buf, dtype=disk_dtype(inode_size), count=used)
+        for name in disk.dtype.names:
+            rows[name][:used] = disk[name]
+
+    mode = rows['i_mode']
+    rows['file_type'] = mode >> 12
+    size = rows['i_size_lo'].astype('<u8')
+    regular = rows['file_type'] == S_IFREG
+    size[regular] |= rows['i_size_high'][regular].astype('<u8') << np.uint64(32)
+    rows['size'] = size
+    rows['uid'] = rows['i_uid']
+    rows['gid'] = rows['i_gid']
+    if 'l_i_uid_high' in rows.dtype.names:
+        rows['uid'] |= rows['l_i_uid_high'].astype('<u4') << np.uint32(16)
+        rows['gid'] |= rows['l_i_gid_high'].astype('<u4') << np.uint32(16)
+    return rows
@@ -0,0 +1,123 @@
+"""Parallel filesystem scan.
+
+Block groups are split into shards which are scanned in worker processes.
+Each worker opens the image itself, reads the inode tables of its groups in
+bulk (see :func:`ExtFs.sweep.iter_inode_tables`) and parses every
+directory whose inode lives in those groups. Results are plain values (inode
+attributes and raw directory entries) so they are cheap to send back and are
+turned into paths by :class:`ExtFs.fs.Filesystem`.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from ExtFs.ext3 import Ext3Filesystem
+from ExtFs.sweep import iter_inode_tables
+
+# Directory entry as returned by a worker, same attribute names as Ext3DirectoryEntryVersion2
+ScannedEntry = namedtuple('ScannedEntry', ['name', 'inode', 'file_type', 'file_type_str'])
+
+# Shards per worker, more shards balance groups with many inodes better
+SHARDS_PER_WORKER = 4
+
+
+def shard_groups(block_group_count: int, shards: int) -> List[range]:
+    """Split block groups into contiguous shards.
+
+    Args:
+
+        block_group_count (int): Number of block groups.
+        shards (int): Number of shards wanted.
+
+    Returns:
+
+        List[range]: Non-empty ranges of block group numbers.
+    """
+    shards = max(1, min(shards, block_group_count))
+    size, extra = divmod(block_group_count, shards)
+    ranges = []
+    start = 0
+    for n in range(shards):
+        end = start + size + (n < extra)
+        ranges.append(range(start, end))
+        start = end
+    return ranges
+
+
+def scan_groups(filename: str, master_offset: int, use_mmap: bool, groups: Sequence[int],
+                attributes: Sequence[str]) -> Tuple[Dict[int, Dict], Dict[int, List[ScannedEntry]]]:
+    """Scan block groups of an image. Runs in a worker process.
+
+    Args:
+
+        filename (str): Filename of the image.
+        master_offset (int): Offset in bytes from start of file to begin.
+        use_mmap (bool): Memory map the image.
+        groups (Sequence[int]): Block group numbers to scan.
+        attributes (Sequence[str]): Inode attributes to return.
+
+    Returns:
+
+        Tuple[Dict[int, Dict], Dict[int, List[ScannedEntry]]]: ``attributes``
+        and ``file_type`` of every allocated inode and the entries of every
+        directory, both keyed by inode number.
+    """
+    fs = Ext3Filesystem(master_offset=master_offset, use_mmap=use_mmap)
+    fs.filename = filename
+    inodes = {}
+    dirs = {}
+    try:
+        fs.setup()
+        fs.read_group_descriptor_table()
+        for inode_tbl in iter_inode_tables(fs, groups):
+            for inode_number in inode_tbl.allocated_inodes:
+                inode = inode_tbl.get_inode(inode_number)
+                props = {attribute: getattr(inode, attribute) for attribute in attributes}
+                props['file_type'] = inode.file_type
+                inodes[inode_number] = props
+                if inode.file_type != 'directory':
+                    continue
+                directory = fs.new_directory(inode_number)
+                directory.run()
+                dirs[inode_number] = [ScannedEntry(e.name, e.inode, e.file_type, e.file_type_str)
+                                      for e in directory.entries]
+    finally:
+        fs.close()
+        if fs.f is not None:
+            fs.f.close()
+    return inodes, dirs
+
+
+def scan(filename: str, master_offset: int, use_mmap: bool, block_group_count: int,
+         attributes: Sequence[str], workers: int = None) -> Tuple[Dict[int, Dict], Dict[int, List[ScannedEntry]]]: # pylint: disable=line-too-long
+    """Scan every block group of an image with a process pool.
+
+    Args:
+
+        filename (str): Filename of the image.
+        master_offset (int): Offset in bytes from start of file to begin.
+        use_mmap (bool): Memory map the image in the workers.
+        block_group_count (int): Number of block groups.
+        attributes (Sequence[str]): Inode attributes to return.
+        workers (int, optional): Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+
+        Tuple[Dict[int, Dict], Dict[int, List[ScannedEntry]]]: Merged results
+        of :func:`scan_groups`.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shard_groups(block_group_count, workers * SHARDS_PER_WORKER)
+    inodes = {}
+    dirs = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(scan_groups, filename, master_offset, use_mmap, shard,
+                                   attributes)
+                   for shard in shards]
+        for future in futures:
+            shard_inodes, shard_dirs = future.result()
+            inodes.update(shard_inodes)
+            dirs.update(shard_dirs)
+    return inodes, dirs
@@ -0,0 +1,163 @@
+"""Block runs.
+
+A file's block map expressed as runs of contiguous blocks instead of one
+entry per block. Runs are produced straight from extent records and from
+decoded indirect blocks.
+"""
+
+from typing import Iterator, List
+
+
+class BlockRun:
+    """BlockRun.
+
+    A run of ``length`` logically contiguous blocks of a file starting at
+    logical block ``logical`` and stored on disk starting at physical block
+    ``physical``. Sparse runs (holes, uninitialized extents) have no backing
+    blocks and read back as zeros.
+    """
+
+    __slots__ = [
+        'logical',
+        'physical',
+        'length',
+        'sparse',
+    ]
+
+    def __init__(self, logical: int, physical: int, length: int, sparse: bool = False):
+        self.logical = logical
+        self.physical = physical
+        self.length = length
+        self.sparse = sparse
+
+    def __repr__(self):
+        return (f"BlockRun(logical={self.logical}, physical={self.physical}, "
+                f"length={self.length}, sparse={self.sparse})")
+
+    def __eq__(self, other):
+        if not isinstance(other, BlockRun):
+            return NotImplemented
+        return (self.logical, self.physical, self.length, self.sparse) == \
+            (other.logical, other.physical, other.length, other.sparse)
+
+    @property
+    def logical_end(self) -> int:
+        """Logical block number just past the end of the run.
+
+        Returns:
+
+            int: Logical end block (exclusive).
+        """
+        return self.logical + self.length
+
+    @property
+    def physical_end(self) -> int:
+        """Physical block number just past the end of the run.
+
+        Returns:
+
+            int: Physical end block (exclusive).
+        """
+        return self.physical + self.length
+
+
+class BlockRunList(list):
+    """BlockRunList.
+
+    List of :class:`BlockRun` in logical order. Runs that continue the
+    previous run on disk are merged and logical gaps are filled with sparse
+    runs as they are added.
+    """
+
+    __slots__ = []
+
+    @property
+    def logical_end(self) -> int:
+        """Logical block number just past the last run.
+
+        Returns:
+
+            int: Logical end block (exclusive).
+        """
+        if not self:
+            return 0
+        return self[-1].logical_end
+
+    @property
+    def number_of_blocks(self) -> int:
+        """Number of blocks backed by disk blocks.
+
+        Returns:
+
+            int: Number of non-sparse blocks.
+        """
+        return sum(run.length for run in self if not run.sparse)
+
+    @property
+    def sparse(self) -> bool:
+        """Whether or not any run is sparse.
+
+        Returns:
+
+            bool: True if the block map has holes.
+        """
+        return any(run.sparse for run in self)
+
+    def add(self, logical: int, physical: int, length: int, sparse: bool = False) -> None:
+        """Add a run to the end of the list.
+
+        Args:
+
+            logical (int): First logical block of the run.
+            physical (int): First physical block of the run. Ignored if sparse.
+            length (int): Number of blocks in the run.
+            sparse (bool, optional): Run has no backing blocks. Defaults to False.
+
+        Raises:
+            ValueError: If the run overlaps the previous run.
+        """
+
+        if length <= 0:
+            return
+        end = self.logical_end
+        if logical < end:
+            raise ValueError(f"Run at logical block {logical} overlaps previous run ending "
+                             f"at {end}!")
+        if logical > end:
+            # Hole between the previous run and this one
+            self.add(end, 0, logical - end, True)
+        if sparse:
+            physical = 0
+
+        if self:
+            last = self[-1]
+            if last.sparse == sparse and (sparse or last.physical_end == physical):
+                last.length += length
+                return
+        self.append(BlockRun(logical, physical, length, sparse))
+
+    def physical_blocks(self) -> List[int]:
+        """Materialize every backed block number in logical order.
+
+        Returns:
+
+            List[int]: List of physical block numbers.
+        """
+        blocks = []
+        for run in self:
+            if not run.sparse:
+                blocks.extend(range(run.physical, run.physical_end))
+        return blocks
+
+    def physical_runs(self) -> Iterator[BlockRun]:
+        """Runs that are backed by disk blocks.
+
+        Generator.
+
+        Returns:
+
+            BlockRun: A non-sparse run.
+        """
+        for run in self:
+            if not run.sparse:
+                yield run
@@ -7,8 +7,139 @@ import io
 import pprint
 import struct
 
+from ExtFs.image import as_image
 from ExtFs.util import format_like_uuid, map_bitmap
 
+# struct ext4_super_block in on-disk order: (name, format). Fields with a
+# count in their format (except bytes) are read into lists.
+SUPERBLOCK_FIELDS = [
+    ('s_inodes_count', 'I'),
+    ('s_blocks_count_lo', 'I'),
+    ('s_r_blocks_count_lo', 'I'),
+    ('s_free_blocks_count_lo', 'I'),
+    ('s_free_inodes_count', 'I'),
+    ('s_first_data_block', 'I'),
+    ('s_log_block_size', 'I'),
+    ('s_log_cluster_size', 'I'),
+    ('s_blocks_per_group', 'I'),
+    ('s_clusters_per_group', 'I'),
+    ('s_inodes_per_group', 'I'),
+    ('s_mtime', 'I'),
+    ('s_wtime', 'I'),
+    ('s_mnt_count', 'H'),
+    ('s_max_mnt_count', 'H'),
+    ('s_magic', 'H'),
+    ('s_state', 'H'),
+    ('s_errors', 'H'),
+    ('s_minor_rev_level', 'H'),
+    ('s_lastcheck', 'I'),
+    ('s_checkinterval', 'I'),
+    ('s_creator_os', 'I'),
+    ('s_rev_level', 'I'),
+    ('s_def_resuid', 'H'),
+    ('s_def_resgid', 'H'),
+    # EXT4_DYNAMIC_REV superblocks only
+    ('s_first_ino', 'I'),
+    ('s_inode_size', 'H'),
+    ('s_block_group_nr', 'H'),
+    ('s_feature_compat', 'I'),
+    ('s_feature_incompat', 'I'),
+    ('s_feature_ro_compat', 'I'),
+    ('s_uuid', '16s'),
+    ('s_volume_name', '16s'),
+    ('s_last_mounted', '64s'),
+    ('s_algorithm_usage_bitmap', 'I'),
+    ('s_prealloc_blocks', 'B'),
+    ('s_prealloc_dir_blocks', 'B'),
+    ('s_reserved_gdt_blocks', 'H'),
+    # Journaling support valid if EXT4_FEATURE_COMPAT_HAS_JOURNAL set
+    ('s_journal_uuid', '16s'),
+    ('s_journal_inum', 'I'),
+    ('s_journal_dev', 'I'),
+    ('s_last_orphan', 'I'),
+    ('hash_seed', '4I'),
+    ('s_def_hash_version', 'B'),
+    ('s_jnl_backup_type', 'B'),
+    ('s_desc_size', 'H'),
+    ('s_default_mount_opts', 'I'),
+    ('s_first_meta_bg', 'I'),
+    ('s_mkfs_time', 'I'),
+    ('s_jnl_blocks', '17I'),
+    # 64bit support valid if EXT4_FEATURE_COMPAT_64BIT
+    ('s_blocks_count_hi', 'I'),
+    ('s_r_blocks_count_hi', 'I'),
+    ('s_free_blocks_count_hi', 'I'),
+    ('s_min_extra_isize', 'H'),
+    ('s_want_extra_isize', 'H'),
+    ('s_flags', 'I'),
+    ('s_raid_stride', 'H'),
+    ('s_mmp_interval', 'H'),
+    ('s_mmp_block', 'Q'),
+    ('s_raid_stripe_width', 'I'),
+    ('s_log_groups_per_flex', 'B'),
+    ('s_checksum_type', 'B'),
+    ('s_reserved_pad', 'H'),
+    ('s_kbytes_written', 'Q'),
+    ('s_snapshot_inum', 'I'),
+    ('s_snapshot_id', 'I'),
+    ('s_snapshot_r_blocks_count', 'Q'),
+    ('s_snapshot_list', 'I'),
+    ('s_error_count', 'I'),
+    ('s_first_error_time', 'I'),
+    ('s_first_error_ino', 'I'),
+    ('s_first_error_block', 'Q'),
+    ('s_first_error_func', '32s'),
+    ('s_first_error_line', 'I'),
+    ('s_last_error_time', 'I'),
+    ('s_last_error_ino', 'I'),
+    ('s_last_error_line', 'I'),
+    ('s_last_error_block', 'Q'),
+    ('s_last_error_func', '32s'),
+    ('s_mount_opts', '64s'),
+    ('s_usr_quota_inum', 'I'),
+    ('s_grp_quota_inum', 'I'),
+    ('s_overhead_blocks', 'I'),
+    ('s_backup_bgs', '2I'),
+    ('s_encrypt_algos', '4B'),
+    ('s_encrypt_pw_salt', '16s'),
+    ('s_lpf_ino', 'I'),
+    ('s_prj_quota_inum', 'I'),
+    ('s_checksum_seed', 'I'),
+    ('s_wtime_hi', 'B'),
+    ('s_mtime_hi', 'B'),
+    ('s_mkfs_time_hi', 'B'),
+    ('s_lastcheck_hi', 'B'),
+    ('s_first_error_time_hi', 'B'),
+    ('s_last_error_time_hi', 'B'),
+    ('s_first_error_errcode', 'B'),
+    ('s_last_error_errcode', 'B'),
+    ('s_encoding', 'H'),
+    ('s_encoding_flags', 'H'),
+    ('s_orphan_file_inum', 'I'),
+    ('s_reserved', '376s'),
+    ('s_checksum', 'I'),
+]
+
+
+def _layout(fields):
+    """(name, index into the unpacked values, count or None) of each field."""
+    layout = []
+    index = 0
+    for name, fmt in fields:
+        if fmt[-1] != 's' and len(fmt) > 1:
+            count = int(fmt[:-1])
+            layout.append((name, index, count))
+            index += count
+        else:
+            layout.append((name, index, None))
+            index += 1
+    return tuple(layout)
+
+
+# The whole 1024 byte superblock in one unpack
+UNPACK_SUPERBLOCK = struct.Struct("<" + "".join(fmt for _, fmt in SUPERBLOCK_FIELDS))
+SUPERBLOCK_LAYOUT = _layout(SUPERBLOCK_FIELDS)
+
 class Ext3Superblock: # pylint: disable=too-many-instance-attributes
     """Ext3Superblock.
 
@@ -34,16 +165,19 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
 
         Args:
 
-            f (io.BytesIO): File-like object of filesystem.
+            f (io.BytesIO): File-like or image object of filesystem.
             master_offset (int, optional): Offset in bytes from start of file to begin. Defaults to 0.
             magic_ignore (bool, optional): Ignore invalid/bad ext magic. Defaults to False.
         """
-        self.f = f
+        self.f = as_image(f)
         self.master_offset = master_offset
 
         self.starting_offset = None
         self.magic_ignore = magic_ignore
 
+        # Buffer the fields are unpacked from while running
+        self.__buf = None
+
         # Calculated later from s_log_block_size
         # 2 ** (10 + s_log_block_size)
         self.block_size = None
@@ -115,6 +249,11 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
         self.HASH_HALF_MD4_UNSIGNED = False
         self.HASH_TEA_UNSIGNED = False
 
+        # flags
+        self.FLAGS_SIGNED_HASH = False
+        self.FLAGS_UNSIGNED_HASH = False
+        self.FLAGS_TEST_FILESYS = False
+
         # default_mount_opts
         self.EXT4_DEFM_DEBUG = False
         self.EXT4_DEFM_BSDGROUPS = False
@@ -204,6 +343,8 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
         self.s_journal_dev = None
         self.s_last_orphan = None
         self.s_hash_seed = None
+        # s_hash_seed as four integers, used to hash directory entry names
+        self.hash_seed = None
         self.s_def_hash_version = None
         self.s_jnl_backup_type = None
         self.s_desc_size = None
@@ -255,6 +396,17 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
         self.s_lpf_ino = None
         self.s_prj_quota_inum = None
         self.s_checksum_seed = None
+        self.s_wtime_hi = None
+        self.s_mtime_hi = None
+        self.s_mkfs_time_hi = None
+        self.s_lastcheck_hi = None
+        self.s_first_error_time_hi = None
+        self.s_last_error_time_hi = None
+        self.s_first_error_errcode = None
+        self.s_last_error_errcode = None
+        self.s_encoding = None
+        self.s_encoding_flags = None
+        self.s_orphan_file_inum = None
         self.s_reserved = None
         self.s_checksum = None
     # pylint: enable=line-too-long,too-many-statements
@@ -262,144 +414,30 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
     def run(self) -> None:
         """Start superblock read/processing."""
 
-        # Save starting offset just in case
-        self.starting_offset = self.f.tell()
-
         # Superblock starts 1024 (0x400) bytes from beginning of partition/fs
         seek_offset = self.master_offset + 1024
+        self.starting_offset = seek_offset
 
-        self.f.seek(seek_offset)
+        # The whole superblock is 1024 bytes, fields are unpacked from this buffer
+        self.__buf = self.f.view_at(seek_offset, UNPACK_SUPERBLOCK.size)
 
         # Pre-check for ext magic unless magic_ignore is True
         if self.magic_ignore is False:
             self.__check_magic()
 
         # We either found ext magic or ignored it so read and process
-        self.s_inodes_count = self.__le32()
-        self.s_blocks_count_lo = self.__le32()
-        self.s_r_blocks_count_lo = self.__le32()
-        self.s_free_blocks_count_lo = self.__le32()
-        self.s_free_inodes_count = self.__le32()
-        self.s_first_data_block = self.__le32()
-        self.s_log_block_size = self.__le32()
-        self.s_log_cluster_size = self.__le32()
-        self.s_blocks_per_group = self.__le32()
-        self.s_clusters_per_group = self.__le32()
-        self.s_inodes_per_group = self.__le32()
-        self.s_mtime = self.__le32()
-        self.s_wtime = self.__le32()
-        self.s_mnt_count = self.__le16()
-        self.s_max_mnt_count = self.__le16()
-        self.s_magic = hex(self.__le16())
-        self.s_state = self.__le16()
-        self.s_errors = self.__le16()
-        self.s_minor_rev_level = self.__le16()
-        self.s_lastcheck = self.__le32()
-        self.s_checkinterval = self.__le32()
-        self.s_creator_os = self.__le32()
-        self.s_rev_level = self.__le32()
-        self.s_def_resuid = self.__le16()
-        self.s_def_resgid = self.__le16()
-
-        # This info separates these two sections
-
-        # These fields are for EXT4_DYNAMIC_REV superblocks only.
-        #
-        # Note: the difference between the compatible feature set
-        # and the incompatible feature set is that if there is a
-        # bit set in the incompatible feature set that the kernel
-        # doesn't know about, it should refuse to mount the filesystem.
-        #
-        # e2fsck's requirements are more strict; if it doesn't know
-        # about a feature in either the compatible or incompatible
-        # feature set, it must abort and not try to meddle with things
-        # it doesn't understand...
-        self.s_first_ino = self.__le32()
-        self.s_inode_size = self.__le16()
+        values = UNPACK_SUPERBLOCK.unpack_from(self.__buf)
+        for name, index, count in SUPERBLOCK_LAYOUT:
+            if count is None:
+                setattr(self, name, values[index])
+            else:
+                setattr(self, name, list(values[index:index + count]))
+
+        self.s_magic = hex(self.s_magic)
         if self.s_inode_size == 0:
             self.s_inode_size = 128
-        self.s_block_group_nr = self.__le16()
-        self.s_feature_compat = self.__le32()
-        self.s_feature_incompat = self.__le32()
-        self.s_feature_ro_compat = self.__le32()
-        self.s_uuid = self.f.read(16)
-        self.s_volume_name = self.f.read(16)
-        self.s_last_mounted = self.f.read(64)
-        self.s_algorithm_usage_bitmap = self.__le32()
-        self.s_prealloc_blocks = self.__u8()
-        self.s_prealloc_dir_blocks = self.__u8()
-        self.s_reserved_gdt_blocks = self.__le16()
-
-        # Journaling support valid if EXT4_FEATURE_COMPAT_HAS_JOURNAL set
-        self.s_journal_uuid = self.f.read(16)
-        self.s_journal_inum = self.__le32()
-        self.s_journal_dev = self.__le32()
-        self.s_last_orphan = self.__le32()
-        self.s_hash_seed = str(self.__le32())
-        self.s_hash_seed += str(self.__le32())
-        self.s_hash_seed += str(self.__le32())
-        self.s_hash_seed += str(self.__le32())
-        self.s_def_hash_version = self.__u8()
-        self.s_jnl_backup_type = self.__u8()
-        self.s_desc_size = self.__le16()
-        self.s_default_mount_opts = self.__le32()
-        self.s_first_meta_bg = self.__le32()
-
-        # My first version of super block parsing stopped reading after
-        # s_first_meta_bg
-        self.s_mkfs_time = self.__le32()
-        self.s_jnl_blocks = []
-        for _ in range(0, 16):
-            self.s_jnl_blocks.append(self.__le32())
-
-        # 64bit support valid if EXT4_FEATURE_COMPAT_64BIT
-        self.s_blocks_count_hi = self.__le32()
-        self.s_r_blocks_count_hi = self.__le32()
-        self.s_free_blocks_count_hi = self.__le32()
-        self.s_min_extra_isize = self.__le16()
-        self.s_want_extra_isize = self.__le16()
-        self.s_flags = self.__le32()
-        self.s_raid_stride = self.__le16()
-        self.s_mmp_interval = self.__le16()
-        self.s_mmp_block = self.__le64()
-        self.s_raid_stripe_width = self.__le32()
-        self.s_log_groups_per_flex = self.__u8()
-        self.s_checksum_type = self.__u8()
-        self.s_reserved_pad = self.__le16()
-        self.s_kbytes_written = self.__le64()
-        self.s_snapshot_inum = self.__le32()
-        self.s_snapshot_id = self.__le32()
-        self.s_snapshot_r_blocks_count = self.__le64()
-        self.s_snapshot_list = self.__le32()
-        self.s_error_count = self.__le32()
-        self.s_first_error_time = self.__le32()
-        self.s_first_error_ino = self.__le32()
-        self.s_first_error_block = self.__le64()
-        self.s_first_error_func = self.f.read(32)
-        self.s_first_error_line = self.__le32()
-        self.s_last_error_time = self.__le32()
-        self.s_last_error_ino = self.__le32()
-        self.s_last_error_line = self.__le32()
-        self.s_last_error_block = self.__le64()
-        self.s_last_error_func = self.f.read(32)
-        self.s_mount_opts = self.f.read(64)
-        self.s_usr_quota_inum = self.__le32()
-        self.s_grp_quota_inum = self.__le32()
-        self.s_overhead_blocks = self.__le32()
-        self.s_backup_bgs = []
-        self.s_backup_bgs.append(self.__le32())
-        self.s_backup_bgs.append(self.__le32())
-        self.s_encrypt_algos = []
-        self.s_encrypt_algos.append(self.__u8())
-        self.s_encrypt_algos.append(self.__u8())
-        self.s_encrypt_algos.append(self.__u8())
-        self.s_encrypt_algos.append(self.__u8())
-        self.s_encrypt_pw_salt = self.f.read(16)
-        self.s_lpf_ino = self.__le32()
-        self.s_prj_quota_inum = self.__le32()
-        self.s_checksum_seed = self.__le32()
-        self.s_reserved = self.__le32()
-        self.s_checksum = self.__le32()
+        self.hash_seed = tuple(self.hash_seed)
+        self.s_hash_seed = "".join(str(word) for word in self.hash_seed)
 
         # Calculated later s_log_block_size
         # 2 ** (10 + s_log_block_size)
@@ -410,10 +448,14 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
         self._read_feature_incompat()
         self._read_feature_ro_compat()
         self._read_state()
+        self._read_def_hash_version()
+        self._read_flags()
 
         self._calculate_number_of_blockgroups()
         self._uuid_to_str()
 
+        self.__buf = None
+
     def __check_magic(self) -> None:
         """Check superblock magic."""
 
@@ -425,30 +467,22 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
         # TODO: Figure out a way to do this that doesn't require python-magic (libmagic1)
         # TODO: Raise a custom exception
         # self.f.seek(self.master_offset)
-        # m = magic.from_buffer(self.f.read(4096))
+        # m = magic.from_buffer(self.__bytes(4096))
         # if m.startswith('SGI XFS filesystem'):
         #     raise ValueError("Partition is XFS!")
         # if 'LVM' in m:
         #     raise ValueError("Partition is LVM!")
 
         # Can still do a Ext magic check regardless of platform
-        self.f.seek(seek_offset)
         # ext magic offset is 56 (0x38) bytes from start of header
         magic_offset = 56
-        # Seek forward 56 bytes
-        self.f.seek(magic_offset, 1)
-        magic_test = hex(self.__le16())
+        magic_test = hex(struct.unpack_from("<H", self.__buf, magic_offset)[0])
 
         # Fail, raise RuntimeError
         # TODO: Raise a custom exception
         if magic_test != "0xef53":
             raise RuntimeError(f"Expected to find extfs magic '0xef53' "
-                               "but found '{magic_test}' with magic '{m}'")
-
-        # We skipped forward 56 bytes and read 2 bytes so
-        # we need to seek backwards 58 bytes to the beginning
-        # of the ext header
-        self.f.seek(-1 * (magic_offset + 2), 1)
+                               f"but found '{magic_test}' at offset {seek_offset + magic_offset}")
 
     def _calculate_number_of_blockgroups(self) -> None:
         """Calculate number of blockgroups.
@@ -609,47 +643,59 @@ class Ext3Superblock: # pylint: disable=too-many-instance-attributes
         if self.s_state == 1:
             self.STATE_CLEANLY_UNMOUNTED = True
 
-    def clean_for_pickle(self) -> None:
-        """Clean for pickle.
+    def _read_def_hash_version(self) -> None:
+        """Read s_def_hash_version"""
 
-        Cleans out cruft so class can be pickled.
-        """
+        value_to_attr_name_mapping = {
+            0x0: 'HASH_LEGACY',
+            0x1: 'HASH_HALF_MD4',
+            0x2: 'HASH_TEA',
+            0x3: 'HASH_LEGACY_UNSIGNED',
+            0x4: 'HASH_HALF_MD4_UNSIGNED',
+            0x5: 'HASH_TEA_UNSIGNED',
+        }
 
-        self.f = None
+        if self.s_def_hash_version in value_to_attr_name_mapping:
+            setattr(self, value_to_attr_name_mapping[self.s_def_hash_version], True)
 
-    def __le_char(self) -> int:
-        """Get signed char(1 byte/8bits)
-        """
-        return struct.unpack("<b", self.f.read(1))[0]
+    def _read_flags(self) -> None:
+        """Read the s_flags bitmap"""
 
-    def __le_uchar(self) -> int:
-        """Get unsigned char (1 byte/8bits)
-        """
-        return struct.unpack("<B", self.f.read(1))[0]
+        value_to_attr_name_mapping = {
+            0x1: 'FLAGS_SIGNED_HASH',
+            0x2: 'FLAGS_UNSIGNED_HASH',
+            0x4: 'FLAGS_TEST_FILESYS',
+        }
 
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
-        """
-        return struct.unpack("<I", self.f.read(4))[0]
+        for k, v in value_to_attr_name_mapping.items():
+            if self.s_flags & k:
+                setattr(self, v, True)
 
-    def __le_ushort(self) -> int:
-        """Get little endian unsigned short.
-        """
-        return struct.unpack("<H", self.f.read(2))[0]
+    def __combine(self, lo: int, hi: int) -> int:
+        """Combine the halves of a block count, ``hi`` is only used with 64bit."""
+        if self.INCOMPAT_64BITS and hi is not None:
+            return lo | (hi << 32)
+        return lo
 
-    def __le_ulonglong(self) -> int:
-        """Get little endian unsigned long long (8 bytes/64 bits)
-        """
-        return struct.unpack("<Q", self.f.read(8))[0]
+    @property
+    def blocks_count(self) -> int:
+        """Number of blocks (``s_blocks_count_lo``/``_hi``)."""
+        return self.__combine(self.s_blocks_count_lo, self.s_blocks_count_hi)
 
-    def __u8(self) -> int:
-        return self.__le_uchar()
+    @property
+    def r_blocks_count(self) -> int:
+        """Number of reserved blocks (``s_r_blocks_count_lo``/``_hi``)."""
+        return self.__combine(self.s_r_blocks_count_lo, self.s_r_blocks_count_hi)
 
-    def __le32(self) -> int:
-        return self.__le_uint()
+    @property
+    def free_blocks_count(self) -> int:
+        """Number of free blocks (``s_free_blocks_count_lo``/``_hi``)."""
+        return self.__combine(self.s_free_blocks_count_lo, self.s_free_blocks_count_hi)
 
-    def __le16(self) -> int:
-        return self.__le_ushort()
+    def clean_for_pickle(self) -> None:
+        """Clean for pickle.
+
+        Cleans out cruft so class can be pickled.
+        """
 
-    def __le64(self) -> int:
-        return self.__le_ulonglong()
+        self.f = None
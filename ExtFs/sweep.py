@@ -0,0 +1,88 @@
+"""Sweeps over block group metadata.
+
+With flex_bg the bitmaps and inode tables of ``2 ** s_log_groups_per_flex``
+block groups are stored back to back. Groups are handled one flex group at a
+time and the metadata asked for is merged into ranges (see
+:func:`ExtFs.image.coalesce_ranges`) that are each read with a single read,
+so packed metadata is read in one sequential sweep.
+"""
+
+import itertools
+from typing import Iterable, Iterator
+
+from ExtFs.block import Ext3BlockBitmap
+from ExtFs.image import RegionImage, coalesce_ranges
+from ExtFs.inode import Ext3InodeBitmap, Ext3InodeTable
+
+# Largest gap in bytes between metadata of block groups that is read through
+# instead of starting a new read
+SWEEP_MAX_GAP = 256 * 1024
+
+# Largest single read in bytes when sweeping block group metadata
+SWEEP_MAX_LENGTH = 64 * 1024 * 1024
+
+
+def sweep_groups(fs: 'Ext3Filesystem', groups: Iterable[int], block_bitmaps: bool = False,
+                 inode_bitmaps: bool = False,
+                 inode_tables: bool = False) -> Iterator[Ext3InodeTable]:
+    """Read metadata of block groups with as few reads as possible.
+
+    Generator. Results are stored in ``fs`` as by
+    :func:`Ext3Filesystem.read_block_bitmap`,
+    :func:`Ext3Filesystem.read_inode_bitmap` and
+    :func:`Ext3Filesystem.read_inode_table` (in bulk).
+
+    Args:
+
+        fs (Ext3Filesystem): Filesystem, set up.
+        groups (Iterable[int]): Block group numbers, in ascending order.
+        block_bitmaps (bool, optional): Read block bitmaps. Defaults to False.
+        inode_bitmaps (bool, optional): Read inode bitmaps. Defaults to False.
+        inode_tables (bool, optional): Read inode tables. Defaults to False.
+
+    Returns:
+
+        Ext3InodeTable: Inode table of a group when reading inode tables.
+    """
+    per_flex = fs.groups_per_flex
+    for _, flex_groups in itertools.groupby(groups, key=lambda g: g // per_flex):
+        gdts = [fs.get_gdt(group_number) for group_number in flex_groups]
+        ranges = []
+        for gdt in gdts:
+            if block_bitmaps:
+                bitmap = Ext3BlockBitmap(sb=fs.sb, gdt=gdt, f=fs.meta_image)
+                ranges.append((bitmap.location_bytes, bitmap.size_bytes))
+            if inode_bitmaps:
+                bitmap = Ext3InodeBitmap(sb=fs.sb, gdt=gdt, f=fs.meta_image)
+                ranges.append((bitmap.location_bytes, bitmap.size_bytes))
+            if inode_tables:
+                inode_tbl = Ext3InodeTable(sb=fs.sb, gdt=gdt, f=fs.meta_image)
+                ranges.append((inode_tbl.location_bytes,
+                               inode_tbl.number_of_used_inodes * inode_tbl.inode_size))
+        region = RegionImage(fs.image, coalesce_ranges(ranges, SWEEP_MAX_GAP, SWEEP_MAX_LENGTH))
+        for gdt in gdts:
+            if block_bitmaps:
+                fs.read_block_bitmap(gdt, f=region)
+            if inode_bitmaps:
+                fs.read_inode_bitmap(gdt, f=region)
+            if inode_tables:
+                yield fs.read_inode_table(gdt, bulk=True, f=region)
+        region.close()
+
+
+def iter_inode_tables(fs: 'Ext3Filesystem', groups: Iterable[int]) -> Iterator[Ext3InodeTable]:
+    """Read the inode tables of block groups in bulk.
+
+    Generator. Only the tables of one flex group are read ahead, so every
+    table can be used before it may be dropped from ``fs.inode_tables``.
+
+    Args:
+
+        fs (Ext3Filesystem): Filesystem, set up.
+        groups (Iterable[int]): Block group numbers, in ascending order.
+
+    Returns:
+
+        Ext3InodeTable: Bulk read inode table of the next group.
+    """
+    yield from sweep_groups(fs, groups, inode_bitmaps=True, inode_tables=True)
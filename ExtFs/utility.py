@@ -4,7 +4,10 @@
 # import pprint
 import io
 import struct
-from typing import List
+from typing import Dict, List, Tuple
+
+from ExtFs.image import as_image
+from ExtFs.runs import BlockRunList
 
 class Ext3Utility:
     """Ext3Utility.
@@ -19,9 +22,11 @@ class Ext3Utility:
     #     return pprint.pformat(vars(self), indent=4)
 
     def __init__(self, f: io.BytesIO, block_size: int = None, offset: int = 0):
-        self.f = f
+        self.f = as_image(f)
         self.block_size = block_size
         self.master_offset = offset
+        # An indirect block is an array of block_size / 4 little endian block numbers
+        self.__pointers = struct.Struct(f"<{block_size // 4}I") if block_size else None
 
 
     def hexdump_block(self, block_num: int) -> str:
@@ -29,12 +34,93 @@ class Ext3Utility:
         """
 
         byte_offset = self.master_offset + block_num * self.block_size
-        self.f.seek(byte_offset)
-        block_contents = self.f.read(self.block_size)
+        block_contents = self.f.read_at(byte_offset, self.block_size)
 
         # return hexdump(block_contents)
         return "blah hexdump"
 
+    def decode_block_pointers(self, block_num: int) -> Tuple[int]:
+        """Decode every block pointer stored in an indirect block.
+
+        Unlike the ``decode_*_block`` functions zero (hole) pointers are kept
+        so the position of each pointer is preserved.
+
+        Args:
+
+            block_num (int): Block number containing block pointers.
+
+        Returns:
+
+            Tuple[int]: All block pointers in the block.
+        """
+
+        byte_offset = self.master_offset + block_num * self.block_size
+        return self.__pointers.unpack_from(self.f.view_at(byte_offset, self.block_size))
+
+    def resolve_runs(self, i_block: Dict, number_of_blocks: int) -> BlockRunList:
+        """Resolve an inode's direct/indirect block map into block runs.
+
+        Holes (zero pointers) become sparse runs. Only the first
+        ``number_of_blocks`` logical blocks are resolved so pointers past the
+        end of the file are never followed.
+
+        Args:
+
+            i_block (dict): ``i_block`` dictionary of an inode.
+            number_of_blocks (int): Number of logical blocks in the file.
+
+        Returns:
+
+            BlockRunList: Runs of the file.
+        """
+
+        runs = BlockRunList()
+        logical = 0
+        for block in i_block['direct']:
+            if logical >= number_of_blocks:
+                return runs
+            if block != 0:
+                runs.add(logical, block, 1)
+            logical += 1
+
+        for level, key in enumerate(('indirect', 'double_indirect', 'triple_indirect'), 1):
+            logical = self.__resolve_level(i_block[key], level, logical, number_of_blocks, runs)
+
+        return runs
+
+    def __resolve_level(self, block_num: int, level: int, logical: int,
+                        number_of_blocks: int, runs: BlockRunList) -> int:
+        """Resolve one indirect block of a level into runs.
+
+        Args:
+
+            block_num (int): Indirect block number. 0 is a hole.
+            level (int): 1 single, 2 double, 3 triple indirect.
+            logical (int): First logical block mapped by this indirect block.
+            number_of_blocks (int): Number of logical blocks in the file.
+            runs (BlockRunList): Runs to add to.
+
+        Returns:
+
+            int: First logical block after this indirect block.
+        """
+
+        span = (self.block_size // 4) ** level
+        if logical >= number_of_blocks or block_num == 0:
+            return logical + span
+
+        start = logical
+        for block in self.decode_block_pointers(block_num):
+            if logical >= number_of_blocks:
+                break
+            if level == 1:
+                if block != 0:
+                    runs.add(logical, block, 1)
+                logical += 1
+            else:
+                logical = self.__resolve_level(block, level - 1, logical, number_of_blocks, runs)
+        return start + span
+
     def decode_si_block(self, block_num: int) -> List[int]:
         """Decode single indirect block numbers.
 
@@ -47,12 +133,7 @@ class Ext3Utility:
             List[int]: List of decoded block numbers.
         """
 
-        byte_offset = self.master_offset + block_num * self.block_size
-        self.f.seek(byte_offset)
-
-        values = list()
-        unpack_str = f"<{'I' * (self.block_size // 4)}"
-        values = [n for n in struct.unpack(unpack_str, self.f.read(self.block_size)) if n != 0]
+        values = [n for n in self.decode_block_pointers(block_num) if n != 0]
 
         return values
 
@@ -68,12 +149,7 @@ class Ext3Utility:
             List[int]: List of decoded block numbers.
         """
 
-        byte_offset = self.master_offset + block_num * self.block_size
-        self.f.seek(byte_offset)
-
-        values = list()
-        unpack_str = f"<{'I' * (self.block_size // 4)}"
-        values = [n for n in struct.unpack(unpack_str, self.f.read(self.block_size)) if n != 0]
+        values = [n for n in self.decode_block_pointers(block_num) if n != 0]
 
         return values
 
@@ -89,11 +165,7 @@ class Ext3Utility:
             List[int]: List of decoded block numbers.
         """
 
-        byte_offset = self.master_offset + block_num * self.block_size
-        self.f.seek(byte_offset)
-
-        unpack_str = f"<{'I' * (self.block_size // 4)}"
-        values = [n for n in struct.unpack(unpack_str, self.f.read(self.block_size)) if n != 0]
+        values = [n for n in self.decode_block_pointers(block_num) if n != 0]
 
         return values
 
@@ -143,40 +215,3 @@ class Ext3Utility:
         # d_blocks.sort()
 
         return d_blocks
-
-    def __le_char(self) -> int:
-        """Get signed char(1 byte/8bits)
-        """
-        return struct.unpack("<b", self.f.read(1))[0]
-
-    def __le_uchar(self) -> int:
-        """Get unsigned char (1 byte/8bits)
-        """
-        return struct.unpack("<B", self.f.read(1))[0]
-
-    def __le_uint(self) -> int:
-        """Get little endian unsigned int.
-        """
-        return struct.unpack("<I", self.f.read(4))[0]
-
-    def __le_ushort(self) -> int:
-        """Get little endian unsigned short.
-        """
-        return struct.unpack("<H", self.f.read(2))[0]
-
-    def __le_ulonglong(self) -> int:
-        """Get little endian unsigned long long (8 bytes/64 bits)
-        """
-        return struct.unpack("<Q", self.f.read(8))[0]
-
-    def __u8(self) -> int:
-        return self.__le_uchar()
-
-    def __le32(self) -> int:
-        return self.__le_uint()
-
-    def __le16(self) -> int:
-        return self.__le_ushort()
-
-    def __le64(self) -> int:
-        return self.__le_ulonglong()
@@ -24,6 +24,9 @@ setup(
     install_requires=[
         'more_itertools',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     tests_requires=[
         'pytest',
         'pytest-cov',
@@ -0,0 +1,117 @@
+"""Test filesystem images.
+
+The images in tests/data are not kept in the repository, they are built with
+mke2fs (e2fsprogs) before the tests are collected:
+
+    dd if=/dev/zero of=ext4_default.fs bs=1M count=10
+    mke2fs -q -t ext4 -d <contents> ext4_default.fs
+
+for ext2, ext3 and ext4 with the defaults of mke2fs (1 KiB blocks at this
+size). The contents are 512byte.txt ... 8192byte.txt filled with "C" and an
+empty dir1/sub directory. Other images are built per test with the
+``build_image`` fixture.
+"""
+
+# pylint: disable=missing-docstring
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+DEFAULT_IMAGE_TYPES = ("ext2", "ext3", "ext4")
+
+DEFAULT_IMAGE_SIZE = 10 * 1024 * 1024
+
+
+def populate_default(src: str) -> None:
+    """Contents of the default images."""
+    for size in (512, 1024, 2048, 4096, 8192):
+        with open(os.path.join(src, f"{size}byte.txt"), "wb") as f:
+            f.write(b"C" * size)
+    os.makedirs(os.path.join(src, "dir1", "sub"))
+
+
+def make_image(filename: str, fs_type: str, src: str, size: int = DEFAULT_IMAGE_SIZE,
+               options=()) -> str:
+    """Build an image holding the tree under ``src``.
+
+    Args:
+
+        filename (str): Image to create.
+        fs_type (str): "ext2", "ext3" or "ext4".
+        src (str): Directory copied into the root of the image.
+        size (int, optional): Size of the image in bytes. Defaults to 10 MiB.
+        options (Sequence[str], optional): More mke2fs arguments, e.g. ``("-b", "4096")``.
+
+    Returns:
+
+        str: filename.
+    """
+    if shutil.which("mke2fs") is None:
+        pytest.skip("mke2fs (e2fsprogs) is needed to build test images")
+    with open(filename, "wb") as f:
+        f.truncate(size)
+    subprocess.run(["mke2fs", "-q", "-F", "-t", fs_type, *options, "-d", src, filename],
+                   check=True, stdout=subprocess.DEVNULL)
+    return filename
+
+
+def debugfs(filename: str, command: str) -> None:
+    """Run a debugfs command that changes an image, e.g. "ssv def_hash_version tea"."""
+    subprocess.run(["debugfs", "-w", "-R", command, filename], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def index_directories(filename: str) -> None:
+    """Turn every large directory of an image into a hashed (htree) directory."""
+    # e2fsck exits with 1 when it changed the filesystem
+    result = subprocess.run(["e2fsck", "-fyD", filename], check=False,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if result.returncode not in (0, 1):
+        raise RuntimeError(f"e2fsck failed on {filename} ({result.returncode})")
+
+
+@pytest.fixture
+def build_image(tmp_path):
+    """Build an image in ``tmp_path``.
+
+    Returns a function taking the filesystem type, a function filling the
+    source directory it is given, and the ``size`` and ``options`` of
+    :func:`make_image`. With ``hash_alg`` large directories are turned into
+    hash trees hashed with that algorithm ("legacy", "half_md4" or "tea").
+    """
+
+    def build(fs_type: str, populate, size: int = DEFAULT_IMAGE_SIZE, options=(),
+              hash_alg: str = None) -> str:
+        src = tmp_path / "src"
+        src.mkdir()
+        populate(str(src))
+        filename = make_image(str(tmp_path / f"{fs_type}.img"), fs_type, str(src), size, options)
+        if hash_alg is not None:
+            debugfs(filename, f"ssv def_hash_version {hash_alg}")
+            index_directories(filename)
+        return filename
+
+    return build
+
+
+def pytest_configure(config): # pylint: disable=unused-argument
+    """Build the default images before test modules look for them."""
+    missing = [fs_type for fs_type in DEFAULT_IMAGE_TYPES
+               if not os.path.exists(os.path.join(DATA_DIR, f"{fs_type}_default.fs"))]
+    if not missing or shutil.which("mke2fs") is None:
+        return
+    os.makedirs(DATA_DIR, exist_ok=True)
+    src = os.path.join(DATA_DIR, "src")
+    shutil.rmtree(src, ignore_errors=True)
+    os.makedirs(src)
+    try:
+        populate_default(src)
+        for fs_type in missing:
+            make_image(os.path.join(DATA_DIR, f"{fs_type}_default.fs"), fs_type, src)
+    finally:
+        shutil.rmtree(src, ignore_errors=True)
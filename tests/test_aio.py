@@ -0,0 +1,28 @@
+"""Test the asyncio API"""
+
+# pylint: disable=line-too-long,missing-docstring
+
+import asyncio
+import os
+
+from ExtFs.aio import AsyncFilesystem
+
+FILENAME = "tests/data/ext4_default.fs" if os.path.exists("tests/data") else "data/ext4_default.fs"
+
+
+def test_async_filesystem():
+    async def main():
+        async with AsyncFilesystem(filename=FILENAME, max_workers=4) as fs:
+            async with await fs.open("/8192byte.txt") as fh:
+                assert fh.size == 8192
+                assert await fh.read(100) == b"C" * 100
+                fh.seek(8000)
+                assert [len(chunk) async for chunk in fh.iter_chunks(150)] == [150, 42]
+            assert fh.closed
+
+            paths = [f"/{size}byte.txt" for size in (1024, 2048, 4096, 8192)] * 8
+            contents = await asyncio.gather(*[fs.read_all(path) for path in paths])
+            assert [len(data) for data in contents] == [int(path[1:-8]) for path in paths]
+            assert await fs.resolve("/4096byte.txt") and not await fs.resolve("/missing")
+
+    asyncio.run(main())
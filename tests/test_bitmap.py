@@ -0,0 +1,32 @@
+"""Test packed bitmap helpers"""
+
+# pylint: disable=missing-docstring,invalid-name
+
+import pytest
+from ExtFs.bitmap import BitmapView, bitmap_count, bitmap_iter, bitmap_test
+
+bitmaps = [
+    (bytearray(b"\x00" * 16 + b"\xff" * 16 + b"\x5a\x01"), 270),
+    (bytearray(b"\x81\x00\xff"), 20),
+    (bytearray(b""), 0),
+]
+
+
+@pytest.mark.parametrize("raw,number_of_bits", bitmaps)
+def test_bitmap_helpers(raw, number_of_bits):
+    """Packed bitmap helpers agree with a naive bit by bit expansion."""
+
+    expected = [i for i in range(number_of_bits) if raw[i // 8] >> (i % 8) & 1]
+
+    assert [i for i in range(number_of_bits) if bitmap_test(raw, i)] == expected
+    assert bitmap_count(raw, number_of_bits) == len(expected)
+    assert list(bitmap_iter(raw, number_of_bits, 10, 1)) == [i + 10 for i in expected]
+    assert list(bitmap_iter(raw, number_of_bits, 10, 0)) == [
+        i + 10 for i in range(number_of_bits) if i not in expected]
+
+    view = BitmapView(raw, 1, number_of_bits)
+    assert len(view) == number_of_bits
+    assert [k for k, v in view.items() if v == 1] == [i + 1 for i in expected]
+    assert 0 not in view
+    with pytest.raises(KeyError):
+        view[number_of_bits + 1] # pylint: disable=pointless-statement
@@ -0,0 +1,44 @@
+"""Test the metadata block cache"""
+
+# pylint: disable=line-too-long,missing-docstring
+
+import io
+
+from ExtFs.cache import BlockCache, CachedImage, LRUCache
+from ExtFs.image import FileImage
+
+IMAGE = bytes(range(256)) * 4
+
+
+def test_cached_image():
+    cache = BlockCache(max_bytes=64 * 3)
+    image = CachedImage(FileImage(io.BytesIO(IMAGE)), cache, block_size=64)
+    assert image.read_at(60, 10) == IMAGE[60:70]
+    # Both missing blocks are fetched with one read on the first miss
+    assert cache.stats['misses'] == 1 and cache.stats['blocks'] == 2
+    assert bytes(image.view_at(64, 64)) == IMAGE[64:128]
+    assert cache.stats['hits'] == 1
+    # Fourth block evicts the least recently used one (block 0)
+    assert image.read_at(130, 70) == IMAGE[130:200]
+    assert 0 not in cache and 1 in cache and 3 in cache
+    assert cache.stats['evictions'] == 1 and cache.stats['bytes'] == 64 * 3
+    # Reads over max_read_blocks bypass the cache
+    assert image.read_at(0, len(IMAGE)) == IMAGE
+    assert cache.stats['blocks'] == 3
+
+
+def test_disabled():
+    cache = BlockCache(max_bytes=0)
+    cache.put(0, b"x")
+    assert cache.get(0) is None and len(cache) == 0
+
+
+def test_lru_cache():
+    cache = LRUCache(max_items=2)
+    cache[1] = "a"
+    cache[2] = "b"
+    assert cache[1] == "a"
+    cache[3] = "c"
+    assert list(cache) == [1, 3] and cache.evictions == 1
+    assert cache.get(2) is None
+    LRUCache(max_items=0)[1] = "a"
@@ -0,0 +1,77 @@
+"""Test directory name hashing against debugfs dx_hash"""
+
+# pylint: disable=line-too-long,missing-docstring
+
+import os
+
+import pytest
+from ExtFs import Filesystem
+from ExtFs.dirhash import dirhash
+
+# UUID 12345678-1234-5678-9abc-def012345678 as s_hash_seed
+SEED = (0x78563412, 0x78563412, 0xf0debc9a, 0x78563412)
+LONG_NAME = "aVeryLongFileNameThatIsMoreThanThirtyTwoBytes_é.txt".encode('utf-8')
+
+
+@pytest.mark.parametrize("hash_version,expected", [
+    (0, (0x65a05776, 0x0)),
+    (1, (0xa26e1d86, 0x133b3f98)),
+    (2, (0x5107c3f2, 0x3840cb7)),
+])
+def test_default_seed(hash_version, expected):
+    assert dirhash(b"hello.txt", hash_version) == expected
+
+
+@pytest.mark.parametrize("hash_version,expected", [
+    (0, (0x135cbd46, 0x0)),
+    (1, (0xb4952874, 0xc9c005cb)),
+    (2, (0x5e2a7f0a, 0x757e2207)),
+    (3, (0x3a9ad2dc, 0x0)),
+    (4, (0xad0d5ac6, 0x479f98eb)),
+    (5, (0x87e4aa6a, 0xb0b855ca)),
+])
+def test_seeded(hash_version, expected):
+    assert dirhash(LONG_NAME, hash_version, SEED) == expected
+
+
+def test_unsupported():
+    with pytest.raises(NotImplementedError):
+        dirhash(b"hello.txt", 6)
+
+
+# Long names so the directory needs more leaves than the dx_root holds
+HTREE_NAMES = [f"{i:04d}_" + "n" * 230 for i in range(1000)]
+
+
+def populate_htree(src):
+    os.makedirs(os.path.join(src, "big"))
+    for name in HTREE_NAMES:
+        with open(os.path.join(src, "big", name), "wb"):
+            pass
+
+
+@pytest.mark.parametrize("hash_alg", ["legacy", "half_md4", "tea"])
+def test_htree_lookup(build_image, hash_alg):
+    """Names are found by descending a hash tree with an indirect level."""
+
+    extfs = Filesystem(filename=build_image("ext4", populate_htree, hash_alg=hash_alg), lazy=True)
+    extfs.run()
+    fs = extfs.fs
+
+    big = fs.lookup(2, "big").inode
+    inode = fs.get_inode(big)
+    assert inode.EXT4_INDEX_FL
+    # dx_root_info.indirect_levels of the dx_root in the first block
+    root_block = fs.image.read_at(inode.dblocks[0] * fs.sb.block_size, fs.sb.block_size)
+    assert root_block[0x1E] >= 1
+
+    for name in HTREE_NAMES:
+        assert fs.lookup(big, name).name == name
+    assert fs.lookup(big, "missing") is None
+    assert fs.lookup(big, HTREE_NAMES[0][:-1]) is None
+    # Only the directory looked up in is kept, it was never read in full
+    assert big in fs.lookup_dirs and big not in fs.dirs
+
+    assert extfs.resolve("/big/" + HTREE_NAMES[500])
+    assert sorted(extfs.directory_entries) == ["/big", "/big/" + HTREE_NAMES[500]]
+    extfs.close()
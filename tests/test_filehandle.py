@@ -0,0 +1,74 @@
+"""Test the streaming file handle"""
+
+# pylint: disable=line-too-long,missing-docstring
+
+import io
+
+import pytest
+from ExtFs.filehandle import ExtFsFileHandle
+
+# Image: 16 bytes of "a" at 0, 16 bytes of "b" at 64
+IMAGE = b"a" * 16 + b"\xff" * 48 + b"b" * 16
+# File: "a" * 16, hole of 8 bytes, "b" * 10
+PARTS = {
+    0: {'byte_start': 0, 'byte_len': 16, 'sparse': False},
+    1: {'byte_start': 0, 'byte_len': 8, 'sparse': True},
+    2: {'byte_start': 64, 'byte_len': 10, 'sparse': False},
+}
+CONTENTS = b"a" * 16 + b"\x00" * 8 + b"b" * 10
+
+
+def open_handle():
+    return ExtFsFileHandle(IMAGE, "file", len(CONTENTS), PARTS)
+
+
+def test_read():
+    with open_handle() as fh:
+        assert fh.readable() and fh.seekable() and not fh.writable()
+        assert fh.read() == CONTENTS
+        assert fh.read(1) == b""
+        fh.seek(14)
+        assert fh.read(4) == b"aa\x00\x00"
+        assert fh.tell() == 18
+        assert fh.read_all() == CONTENTS
+    assert fh.closed
+    with pytest.raises(ValueError):
+        fh.read()
+
+
+def test_seek():
+    fh = open_handle()
+    assert fh.seek(-3, io.SEEK_END) == len(CONTENTS) - 3
+    assert fh.read() == b"bbb"
+    assert fh.seek(-12, io.SEEK_CUR) == len(CONTENTS) - 12
+    assert fh.read(3) == b"\x00\x00b"
+    assert fh.seek(100) == 100
+    assert fh.read() == b""
+    with pytest.raises(ValueError):
+        fh.seek(-1)
+
+
+def test_readinto():
+    fh = open_handle()
+    buf = bytearray(20)
+    assert fh.readinto(buf) == 20
+    assert buf == CONTENTS[:20]
+    assert fh.readinto(buf) == len(CONTENTS) - 20
+    assert buf[:len(CONTENTS) - 20] == CONTENTS[20:]
+
+
+def test_buffered_reader():
+    reader = io.BufferedReader(open_handle(), buffer_size=4)
+    assert b"".join(iter(lambda: reader.read(3), b"")) == CONTENTS
+
+
+def test_fragmented_random_access():
+    # One part per byte, alternating data and holes
+    image = bytes(range(256)) * 4
+    parts = {n: {'byte_start': n, 'byte_len': 1, 'sparse': n % 2 == 1} for n in range(1024)}
+    expected = bytes(b if n % 2 == 0 else 0 for n, b in enumerate(image))
+    fh = ExtFsFileHandle(image, "file", len(image), parts)
+    for offset in [1000, 3, 512, 511, 0, 1023]:
+        fh.seek(offset)
+        assert fh.get_current_bucket().bucket_number == offset
+        assert fh.read(2) == expected[offset:offset + 2]
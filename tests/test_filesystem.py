@@ -2,8 +2,12 @@
 
 # pylint: disable=line-too-long,missing-docstring,consider-using-with,invalid-name
 
+import io
+import os
+
 import pytest
 from ExtFs import Filesystem
+from ExtFs.inodearray import decode_inode_table
 
 filesystems_files = [
     "data/ext2_default.fs",
@@ -12,8 +16,9 @@ filesystems_files = [
 ]
 
 
+@pytest.mark.parametrize("use_mmap", [False, True])
 @pytest.mark.parametrize("filesystem_filename", filesystems_files)
-def test_file_contents(filesystem_filename):
+def test_file_contents(filesystem_filename, use_mmap):
     """Test file contents of various sizes match expected."""
 
     try:
@@ -22,7 +27,7 @@ def test_file_contents(filesystem_filename):
         # If file isn't found maybe we're running in vscode so prepend "tests/" to path
         f = open(f"tests/{filesystem_filename}", "rb")
 
-    extfs = Filesystem(fileobj=f)
+    extfs = Filesystem(fileobj=f, use_mmap=use_mmap)
     extfs.run()
 
     read_sizes = [
@@ -42,3 +47,272 @@ def test_file_contents(filesystem_filename):
         rf.close()
 
         assert expected == observed, f"File {read_filename} did not contain expected content!"
+
+    extfs.close()
+    f.close()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_inode_records(filesystem_filename):
+    """Bulk decoded inode tables match inodes read one at a time."""
+
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    extfs = Filesystem(fileobj=f)
+    extfs.run()
+
+    records = list(extfs.fs.iter_inode_records())
+    assert records
+    for record in records:
+        inode = extfs.get_inode(record.inode_number)
+        assert (inode.i_mode, inode.size, inode.i_mtime, inode.file_type) == (record.i_mode, record.size, record.i_mtime, record.file_type)
+
+    # Driven by the inode tables, not by the inodes cached so far
+    extfs.fs.inodes.clear()
+    allocated = [inode.inode_number for inode in extfs.allocated_inodes]
+    assert allocated == [record.inode_number for record in records if record.allocated]
+    assert len(allocated) == extfs.fs.number_of_allocated_inodes
+    unallocated = [inode.inode_number for inode in extfs.unallocated_inodes]
+    assert unallocated == [record.inode_number for record in records if not record.allocated]
+    assert list(extfs.get_inode_numbers(True)) == allocated
+    assert list(extfs.get_inode_numbers(False)) == unallocated
+
+    f.close()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_inode_array(filesystem_filename):
+    """Columnar inode table matches the bulk decoded records."""
+
+    np = pytest.importorskip("numpy")
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    extfs = Filesystem(fileobj=f)
+    extfs.run()
+
+    inodes = extfs.fs.inode_array()
+    assert len(inodes) == extfs.fs.number_of_inodes
+    assert np.array_equal(inodes['inode_number'], np.arange(1, len(inodes) + 1))
+    assert int(inodes['allocated'].sum()) == extfs.fs.number_of_allocated_inodes
+    for record in extfs.fs.iter_inode_records():
+        row = inodes[record.inode_number - 1]
+        assert (row['i_mode'], row['size'], row['i_mtime'], bool(row['allocated'])) == (record.i_mode, record.size, record.i_mtime, record.allocated)
+
+    # 32 bit owner ids from the high halves in osd2
+    raw = bytearray(256)
+    raw[0x02:0x04] = (0x5678).to_bytes(2, "little")
+    raw[0x18:0x1A] = (0x9ABC).to_bytes(2, "little")
+    raw[0x78:0x7A] = (0x1234).to_bytes(2, "little")
+    raw[0x7A:0x7C] = (0x0001).to_bytes(2, "little")
+    row = decode_inode_table(bytes(raw), 256, 1, 1, b"\x01")[0]
+    assert (row['uid'], row['gid']) == (0x12345678, 0x19ABC)
+
+    f.close()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_lazy(filesystem_filename):
+    """Lazy path resolution finds the same entries as the full walk."""
+
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    eager = Filesystem(fileobj=f)
+    eager.run()
+    lazy = Filesystem(fileobj=f, lazy=True)
+    lazy.run()
+    assert not lazy.directory_entries
+
+    assert lazy.open("/4096byte.txt").read() == b"C" * 4096
+    assert list(lazy.directory_entries) == ["/4096byte.txt"]
+    assert not lazy.resolve("/missing/file.txt")
+    with pytest.raises(KeyError):
+        lazy.get_file("/4096byte.txt/file.txt")
+
+    for path in eager.directory_entries:
+        assert lazy.get_file(path)['inode'] == eager.get_file(path)['inode']
+    # Directories looked up in are kept and reused
+    dir1 = eager.get_file("/dir1")['inode']
+    directory = lazy.fs.lookup_dirs[dir1]
+    assert lazy.fs.lookup(dir1, "sub").inode == eager.get_file("/dir1/sub")['inode']
+    assert lazy.fs.lookup_dirs[dir1] is directory and lazy.fs.lookup(dir1, "missing") is None
+    assert sorted(e['full_path'] for e in lazy.get_directory_contents("/")) == sorted(e['full_path'] for e in eager.get_directory_contents("/"))
+
+    f.close()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_directory_contents(filesystem_filename):
+    """Directory listings come from the parent to children index."""
+
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    extfs = Filesystem(fileobj=f)
+    extfs.run()
+
+    for directory in [""] + [e['full_path'] for e in extfs.directories]:
+        expected = [e for e in extfs.directory_entries.values() if e['parent_path'] == directory]
+        assert list(extfs.get_directory_contents(directory or "/")) == expected
+    lost_found = extfs.get_file("/lost+found")
+    assert list(extfs.get_directory_contents_by_inode(lost_found['inode'])) == list(extfs.get_directory_contents("/lost+found"))
+    assert list(extfs.get_directory_contents_by_inode(2)) == list(extfs.get_directory_contents("/"))
+    with pytest.raises(KeyError):
+        list(extfs.get_directory_contents_by_inode(extfs.get_file("/4096byte.txt")['inode']))
+
+    f.close()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_secondary_indexes(filesystem_filename):
+    """Queries by type, inode and size match a scan of every entry."""
+
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    extfs = Filesystem(fileobj=f)
+    extfs.run()
+    entries = list(extfs.directory_entries.values())
+
+    assert list(extfs.files) == [e for e in entries if e['file_type_str'] == "file"]
+    assert list(extfs.filenames) == [e['full_path'] for e in entries if e['file_type_str'] == "file"]
+    assert list(extfs.directories) == [e for e in entries if e['file_type_str'] == "directory"]
+    for e in entries:
+        assert extfs.get_paths_for_inode(e['inode']) == [p['full_path'] for p in entries if p['inode'] == e['inode']]
+    assert not extfs.get_paths_for_inode(1)
+    assert sorted(e['full_path'] for e in extfs.get_files_by_size(1024, 4096)) == \
+        sorted(e['full_path'] for e in extfs.files if 1024 <= e['size'] <= 4096)
+    assert len(list(extfs.get_files_by_size())) == len(list(extfs.files))
+
+    f.close()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_find_glob(filesystem_filename):
+    """find() and glob() agree with the full walk and skip pruned directories."""
+
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    eager = Filesystem(fileobj=f)
+    eager.run()
+    entries = list(eager.directory_entries.values())
+
+    def paths(found):
+        return sorted(e['full_path'] for e in found)
+
+    assert paths(eager.glob("/**")) == paths(entries)
+    assert paths(eager.glob("/*byte.txt")) == paths(e for e in entries if e['parent_path'] == "" and e['name'].endswith("byte.txt"))
+    assert paths(eager.find(include=["*.txt"], exclude=["/lost+found"], file_type="file", max_size=2048)) == \
+        paths(e for e in entries if e['name'].endswith(".txt") and e['file_type_str'] == "file" and e['size'] <= 2048)
+    assert paths(eager.find(max_depth=1)) == paths(eager.get_directory_contents("/"))
+
+    lazy = Filesystem(fileobj=f, lazy=True)
+    lazy.run()
+    nested = [e for e in entries if e['full_path'].count("/") > 1]
+    for e in nested:
+        parent, name = e['full_path'].rsplit("/", 1)
+        assert e['full_path'] in paths(lazy.glob(f"{parent}/*{name[-1:]}"))
+    # Only directories on the way to the matches were read
+    assert eager.get_file("/lost+found")['inode'] not in lazy.fs.dirs
+    assert paths(lazy.find("/", exclude=["lost+found"])) == paths(e for e in entries if not e['full_path'].startswith("/lost+found"))
+
+    f.close()
+
+
+@pytest.mark.parametrize("max_read", [512, 4 * 1024 * 1024])
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_read_many(filesystem_filename, max_read):
+    """Files read in one sweep over the image match files read one by one."""
+
+    try:
+        f = open(filesystem_filename, "rb")
+    except FileNotFoundError:
+        f = open(f"tests/{filesystem_filename}", "rb")
+
+    extfs = Filesystem(fileobj=f)
+    extfs.run()
+    full_paths = list(extfs.filenames)
+    contents = {full_path: bytearray(extfs.get_file_size(full_path)) for full_path in full_paths}
+    seen = set()
+    for full_path, offset, chunk in extfs.read_many(full_paths, max_read=max_read):
+        assert len(chunk) <= max_read
+        contents[full_path][offset:offset + len(chunk)] = chunk
+        seen.add(full_path)
+    assert seen == set(full_paths)
+    for full_path in full_paths:
+        assert contents[full_path] == extfs.read_all(full_path)
+
+    with pytest.raises(ValueError):
+        list(extfs.read_many(["/lost+found"]))
+
+    f.close()
+
+
+def test_index(tmp_path):
+    """A sidecar index is loaded on the next run and ignored when stale."""
+
+    index_filename = str(tmp_path / "ext4.index")
+    filename = "tests/data/ext4_default.fs" if os.path.exists("tests/data") else "data/ext4_default.fs"
+
+    fresh = Filesystem(filename=filename, index_filename=index_filename)
+    fresh.run()
+    assert os.path.exists(index_filename)
+
+    indexed = Filesystem(filename=filename, index_filename=index_filename)
+    indexed.run()
+    # Only the root directory was read
+    assert list(indexed.fs.dirs) == [2]
+    assert indexed.directory_entries.keys() == fresh.directory_entries.keys()
+    assert list(indexed.get_directory_contents("/")) == list(fresh.get_directory_contents("/"))
+    assert 'file_parts' in indexed.get_file("/8192byte.txt")
+    assert indexed.open("/8192byte.txt").read() == b"C" * 8192
+
+    # Index of another image
+    other = Filesystem(filename=filename.replace("ext4", "ext2"), index_filename=index_filename)
+    other.run()
+    assert other.fs.sb.uuid_str != fresh.fs.sb.uuid_str
+    assert other.open("/1024byte.txt").read() == b"C" * 1024
+    assert not indexed.load_index(index_filename)
+
+    # Unreadable index
+    with open(index_filename, "wb") as f:
+        f.write(b"garbage")
+    assert not indexed.load_index(index_filename)
+
+    # Images not backed by a file have no size/mtime to check the index against
+    with open(filename, "rb") as f:
+        in_memory = Filesystem(fileobj=io.BytesIO(f.read()), index_filename=index_filename)
+    with pytest.raises(ValueError):
+        in_memory.run()
+
+
+@pytest.mark.parametrize("filesystem_filename", filesystems_files)
+def test_parallel(filesystem_filename):
+    """A walk sharded over worker processes gives the same entries."""
+
+    filename = f"tests/{filesystem_filename}" if os.path.exists("tests/data") else filesystem_filename
+
+    serial = Filesystem(filename=filename)
+    serial.run()
+    parallel = Filesystem(filename=filename, workers=2)
+    parallel.run()
+    assert parallel.directory_entries == serial.directory_entries
+
+    with pytest.raises(ValueError):
+        with open(filename, "rb") as f:
+            Filesystem(fileobj=f, workers=2)
@@ -0,0 +1,43 @@
+"""Test bulk content hashing"""
+
+# pylint: disable=line-too-long,missing-docstring,consider-using-with,invalid-name
+
+import hashlib
+import os
+
+import pytest
+from ExtFs import Filesystem
+from ExtFs.hashing import HashStats
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+@pytest.mark.parametrize("max_read", [None, 1000])
+@pytest.mark.parametrize("filesystem_filename", ["ext2_default.fs", "ext4_default.fs"])
+def test_hash_all(filesystem_filename, max_read):
+    extfs = Filesystem(filename=os.path.join(DATA_DIR, filesystem_filename))
+    extfs.run()
+
+    stats = HashStats()
+    results = list(extfs.hash_all(stats=stats, workers=2, max_pending=2, max_read=max_read))
+
+    assert sorted(result.full_path for result in results) == sorted(extfs.filenames)
+    for result in results:
+        contents = extfs.read_all(result.full_path)
+        assert result.size == len(contents)
+        assert result.digests == {algorithm: hashlib.new(algorithm, contents).hexdigest() for algorithm in ("md5", "sha1", "sha256")}
+    assert stats.files == len(results)
+    assert stats.bytes == sum(result.size for result in results)
+    assert stats.throughput > 0
+
+    # Small windows, bigger files are read in file order
+    digests = {result.full_path: result.digests for result in results}
+    windowed = list(extfs.hash_all(max_buffered=3000, max_read=max_read))
+    assert {result.full_path: result.digests for result in windowed} == digests
+
+    results = list(extfs.hash_all(["/4096byte.txt"], algorithms=["sha512"]))
+    assert results[0].digests == {"sha512": hashlib.sha512(b"C" * 4096).hexdigest()}
+    with pytest.raises(ValueError):
+        list(extfs.hash_all(["/lost+found"]))
+
+    extfs.close()
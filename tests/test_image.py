@@ -0,0 +1,162 @@
+"""Test image backends and concurrent reads"""
+
+# pylint: disable=line-too-long,missing-docstring,consider-using-with,invalid-name
+
+import gzip
+import io
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from ExtFs import Filesystem
+from ExtFs.ext3 import Ext3Filesystem
+from ExtFs.image import BufferImage, FileImage, PreadImage, RegionImage, as_image, coalesce_ranges, open_image
+from ExtFs.inode import Ext3InodeRecord
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def test_as_image_backends():
+    filename = os.path.join(DATA_DIR, "ext4_default.fs")
+    with open(filename, "rb") as f:
+        expected = f.read(2048)[1024:2048]
+        f.seek(0)
+        images = [as_image(f), as_image(io.BytesIO(f.read())), as_image(expected)]
+
+        assert [type(image) for image in images] == [PreadImage, FileImage, BufferImage]
+        assert images[0].read_at(1024, 1024) == expected
+        assert images[1].read_at(1024, 1024) == expected
+        assert bytes(images[2].view_at(0, 1024)) == expected
+        assert as_image(images[1]) is images[1]
+
+        buf = bytearray(1024)
+        for image, offset in zip(images, [1024, 1024, 0]):
+            assert image.readinto_at(offset, memoryview(buf)) == 1024
+            assert buf == expected
+        # Short read at the end of the image
+        assert images[2].readinto_at(1000, memoryview(buf)) == 24
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+@pytest.mark.parametrize("in_memory", [False, True])
+def test_concurrent_reads(in_memory, use_mmap):
+    """One parsed filesystem shared by several threads."""
+
+    f = open(os.path.join(DATA_DIR, "ext4_default.fs"), "rb")
+    if in_memory:
+        f = io.BytesIO(f.read())
+
+    extfs = Filesystem(fileobj=f, use_mmap=use_mmap)
+    extfs.run()
+
+    read_sizes = [512, 1024, 2048, 4096, 8192] * 20
+
+    def read(read_size):
+        return extfs.open(f"/{read_size}byte.txt").read() == b"C" * read_size
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(pool.map(read, read_sizes))
+
+    extfs.close()
+    f.close()
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_wrapped_file(tmp_path, use_mmap):
+    """A wrapper whose fileno() is not the image itself is not mapped."""
+
+    gz_filename = tmp_path / "ext4_default.fs.gz"
+    with open(os.path.join(DATA_DIR, "ext4_default.fs"), "rb") as f, gzip.open(gz_filename, "wb") as gz:
+        shutil.copyfileobj(f, gz)
+
+    with gzip.open(gz_filename, "rb") as gz:
+        assert isinstance(open_image(f=gz, use_mmap=use_mmap), FileImage)
+        extfs = Filesystem(fileobj=gz, use_mmap=use_mmap)
+        extfs.run()
+        assert extfs.read_all("/2048byte.txt") == b"C" * 2048
+        extfs.close()
+
+    with pytest.raises(ValueError):
+        open_image(filename=os.path.join(DATA_DIR, "ext4_default.fs"))
+
+
+def test_region_image():
+    data = bytes(range(256)) * 64
+    image = BufferImage(data)
+    ranges = coalesce_ranges([(4096, 512), (0, 1024), (1100, 100), (8000, 0)], max_gap=128, max_length=4096)
+    assert ranges == [(0, 1200), (4096, 512)]
+    assert coalesce_ranges([(0, 1024), (1024, 1024)], max_gap=0, max_length=1024) == [(0, 1024), (1024, 1024)]
+
+    region = RegionImage(image, ranges)
+    assert bytes(region.view_at(100, 1000)) == data[100:1100]
+    assert region.read_at(4100, 100) == data[4100:4200]
+    # Not held by one range, read from the image
+    assert region.read_at(1100, 200) == data[1100:1300]
+    buf = bytearray(16)
+    assert region.readinto_at(4600, memoryview(buf)) == 16
+    assert buf == data[4600:4616]
+
+
+@pytest.mark.parametrize("filesystem_filename", ["ext2_default.fs", "ext4_default.fs"])
+def test_read_groups(filesystem_filename):
+    """Metadata swept by flex group matches metadata read group by group."""
+
+    with open(os.path.join(DATA_DIR, filesystem_filename), "rb") as f:
+        swept = assert_sweep_matches(f)
+        assert swept.groups_per_flex == (16 if filesystem_filename == "ext4_default.fs" else 1)
+
+
+def assert_sweep_matches(f):
+    swept = Ext3Filesystem(f=f)
+    swept.setup()
+    swept.read_group_descriptor_table()
+    swept.read_block_bitmaps()
+    swept.read_inode_tables(bulk=True)
+    single = Ext3Filesystem(f=f)
+    single.setup()
+    single.read_group_descriptor_table()
+    for gdt in single.gdts.values():
+        single.read_block_bitmap(gdt)
+        single.read_inode_table(gdt, bulk=True)
+
+    for group_number in range(swept.sb.block_group_count):
+        assert swept.get_block_bitmap(group_number).raw == single.get_block_bitmap(group_number).raw
+        assert swept.get_inode_bitmap(group_number).raw == single.get_inode_bitmap(group_number).raw
+        swept_records = swept.get_inode_table(group_number).records
+        single_records = single.get_inode_table(group_number).records
+        assert swept_records.keys() == single_records.keys()
+        for inode_number, record in swept_records.items():
+            assert [getattr(record, name) for name in Ext3InodeRecord.__slots__] == \
+                [getattr(single_records[inode_number], name) for name in Ext3InodeRecord.__slots__]
+
+    return swept
+
+
+def populate_block_size(src):
+    with open(os.path.join(src, "random.bin"), "wb") as f:
+        f.write(os.urandom(300000))
+    os.makedirs(os.path.join(src, "d", "e"))
+    with open(os.path.join(src, "d", "e", "small.txt"), "wb") as f:
+        f.write(b"small")
+
+
+# (block size, blocks per group) giving several groups in one flex group
+@pytest.mark.parametrize("block_size,blocks_per_group", [(2048, 4096), (4096, 2048), (16384, 512), (65536, 256)])
+def test_block_sizes(build_image, block_size, blocks_per_group):
+    """Images with blocks larger than 1 KiB parse and sweep like 1 KiB ones."""
+
+    filename = build_image("ext4", populate_block_size, size=64 * 1024 * 1024,
+                           options=("-b", str(block_size), "-g", str(blocks_per_group), "-O", "^has_journal"))
+    with open(filename, "rb") as f:
+        swept = assert_sweep_matches(f)
+        assert swept.sb.block_size == block_size
+        assert swept.sb.block_group_count > 1 and swept.groups_per_flex == 16
+
+    extfs = Filesystem(filename=filename)
+    extfs.run()
+    assert sorted(extfs.directory_entries) == ["/d", "/d/e", "/d/e/small.txt", "/lost+found", "/random.bin"]
+    with open(os.path.join(os.path.dirname(filename), "src", "random.bin"), "rb") as f:
+        assert extfs.read_all("/random.bin") == f.read()
+    assert extfs.read_all("/d/e/small.txt") == b"small"
+    extfs.close()
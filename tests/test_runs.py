@@ -0,0 +1,26 @@
+"""Test block runs"""
+
+# pylint: disable=missing-docstring,invalid-name
+
+from ExtFs.runs import BlockRun, BlockRunList
+
+
+def test_block_run_list_merges_and_fills_holes():
+    """Contiguous runs merge and logical gaps become sparse runs."""
+
+    runs = BlockRunList()
+    runs.add(0, 100, 4)
+    runs.add(4, 104, 2)
+    runs.add(8, 200, 1)
+    runs.add(9, 0, 3, sparse=True)
+
+    assert runs == [
+        BlockRun(0, 100, 6),
+        BlockRun(6, 0, 2, True),
+        BlockRun(8, 200, 1),
+        BlockRun(9, 0, 3, True),
+    ]
+    assert runs.logical_end == 12
+    assert runs.number_of_blocks == 7
+    assert runs.sparse is True
+    assert runs.physical_blocks() == [100, 101, 102, 103, 104, 105, 200]
@@ -0,0 +1,71 @@
+"""Test superblock and group descriptor parsing"""
+
+# pylint: disable=line-too-long,missing-docstring
+
+import os
+import shutil
+import subprocess
+
+import pytest
+from ExtFs.ext3 import Ext3Filesystem
+from ExtFs.extent import Ext4Extent, Ext4ExtentIdx
+from ExtFs.gdt import UNPACK_GDT_32, UNPACK_GDT_64, Ext3Gdt
+from ExtFs.superblock import UNPACK_SUPERBLOCK
+
+FILENAME = "tests/data/ext4_default.fs" if os.path.exists("tests/data") else "data/ext4_default.fs"
+
+
+def dumpe2fs(filename):
+    """Superblock fields as reported by dumpe2fs."""
+    if shutil.which("dumpe2fs") is None:
+        pytest.skip("dumpe2fs (e2fsprogs) is needed")
+    output = subprocess.run(["dumpe2fs", "-h", filename], check=True, capture_output=True, text=True).stdout
+    return dict(line.split(":", 1) for line in output.splitlines() if ":" in line)
+
+
+def test_superblock():
+    assert UNPACK_SUPERBLOCK.size == 1024
+    assert (UNPACK_GDT_32.size, UNPACK_GDT_64.size) == (32, 64)
+
+    fs = Ext3Filesystem()
+    fs.filename = FILENAME
+    fs.setup()
+    sb = fs.sb
+    # Values as reported by dumpe2fs
+    fields = {name: value.strip() for name, value in dumpe2fs(FILENAME).items()}
+    assert sb.uuid_str == fields["Filesystem UUID"]
+    assert sb.s_inode_size == 256 and sb.s_want_extra_isize == 32
+    assert 2 ** sb.s_log_groups_per_flex == int(fields["Flex block group size"])
+    assert sb.FLAGS_SIGNED_HASH and not sb.FLAGS_UNSIGNED_HASH
+    assert sb.s_checksum == int(fields["Checksum"], 16)
+    assert len(sb.s_jnl_blocks) == 17 and len(sb.hash_seed) == 4
+    fs.close()
+    fs.f.close()
+
+
+def test_gdt_table():
+    fs = Ext3Filesystem()
+    fs.filename = FILENAME
+    fs.setup()
+    fs.read_group_descriptor_table()
+    assert len(fs.gdts) == fs.sb.block_group_count
+    assert not fs.gdts.gdts
+    gdt = fs.get_gdt(0)
+    assert list(fs.gdts.gdts) == [0] and fs.get_gdt(0) is gdt
+    assert gdt.bits == 64 and gdt.location_table_inode == gdt.bg_inode_table_lo
+    assert sum(g.bg_free_inodes_count_lo for g in fs.gdts.values()) == fs.sb.s_free_inodes_count
+    fs.close()
+    fs.f.close()
+
+
+def test_64bit_fields():
+    gdt = Ext3Gdt(group_number=0, location=0)
+    gdt.bits = 64
+    gdt.decode(UNPACK_GDT_64.unpack(UNPACK_GDT_64.pack(1, 2, 3, 4, 5, 6, 0, 7, 0, 0, 8, 0,
+                                                         1, 1, 1, 1, 1, 1, 1, 1, 0, 0, b"\0" * 4)))
+    assert (gdt.block_bitmap, gdt.inode_bitmap, gdt.inode_table) == (1 + (1 << 32), 2 + (1 << 32), 3 + (1 << 32))
+    assert (gdt.free_blocks_count, gdt.free_inodes_count, gdt.itable_unused) == (4 + (1 << 16), 5 + (1 << 16), 8 + (1 << 16))
+    assert gdt.location_table_inode == gdt.inode_table
+
+    assert Ext4Extent(0, 1, 0x12, 0x345).start == 0x12_0000_0345
+    assert Ext4ExtentIdx(0, 0x345, 0x12).leaf == 0x12_0000_0345